@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import multiprocessing
+import contextlib
+import io
+from concurrent.futures import ProcessPoolExecutor
+import engine
+import genesis
+import sweep
+
+# ==========================================
+# Paired A/B Runner v1.0
+# ==========================================
+# [Update Log]
+# - Paired Arms: 복제(replica)마다 인구를 한 번만 만들어 control / treatment 가 공유 (팔마다 동적 상태만 복사, sweep 과 같은 방식)
+# - Common Random Numbers: 두 팔이 같은 crn_seed 를 써서 틱·행 단위로 같은 노이즈/가챠 난수 (engine.run_simulation(crn_seed=...))
+# - Pair Axis: 결과는 [복제, 팔(control, treatment)] 배열 → 복제별 차이의 평균 / 표준오차 / 신뢰구간
+# - Variance Reduction: 같은 표본으로 추정한 독립 설계 표준오차와 비교 (분산 감소 배수 = 같은 신뢰도에 필요한 실행 수 배수)
+# ==========================================
+
+ARMS = ("control", "treatment")
+
+def _arm_inputs(arm, df_activities, events):
+    """
+    팔 정의 → (df_activities, events, params)
+    arm: {"events": 이벤트 일정 (없으면 공통 events), 나머지 키는 sweep 설계점 이름 ("sim.*", "activity.*", "event.*")}
+    """
+    arm = dict(arm or {})
+    arm_events = arm.pop("events", events)
+    return sweep.apply_point(arm, df_activities, arm_events)
+
+_WORKER = {} # 워커 프로세스별 공유 입력 (initializer 에서 한 번만 설정)
+
+def _init_worker(populations, df_activities, events, sim_kwargs):
+    _WORKER.update(populations=populations, df_activities=df_activities, events=events, sim_kwargs=sim_kwargs)
+
+def _run_arm(task):
+    replica, arm_name, arm, population_seed, run_seed, crn_seed = task
+    df, arm_events, params = _arm_inputs(arm, _WORKER["df_activities"], _WORKER["events"])
+    agents = sweep.copy_dynamic_state(_WORKER["populations"][population_seed])
+    with contextlib.redirect_stdout(io.StringIO()):
+        np.random.seed(run_seed)
+        logs = engine.run_simulation(agents, df, events=arm_events, params=params, crn_seed=crn_seed, **_WORKER["sim_kwargs"])
+    return {"replica": replica, "arm": arm_name, **sweep.summarize_logs(logs, agents, df)}
+
+def run_ab_test(df_activities, control, treatment, n_agents=5000, n_replicas=8, events=None, seed=0, paired=True, n_workers=1, **sim_kwargs):
+    """
+    control / treatment 두 운영안을 n_replicas 번 짝지어 실행합니다.
+
+    control / treatment: {"events": {...}, "sim.gacha_base_prob": 0.03, ...} (sweep.apply_point 이름 규칙)
+    events: 팔에 "events" 가 없을 때 쓰는 공통 이벤트 일정
+    paired: True 이면 복제마다 같은 인구(한 번 생성, 팔마다 동적 상태 복사) + 공통 난수, False 이면 팔마다 독립 인구/난수 (기존 방식, 비교용)
+    n_workers: 프로세스 수 (1 이면 현재 프로세스에서 순차 실행)
+    sim_kwargs: run_simulation 에 그대로 전달 (inactive_contexts, churn 등)
+
+    Returns:
+        pd.DataFrame: index = (replica, arm), columns = sweep.summarize_logs 지표
+    """
+    tasks = []
+    for replica in range(n_replicas):
+        for arm_index, (arm_name, arm) in enumerate(zip(ARMS, (control, treatment))):
+            # 짝 실행: 두 팔이 인구 시드 / 실행 시드 / CRN 시드를 모두 공유
+            run_seed = seed + replica if paired else seed + 2 * n_replicas * (arm_index + 1) + replica
+            crn_seed = run_seed if paired else None
+            tasks.append((replica, arm_name, arm, run_seed, run_seed, crn_seed))
+
+    # 인구는 시드마다 한 번만 생성 (짝 설계면 복제당 하나를 두 팔이 공유, 실행은 동적 상태 복사본에서)
+    populations = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for population_seed in sorted({task[3] for task in tasks}):
+            np.random.seed(population_seed)
+            populations[population_seed] = genesis.create_agent_population(n_agents)
+    initargs = (populations, df_activities, events, sim_kwargs)
+
+    if n_workers == 1:
+        _init_worker(*initargs)
+        rows = [_run_arm(task) for task in tasks]
+    else:
+        # fork 가능한 환경에서는 인구 배열을 복사 없이(copy-on-write) 워커와 공유
+        methods = multiprocessing.get_all_start_methods()
+        mp_context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context, initializer=_init_worker, initargs=initargs) as pool:
+            rows = list(pool.map(_run_arm, tasks))
+    return pd.DataFrame(rows).set_index(["replica", "arm"]).sort_index()
+
+def pair_axis(results, metric):
+    """지표 하나의 [복제, 팔] 배열 (열 순서 = ARMS)"""
+    return results[metric].unstack("arm")[list(ARMS)].to_numpy(dtype=float)
+
+def summarize_ab(results, metrics=None, z=1.96):
+    """
+    지표별 차이(treatment - control)와 분산 추정.
+
+    diff_se: 복제별 차이의 표준오차 (짝 설계)
+    unpaired_se: 같은 표본의 팔별 분산으로 추정한 독립 설계 표준오차
+    variance_reduction: (unpaired_se / diff_se)^2 → 독립 설계로 같은 신뢰도를 얻는 데 필요한 복제 수 배수
+
+    Returns:
+        pd.DataFrame: 한 행 = 한 지표
+    """
+    metrics = metrics or list(results.columns)
+    rows = []
+    for metric in metrics:
+        values = pair_axis(results, metric)
+        n = len(values)
+        diff = values[:, 1] - values[:, 0]
+        diff_se = diff.std(ddof=1) / np.sqrt(n) if n > 1 else np.nan
+        unpaired_se = np.sqrt(values.var(axis=0, ddof=1).sum() / n) if n > 1 else np.nan
+        correlation = np.corrcoef(values[:, 0], values[:, 1])[0, 1] if n > 1 and values.std(axis=0).all() else np.nan
+        rows.append({
+            "metric": metric,
+            "control": values[:, 0].mean(),
+            "treatment": values[:, 1].mean(),
+            "diff": diff.mean(),
+            "rel_diff": diff.mean() / values[:, 0].mean() if values[:, 0].mean() else np.nan,
+            "diff_se": diff_se,
+            "ci_low": diff.mean() - z * diff_se,
+            "ci_high": diff.mean() + z * diff_se,
+            "unpaired_se": unpaired_se,
+            "correlation": correlation,
+            "variance_reduction": (unpaired_se / diff_se) ** 2 if diff_se else np.inf,
+        })
+    return pd.DataFrame(rows).set_index("metric")
+
+def main():
+    import psy_sim_config
+    df_activities = psy_sim_config.load_activity_table()
+    hot_time = lambda value: {80: {"Type": "HOT_TIME", "Target": "GAME", "Value": value}}
+    control, treatment = {"events": hot_time(2.0)}, {"events": hot_time(3.0)}
+    for paired in (True, False):
+        results = run_ab_test(df_activities, control, treatment, n_agents=2000, n_replicas=6, paired=paired)
+        print(f"\n=== Hot Time x2 vs x3 ({'paired + CRN' if paired else 'independent'}) ===")
+        print(summarize_ab(results, ["total_revenue", "mean_stress", "payer_rate"]).round(3).to_string())
+
+if __name__ == "__main__":
+    main()
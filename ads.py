@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import inference
+
+# ==========================================
+# Ad Monetization v1.0
+# ==========================================
+# [Update Log]
+# - Ad Slots: 활동 1틱(15분)당 광고 노출 슬롯 (activities 표의 Ad_Slots 열, 없으면 매체별 기본값)
+# - CPM: 매체별 1000회 노출당 단가 (data/ad_cpm.csv, 없으면 DEFAULT_CPM)
+# - Batched: 패턴 × 활동 선택 수를 행렬곱 한 번으로 모은 뒤 [패턴, 매체] 노출/매출 계산
+#   (광고 효율은 (틱, 패턴)별 상수 → 에이전트별 곱셈 없이 패턴 단위로 적용)
+# ==========================================
+
+# 매체별 기본 CPM (1000회 노출당 매출)
+DEFAULT_CPM = {"GAME": 4000.0, "VIDEO": 3000.0, "BOOK": 0.0, "WORK": 0.0, "COMM": 2000.0, "LIFE": 0.0}
+
+# Ad_Slots 열이 없을 때 매체별 기본 슬롯 수
+DEFAULT_SLOTS = {"GAME": 1.0, "VIDEO": 2.0, "BOOK": 0.0, "WORK": 0.0, "COMM": 1.0, "LIFE": 0.0}
+
+def compile_ad_table(df_activities, act_media_matrix, df_cpm=None):
+    """
+    df_cpm: Media_Group, CPM 열의 표 (없는 매체는 DEFAULT_CPM)
+
+    Returns:
+        dict: slot_media [M, Media] (활동별 슬롯을 해당 매체 열에), cpm [Media]
+    """
+    if 'Ad_Slots' in df_activities.columns:
+        slots = df_activities['Ad_Slots'].fillna(0).values.astype(float)
+    else:
+        media_groups = df_activities['Media_Group'] if 'Media_Group' in df_activities.columns else pd.Series([None] * len(df_activities))
+        slots = np.array([DEFAULT_SLOTS.get(m, 0.0) for m in media_groups])
+
+    cpm_by_media = dict(DEFAULT_CPM)
+    if df_cpm is not None:
+        cpm_by_media.update(dict(zip(df_cpm['Media_Group'], df_cpm['CPM'].astype(float))))
+    cpm = np.array([cpm_by_media.get(m, 0.0) for m in inference.MEDIA_TYPES])
+    return {
+        "slot_media": act_media_matrix * slots.reshape(-1, 1),
+        "cpm": cpm,
+    }
+
+def pattern_action_counts(action_mask_f, pattern_ids, onehot):
+    """
+    패턴별 활동 선택 수 [P, M] = onehot.T @ action_mask_f (BLAS 한 번)
+    onehot: [N, P] float 버퍼 (틱마다 다시 채움, Active Set 이면 압축 순서). F 배치 권장
+    합계 .sum(axis=0) 는 활동별 선택 수 (action_mask_f 를 다시 읽지 않고 얻음)
+    """
+    np.equal(pattern_ids.reshape(-1, 1), np.arange(onehot.shape[1]), out=onehot, casting='unsafe')
+    return np.dot(onehot.T, action_mask_f)
+
+def tick_ad_metrics(ad_table, pattern_counts, step_ad_effs):
+    """
+    이번 틱 광고 노출 / 매출.
+    노출 = 선택 수 × 슬롯 × 광고 효율(패턴), 매출 = 노출 × CPM / 1000
+
+    Returns:
+        impressions (np.array): [P, Media]
+        revenue (np.array): [P, Media]
+    """
+    n_patterns = pattern_counts.shape[0]
+    impressions = np.dot(pattern_counts, ad_table["slot_media"])
+    impressions *= np.asarray(step_ad_effs[:n_patterns], dtype=float).reshape(-1, 1)
+    revenue = impressions * (ad_table["cpm"] / 1000.0)
+    return impressions, revenue
@@ -11,6 +11,9 @@ import psy_sim_config
 import engine
 import create_csv_data
 import inference
+import tracer
+import sim_client
+import rollup
 import os
 
 # ==========================================
@@ -56,7 +59,20 @@ st.sidebar.subheader("⚡ World Events")
 enable_maintenance = st.sidebar.checkbox("Trigger Server Maintenance (14:00)", value=False)
 enable_hottime = st.sidebar.checkbox("Trigger Hot Time (20:00)", value=True)
 
-# 3. Execution
+# 3. Performance
+st.sidebar.subheader("🏎️ Performance")
+skip_sleeping = st.sidebar.checkbox("Skip Sleeping Agents (Active Set)", value=False)
+use_job_server = st.sidebar.checkbox("Run on Local Job Server", value=False, help="python sim_server.py 로 띄운 서버의 워커 풀에서 실행")
+if use_job_server:
+    job_server_url = st.sidebar.text_input("Job Server URL", sim_client.DEFAULT_SERVER_URL)
+    job_client_name = st.sidebar.text_input("Analyst Name", "analyst")
+max_points = st.sidebar.number_input("Chart Points per Series", min_value=50, max_value=5000, value=rollup.DEFAULT_MAX_POINTS, step=50, help="차트 시계열당 최대 점 수 (긴 실행은 버킷 min/max/mean 으로 요약)")
+
+# 4. Agent Tracing
+st.sidebar.subheader("🔍 Agent Tracing")
+trace_sample_size = st.sidebar.number_input("Traced Agents (0 = off)", min_value=0, max_value=500, value=20, step=5)
+
+# 5. Execution
 st.sidebar.markdown("---")
 run_btn = st.sidebar.button("🚀 Run Simulation", type="primary")
 
@@ -88,9 +104,10 @@ if run_btn:
     if enable_hottime:
         events[80] = {"Type": "HOT_TIME", "Target": "GAME", "Value": 3.0}
 
-    # 2. Generate Agents
-    with st.spinner(f"Creating {n_agents:,} Agents with Life Patterns..."):
-        population = genesis.create_agent_population(n_agents)
+    # 2. Generate Agents (Job Server 모드에서는 워커가 생성)
+    if not use_job_server:
+        with st.spinner(f"Creating {n_agents:,} Agents with Life Patterns..."):
+            population = genesis.create_agent_population(n_agents)
     
     col1, col2, col3 = st.columns(3)
     col1.metric("Agents", f"{n_agents:,}")
@@ -103,84 +120,197 @@ if run_btn:
     status_text.write("⚙️ Running Physics Engine (24h Loop)...")
     
     start_t = time.time()
-    logs = engine.run_simulation(population, df_activities, events=events)
+    inactive_contexts = ("SLEEP",) if skip_sleeping else None
+    agent_tracer = None
+    if use_job_server:
+        # 얇은 클라이언트: 제출 → SSE 로 틱 진행률 수신 → 요약 / 롤업 구간만 조회 (전체 logs 는 받지 않음, Agent Tracing 미지원)
+        scenario = {
+            "client": job_client_name, "n_agents": n_agents, "events": events,
+            "inactive_contexts": list(inactive_contexts) if inactive_contexts else None
+        }
+        job_id = sim_client.submit_job(scenario, job_server_url)
+        status_text.write(f"📨 Job `{job_id}` queued on {job_server_url}")
+        for event, data in sim_client.stream_job_events(job_id, job_server_url):
+            if event == "tick":
+                progress_bar.progress(min((data['tick'] + 1) / 96, 1.0))
+                status_text.write(f"⚙️ [{data['time']}] Rev: {data['total_revenue']:,.0f} | Stress: {data['avg_stress']:.1f}")
+            elif event == "status" and data['status'] != "done":
+                st.error(f"Job {job_id} {data['status']}: {data.get('error') or ''}")
+                st.stop()
+    else:
+        if trace_sample_size > 0:
+            agent_tracer = tracer.create_tracer(population, len(df_activities), sample_size=int(trace_sample_size))
+        logs = engine.run_simulation(population, df_activities, events=events, inactive_contexts=inactive_contexts, tracer=agent_tracer)
     end_t = time.time()
     
     progress_bar.progress(100)
     status_text.success(f"Simulation finished in {end_t - start_t:.2f}s")
-    
-    # ==========================================
-    # Visualizations
-    # ==========================================
+
+    # 차트는 다중 해상도 롤업에서 구간 단위로 조회 (Job Server 모드는 전체 logs 를 받지 않음)
+    if use_job_server:
+        summary = sim_client.get_job_summary(job_id, job_server_url)
+        st.session_state['dashboard'] = {
+            "job_id": job_id, "server_url": job_server_url, "events": events,
+            "n_ticks": summary['n_ticks'], "series": list(summary['series']),
+            "final": summary['final'], "action_counts": summary['action_counts'],
+        }
+    else:
+        st.session_state['dashboard'] = {
+            "rollup": logs['rollup'], "events": events,
+            "n_ticks": logs['rollup']['n_ticks'], "series": rollup.series_names(logs['rollup']),
+            "final": {k: logs[k][-1] for k in ('total_revenue', 'ad_revenue', 'avg_stress', 'avg_dopamine', 'avg_anxiety') if logs.get(k)},
+            "action_counts": logs['action_counts'],
+        }
+
+    # --- Agent Timeline (Tracer) ---
+    st.session_state.pop('df_trace', None)
+    if agent_tracer is not None:
+        df_trace = tracer.tracer_to_frame(agent_tracer, df_activities['Name'].tolist())
+        df_trace['Time'] = [logs['time'][t] for t in df_trace['tick']]
+        st.session_state['df_trace'] = df_trace
+
+elif 'dashboard' not in st.session_state:
+    st.info("👈 Set simulation parameters and click **Run Simulation** to start.")
+
+# ==========================================
+# Visualizations - 구간 변경 시 재실행되어도 유지
+# ==========================================
+if 'dashboard' in st.session_state:
+    dash = st.session_state['dashboard']
+    final = dash['final']
     st.markdown("---")
-    
+
     # Metrics
     m1, m2, m3, m4 = st.columns(4)
-    m1.metric("Total Revenue", f"{logs['total_revenue'][-1]:,.0f} G")
-    m2.metric("Avg Stress", f"{logs['avg_stress'][-1]:.1f}")
-    m3.metric("Avg Dopamine", f"{logs['avg_dopamine'][-1]:.1f}")
-    m4.metric("Avg Anxiety", f"{logs['avg_anxiety'][-1]:.1f}")
+    m1.metric("Total Revenue", f"{final['total_revenue']:,.0f} G", f"Ads {final['ad_revenue']:,.0f} G" if 'ad_revenue' in final else None, delta_color="off")
+    m2.metric("Avg Stress", f"{final['avg_stress']:.1f}")
+    m3.metric("Avg Dopamine", f"{final['avg_dopamine']:.1f}")
+    m4.metric("Avg Anxiety", f"{final['avg_anxiety']:.1f}")
+
+    # 구간을 좁히면 같은 점 수 안에서 더 세밀한 레벨을 조회
+    n_ticks = dash['n_ticks']
+    window = st.slider("🔎 Time Window (ticks, 15 min each)", 0, n_ticks, (0, n_ticks)) if n_ticks > 1 else (0, n_ticks)
+
+    def fetch_series(name):
+        if 'rollup' in dash:
+            return rollup.query_series(dash['rollup'], name, window[0], window[1], max_points)
+        return sim_client.get_job_series(dash['job_id'], name, window[0], window[1], max_points, dash['server_url'])
+
+    def add_series(fig, series, col, name, color, band=True, **line_kwargs):
+        """버킷 평균선 + (버킷이 여러 틱이면) min~max 범위"""
+        hours = series['tick'] / 4 # 틱 = 15분
+        if band and series['bucket_ticks'] > 1:
+            fig.add_trace(go.Scatter(x=hours, y=series['max'][:, col], line=dict(width=0, color=color), showlegend=False, hoverinfo='skip'))
+            fig.add_trace(go.Scatter(x=hours, y=series['min'][:, col], line=dict(width=0, color=color), fill='tonexty', showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=hours, y=series['mean'][:, col], name=name, line=dict(color=color), **line_kwargs))
+
+    def add_event_markers(fig):
+        # 이벤트 종류별 첫 틱에 표시 (x 축은 시간(hour) 숫자)
+        markers = {"SERVER_DOWN": ("Maintenance", "red"), "HOT_TIME": ("Hot Time", "gold")}
+        first_ticks = {}
+        for t, evt in sorted(dash['events'].items()):
+            first_ticks.setdefault(evt['Type'], t)
+        for evt_type, t in first_ticks.items():
+            label, color = markers.get(evt_type, (evt_type, "gray"))
+            if window[0] <= t < window[1]:
+                fig.add_vline(x=t / 4, line_dash="dash", line_color=color)
+                fig.add_annotation(x=t / 4, y=1.05, yref="paper", text=label, showarrow=False, font=dict(color=color))
+
+    palette = px.colors.qualitative.Plotly
+    pattern_names = {0:"Office", 1:"Student", 2:"Free", 3:"Night"}
 
     # --- Chart 1: Main Trends ---
-    st.subheader("📈 Macro Trends (24 Hours)")
-    df_logs = pd.DataFrame({
-        "Time": logs['time'],
-        "Revenue": logs['total_revenue'],
-        "Stress": logs['avg_stress'],
-        "Dopamine": logs['avg_dopamine']
-    })
-    
+    st.subheader("📈 Macro Trends")
+    stress, dopamine = fetch_series("avg_stress"), fetch_series("avg_dopamine")
+    st.caption(f"Resolution: {stress['bucket_ticks'] * 15} min per point ({len(stress['tick'])} points, band = bucket min~max)")
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df_logs['Time'], y=df_logs['Stress'], name="Stress", line=dict(color='red')))
-    fig.add_trace(go.Scatter(x=df_logs['Time'], y=df_logs['Dopamine'], name="Dopamine", line=dict(color='green')))
-    fig.update_layout(title="Stress vs Dopamine Levels", xaxis_title="Time", hovermode="x unified")
+    add_series(fig, stress, 0, "Stress", "red")
+    add_series(fig, dopamine, 0, "Dopamine", "green")
+    fig.update_layout(title="Stress vs Dopamine Levels", xaxis_title="Hour", hovermode="x unified")
     st.plotly_chart(fig, use_container_width=True)
     
     # --- Chart 2: Life Pattern Stress Comparison ---
     st.subheader("👥 Stress by Life Pattern")
-    pattern_names = {0:"Office", 1:"Student", 2:"Free", 3:"Night"}
-    df_pattern_stress = pd.DataFrame(logs['pattern_stress'])
-    df_pattern_stress['Time'] = logs['time']
-    
+    pattern_stress = fetch_series("pattern_stress")
     fig_p = go.Figure()
     for pid, name in pattern_names.items():
-        if pid in df_pattern_stress.columns:
-            fig_p.add_trace(go.Scatter(x=df_pattern_stress['Time'], y=df_pattern_stress[pid], name=name))
-    fig_p.update_layout(title="Stress Levels per Pattern", xaxis_title="Time")
+        add_series(fig_p, pattern_stress, pid, name, palette[pid], band=False)
+    fig_p.update_layout(title="Stress Levels per Pattern", xaxis_title="Hour")
     st.plotly_chart(fig_p, use_container_width=True)
 
+    # --- Chart 2-0: Ad Revenue ---
+    if "ad_revenue_by_media" in dash['series']:
+        st.subheader("📺 Ad Revenue")
+        ad_col1, ad_col2 = st.columns(2)
+        ad_media = fetch_series("ad_revenue_by_media")
+        fig_am = go.Figure()
+        for i, media in enumerate(inference.MEDIA_TYPES):
+            if ad_media['max'][:, i].any():
+                add_series(fig_am, ad_media, i, media, palette[i % len(palette)], band=False, stackgroup="media")
+        fig_am.update_layout(title="Ad Revenue per Tick by Media", xaxis_title="Hour")
+        ad_col1.plotly_chart(fig_am, use_container_width=True)
+        ad_pattern = fetch_series("ad_revenue_by_pattern")
+        fig_ap = go.Figure()
+        for pid in range(ad_pattern['mean'].shape[1]):
+            add_series(fig_ap, ad_pattern, pid, pattern_names.get(pid, str(pid)), palette[pid % len(palette)], band=False)
+        fig_ap.update_layout(title="Ad Revenue per Tick by Pattern", xaxis_title="Hour")
+        ad_col2.plotly_chart(fig_ap, use_container_width=True)
+
+    # --- Chart 2-1: Distribution Bands (Sketches) ---
+    st.subheader("📉 Distribution Bands (p50 / p90 / p99)")
+    band_metrics = [name.split(".", 1)[1] for name in dash['series'] if name.startswith("quantiles.")]
+    if band_metrics:
+        band_tabs = st.tabs([m.title() for m in band_metrics])
+        for band_tab, metric in zip(band_tabs, band_metrics):
+            bands = fetch_series(f"quantiles.{metric}")
+            fig_q = go.Figure()
+            for col, (name, color) in enumerate([("p50", 'royalblue'), ("p90", 'orange'), ("p99", 'red')]):
+                add_series(fig_q, bands, col, name, color, band=False, fill='tonexty' if col else None)
+            fig_q.update_layout(title=f"{metric.title()} Quantile Bands", xaxis_title="Hour", hovermode="x unified")
+            band_tab.plotly_chart(fig_q, use_container_width=True)
+
     # --- Chart 3: Social Viral Trends ---
     st.subheader("🔥 Social Viral Trends (Bandwagon Effect)")
-    viral_data = np.array(logs['viral_trends'])
-    df_viral = pd.DataFrame(viral_data, columns=inference.MEDIA_TYPES)
-    df_viral['Time'] = logs['time']
-    
-    fig_v = px.line(df_viral, x='Time', y=inference.MEDIA_TYPES, title="Media Trend Scores Over Time")
-    
-    # [FIX] 이벤트 마커 표시 (Categorical Axis 호환성 수정)
-    # annotation_text를 add_vline에 직접 넣으면 int+str 에러 발생함.
-    # 별도의 add_annotation으로 분리하여 처리.
-    if enable_maintenance:
-        fig_v.add_vline(x="14:00", line_dash="dash", line_color="red")
-        fig_v.add_annotation(x="14:00", y=1.05, yref="paper", text="Maintenance", showarrow=False, font=dict(color="red"))
-        
-    if enable_hottime:
-        fig_v.add_vline(x="20:00", line_dash="dash", line_color="gold")
-        fig_v.add_annotation(x="20:00", y=1.05, yref="paper", text="Hot Time", showarrow=False, font=dict(color="gold"))
-        
+    viral = fetch_series("viral_trends")
+    fig_v = go.Figure()
+    for i, media in enumerate(inference.MEDIA_TYPES):
+        add_series(fig_v, viral, i, media, palette[i % len(palette)], band=False)
+    fig_v.update_layout(title="Media Trend Scores Over Time", xaxis_title="Hour")
+    add_event_markers(fig_v)
     st.plotly_chart(fig_v, use_container_width=True)
 
     # --- Chart 4: Activity Distribution ---
     st.subheader("🏆 Activity Popularity")
-    action_counts = logs['action_counts']
     df_pop = pd.DataFrame({
         "Activity": df_activities['Name'],
         "Category": df_activities['Category'],
-        "Count": action_counts
+        "Count": dash['action_counts']
     }).sort_values("Count", ascending=True)
     
     fig_bar = px.bar(df_pop, x="Count", y="Activity", color="Category", orientation='h', title="Total Actions Performed")
     st.plotly_chart(fig_bar, use_container_width=True)
 
-else:
-    st.info("👈 Set simulation parameters and click **Run Simulation** to start.")
\ No newline at end of file
+# ==========================================
+# Agent Timeline (Tracer) - 에이전트 선택 시 재실행되어도 유지
+# ==========================================
+if 'df_trace' in st.session_state:
+    st.subheader("🕵️ Agent Timeline (Sampled Cohort)")
+    df_trace = st.session_state['df_trace']
+    traced_ids = sorted(df_trace['agent_id'].unique())
+    selected_id = st.selectbox("Agent ID", traced_ids)
+    df_agent = df_trace[df_trace['agent_id'] == selected_id]
+
+    fig_a = go.Figure()
+    for col, color in [("state_stress", "red"), ("state_dopamine", "green"), ("state_anxiety", "orange")]:
+        fig_a.add_trace(go.Scatter(x=df_agent['Time'], y=df_agent[col], name=col.replace("state_", "").title(), line=dict(color=color)))
+    fig_a.update_layout(title=f"Agent #{selected_id} States", xaxis_title="Time", hovermode="x unified")
+    st.plotly_chart(fig_a, use_container_width=True)
+
+    act_cols = [c for c in df_agent.columns if c.startswith("act_")]
+    fig_h = px.imshow(
+        df_agent[act_cols].T.astype(int).values,
+        x=df_agent['Time'], y=[c[4:] for c in act_cols],
+        color_continuous_scale="Blues", aspect="auto", title=f"Agent #{selected_id} Actions"
+    )
+    st.plotly_chart(fig_h, use_container_width=True)
+    st.dataframe(df_agent.drop(columns=act_cols), use_container_width=True)
@@ -0,0 +1,262 @@
+import numpy as np
+import pandas as pd
+import multiprocessing
+import contextlib
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor
+import engine
+
+# ==========================================
+# Calibration Engine v1.0
+# ==========================================
+# [Update Log]
+# - Parameter Vector: 손으로 맞춘 상수(learning_rate, viral_decay, inertia_weight, rage_weight)를 [0, 1] 정규화 벡터로
+# - CMA-ES: 기울기 없이 세대마다 후보 λ 개를 한꺼번에 평가하는 진화 전략
+# - Parallel Evaluation: 프로세스 풀 (인구 1회 생성 후 읽기 전용 공유, 세대 간 풀 재사용)
+# - Early Stopping: 누적 오차(최종 손실의 하한)가 기준을 넘으면 그 틱에서 실행 중단
+# ==========================================
+
+# 보정 대상 파라미터: (하한, 상한, 로그 스케일 여부)
+CALIBRATION_SPACE = {
+    "learning_rate": (1e-4, 1e-2, True),
+    "viral_decay": (0.80, 0.995, False),
+    "inertia_weight": (0.0, 30.0, False),
+    "rage_weight": (0.0, 150.0, False),
+}
+
+# 시뮬레이션 시계열: (logs 에서 꺼내는 함수, 집계 방식)
+# 모두 에이전트 1명당 값 → 목표 KPI 도 인구(가입자) 수로 나눠 넣어야 함
+# flow 는 구간 합, level 은 구간 평균으로 목표 해상도(예: 시간당 24점)에 맞춤
+SERIES_EXTRACTORS = {
+    "revenue": (lambda logs, n: np.diff(logs["total_revenue"], prepend=0.0) / n, "flow"),
+    "active_agents": (lambda logs, n: np.asarray(logs["active_agents"], dtype=float) / n, "level"),
+    "gacha_pulls": (lambda logs, n: np.asarray(logs["gacha_pulls"], dtype=float) / n, "flow"),
+    "avg_stress": (lambda logs, n: np.asarray(logs["avg_stress"], dtype=float), "level"),
+    "avg_dopamine": (lambda logs, n: np.asarray(logs["avg_dopamine"], dtype=float), "level"),
+    "avg_anxiety": (lambda logs, n: np.asarray(logs["avg_anxiety"], dtype=float), "level"),
+}
+
+# ------------------------------------------
+# Parameter Vector
+# ------------------------------------------
+def encode_params(params, space=CALIBRATION_SPACE):
+    """{이름: 값} → [0, 1]^d 벡터"""
+    unit = []
+    for name, (lo, hi, log_scale) in space.items():
+        value = params[name]
+        if log_scale: unit.append((np.log(value) - np.log(lo)) / (np.log(hi) - np.log(lo)))
+        else: unit.append((value - lo) / (hi - lo))
+    return np.clip(np.array(unit), 0.0, 1.0)
+
+def decode_params(unit, space=CALIBRATION_SPACE):
+    """[0, 1]^d 벡터 → {이름: 값} (engine.run_simulation(params=...) 형식)"""
+    params = {}
+    for u, (name, (lo, hi, log_scale)) in zip(unit, space.items()):
+        if log_scale: params[name] = float(np.exp(np.log(lo) + u * (np.log(hi) - np.log(lo))))
+        else: params[name] = float(lo + u * (hi - lo))
+    return params
+
+# ------------------------------------------
+# Objective
+# ------------------------------------------
+def prepare_targets(targets, total_ticks=96):
+    """
+    targets: {시계열 이름: 관측값 배열} 길이는 total_ticks 의 약수 (96 = 15분, 24 = 1시간 ...)
+
+    Returns:
+        dict: {이름: {"values", "ticks_per_point", "how", "scale"}}
+    """
+    prepared = {}
+    for name, values in targets.items():
+        if name not in SERIES_EXTRACTORS: raise ValueError(f"Unknown target series: {name}")
+        values = np.asarray(values, dtype=float)
+        if total_ticks % len(values) != 0: raise ValueError(f"Target '{name}' length must divide {total_ticks}")
+        prepared[name] = {
+            "values": values,
+            "ticks_per_point": total_ticks // len(values),
+            "how": SERIES_EXTRACTORS[name][1],
+            # 시계열끼리 단위가 달라도 비교되도록 목표 평균 크기로 정규화
+            "scale": max(float(np.mean(np.abs(values))), 1e-12),
+        }
+    return prepared
+
+def partial_loss(logs, n_agents, prepared_targets):
+    """
+    지금까지 완료된 구간만으로 계산한 손실. 항이 모두 0 이상인 제곱합이므로
+    하루 전체의 최종 손실보다 항상 작거나 같음 (Early Stopping 의 하한으로 사용)
+
+    손실 = Σ_시계열 Σ_구간 ((sim - target) / scale)^2 / 구간 수
+    """
+    n_ticks = len(logs["time"])
+    loss = 0.0
+    for name, target in prepared_targets.items():
+        tpp = target["ticks_per_point"]
+        n_points = n_ticks // tpp
+        if n_points == 0: continue
+        series = SERIES_EXTRACTORS[name][0](logs, n_agents)[:n_points * tpp].reshape(n_points, tpp)
+        sim = series.sum(axis=1) if target["how"] == "flow" else series.mean(axis=1)
+        err = (sim - target["values"][:n_points]) / target["scale"]
+        loss += float(np.sum(err * err)) / len(target["values"])
+    return loss
+
+# ------------------------------------------
+# Workers
+# ------------------------------------------
+_WORKER = {}
+
+def _init_worker(population, df_activities, events, prepared_targets, sim_kwargs):
+    _WORKER.update(
+        population=population, df_activities=df_activities, events=events,
+        prepared_targets=prepared_targets, sim_kwargs=sim_kwargs
+    )
+
+def _evaluate(task):
+    """후보 하나 실행 → (손실, 조기 중단 여부, 실행한 틱 수)"""
+    params, seed, stop_threshold, check_every = task
+    population = _WORKER["population"]
+    prepared_targets = _WORKER["prepared_targets"]
+    n_agents = len(population['ids'])
+
+    agents = dict(population)
+    for key in engine.DYNAMIC_STATE_KEYS:
+        if key in population: agents[key] = population[key].copy()
+
+    def on_tick(tick, logs):
+        if stop_threshold is None or (tick + 1) % check_every != 0: return True
+        return partial_loss(logs, n_agents, prepared_targets) <= stop_threshold
+
+    if seed is not None: np.random.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        logs = engine.run_simulation(
+            agents, _WORKER["df_activities"].copy(), events=_WORKER["events"], params=params,
+            on_tick=on_tick, **_WORKER["sim_kwargs"]
+        )
+    return partial_loss(logs, n_agents, prepared_targets), "stopped_at_tick" in logs, len(logs["time"])
+
+# ------------------------------------------
+# CMA-ES
+# ------------------------------------------
+def calibrate(population, df_activities, targets, events=None, initial_params=None, sigma0=0.2,
+              popsize=None, max_generations=40, n_workers=None, seed=0, early_stop_factor=3.0,
+              check_every=8, tol=1e-4, verbose=True, **sim_kwargs):
+    """
+    CMA-ES 로 관측 KPI 시계열과의 오차를 최소화하는 파라미터를 찾습니다.
+
+    targets: {시계열 이름: 관측값} (SERIES_EXTRACTORS 참고, 1인당 값)
+    initial_params: 시작점 (기본 engine.DEFAULT_PARAMS 의 현재 손튜닝 값)
+    sigma0: [0, 1] 정규화 공간에서의 초기 탐색 폭
+    popsize: 세대당 후보 수 λ (기본 max(4 + 3 ln d, 워커 수) → 워커를 놀리지 않음)
+    seed: 모든 후보에 같은 시뮬레이션 시드 (공통 난수로 목적 함수의 노이즈 감소)
+    early_stop_factor: 지금까지 최저 손실 × 이 값을 누적 오차가 넘으면 실행 중단 (None 이면 끔)
+    check_every: 누적 오차 확인 주기 (틱)
+    tol: 탐색 폭(σ × 최대 축 길이)이 이보다 작아지면 수렴으로 보고 종료
+    sim_kwargs: run_simulation 에 전달 (처리량이 중요하면 inactive_contexts=("SLEEP",), track_distributions=False 권장)
+
+    Returns:
+        dict: best_params, best_loss, history (후보별 DataFrame), n_evaluations, elapsed_sec
+    """
+    space = CALIBRATION_SPACE
+    names = list(space.keys())
+    d = len(names)
+    n_workers = n_workers or multiprocessing.cpu_count()
+    rng = np.random.default_rng(seed)
+    prepared_targets = prepare_targets(targets)
+
+    # --- CMA-ES 전략 파라미터 (Hansen 기본값) ---
+    lam = popsize or max(4 + int(3 * np.log(d)), n_workers)
+    mu = lam // 2
+    weights = np.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+    weights /= weights.sum()
+    mueff = 1.0 / np.sum(weights ** 2)
+    cc = (4 + mueff / d) / (d + 4 + 2 * mueff / d)
+    cs = (mueff + 2) / (d + mueff + 5)
+    c1 = 2 / ((d + 1.3) ** 2 + mueff)
+    cmu = min(1 - c1, 2 * (mueff - 2 + 1 / mueff) / ((d + 2) ** 2 + mueff))
+    damps = 1 + 2 * max(0.0, np.sqrt((mueff - 1) / (d + 1)) - 1) + cs
+    chi_n = np.sqrt(d) * (1 - 1 / (4 * d) + 1 / (21 * d ** 2))
+
+    start_params = {**engine.DEFAULT_PARAMS, **(initial_params or {})}
+    mean = encode_params(start_params, space)
+    sigma = sigma0
+    cov = np.eye(d)
+    p_sigma = np.zeros(d)
+    p_c = np.zeros(d)
+
+    best_loss, best_unit = np.inf, mean.copy()
+    history = []
+    start_time = time.time()
+
+    initargs = (population, df_activities, events or {}, prepared_targets, sim_kwargs)
+    if n_workers == 1:
+        _init_worker(*initargs)
+        pool = None
+    else:
+        methods = multiprocessing.get_all_start_methods()
+        mp_context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        pool = ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context, initializer=_init_worker, initargs=initargs)
+
+    try:
+        for generation in range(max_generations):
+            # 1. 표본 추출: x = m + σ B D z  ([0, 1] 밖은 경계로 자름)
+            eigvals, basis = np.linalg.eigh(cov)
+            axis_len = np.sqrt(np.maximum(eigvals, 1e-20))
+            z = rng.standard_normal((lam, d))
+            unit = np.clip(mean + sigma * (z * axis_len) @ basis.T, 0.0, 1.0)
+            steps = (unit - mean) / sigma
+
+            # 2. 병렬 평가 (첫 세대는 기준이 없으므로 조기 중단 없음)
+            threshold = None if early_stop_factor is None or not np.isfinite(best_loss) else best_loss * early_stop_factor
+            tasks = [({**start_params, **decode_params(u, space)}, seed, threshold, check_every) for u in unit]
+            results = list(pool.map(_evaluate, tasks)) if pool is not None else [_evaluate(t) for t in tasks]
+            losses = np.array([r[0] for r in results])
+
+            for u, (loss, stopped, n_ticks) in zip(unit, results):
+                history.append({"generation": generation, **decode_params(u, space), "loss": loss, "early_stopped": stopped, "ticks_run": n_ticks})
+
+            # 중단된 실행의 손실은 하한값이므로 완주한 후보만 최적해 후보로 인정
+            completed = np.array([not r[1] for r in results])
+            if np.any(completed):
+                gen_best = np.argmin(np.where(completed, losses, np.inf))
+                if losses[gen_best] < best_loss:
+                    best_loss, best_unit = losses[gen_best], unit[gen_best].copy()
+
+            # 3. 평균 / 진화 경로 / 공분산 / 스텝 크기 갱신
+            order = np.argsort(losses)
+            selected = steps[order[:mu]]
+            step_w = weights @ selected
+            mean = mean + sigma * step_w
+
+            inv_sqrt_cov = basis @ np.diag(1.0 / axis_len) @ basis.T
+            p_sigma = (1 - cs) * p_sigma + np.sqrt(cs * (2 - cs) * mueff) * (inv_sqrt_cov @ step_w)
+            h_sigma = np.linalg.norm(p_sigma) / np.sqrt(1 - (1 - cs) ** (2 * (generation + 1))) / chi_n < 1.4 + 2 / (d + 1)
+            p_c = (1 - cc) * p_c + h_sigma * np.sqrt(cc * (2 - cc) * mueff) * step_w
+            rank_mu = (selected * weights[:, np.newaxis]).T @ selected
+            cov = (1 - c1 - cmu) * cov + c1 * (np.outer(p_c, p_c) + (1 - h_sigma) * cc * (2 - cc) * cov) + cmu * rank_mu
+            sigma *= np.exp((cs / damps) * (np.linalg.norm(p_sigma) / chi_n - 1))
+
+            if verbose:
+                n_stopped = int(np.sum(~completed))
+                print(f"[Gen {generation:>3}] best: {best_loss:.5f} | gen min: {losses.min():.5f} | σ: {sigma:.4f} | early-stopped: {n_stopped}/{lam}")
+
+            if sigma * np.sqrt(np.max(eigvals)) < tol:
+                break
+    finally:
+        if pool is not None: pool.shutdown()
+
+    return {
+        "best_params": {**start_params, **decode_params(best_unit, space)},
+        "best_loss": float(best_loss),
+        "history": pd.DataFrame(history),
+        "n_evaluations": len(history),
+        "elapsed_sec": time.time() - start_time,
+    }
+
+def simulated_series(logs, n_agents, targets):
+    """보정 결과 확인용: logs 를 targets 와 같은 해상도의 1인당 시계열로 변환"""
+    result = {}
+    for name, target in prepare_targets(targets).items():
+        tpp = target["ticks_per_point"]
+        series = SERIES_EXTRACTORS[name][0](logs, n_agents).reshape(-1, tpp)
+        result[name] = series.sum(axis=1) if target["how"] == "flow" else series.mean(axis=1)
+    return result
@@ -2,9 +2,10 @@ import pandas as pd
 import os
 
 # ==========================================
-# Initial Data Creator v1.5
+# Initial Data Creator v1.6
 # ==========================================
 # [Update Log]
+# - Ad_Slots: 활동 1틱(15분)당 광고 노출 슬롯 (광고 매출 계산용)
 # - Media_Group: 매체 상위 분류 추가 (GAME, VIDEO, BOOK 등)
 # - Fun_Reward / Growth_Reward: 보상 이원화 (재미 vs 성장)
 # - Difficulty: 진입 장벽 (숙련도 요구치)
@@ -22,60 +23,60 @@ def create_initial_csvs():
         {
             "ID": "ACT_GM_PVP", "Name": "PVP 랭킹전", "Category": "GAME", 
             "Media_Group": "GAME", "Intensity": 90, "Fun_Reward": 60.0, "Growth_Reward": 5.0, "Difficulty": 70, # 이기기 어려움
-            "Cost": 0, "Stress_Cost": 20.0, "Tags": "Competition|Skill"
+            "Cost": 0, "Stress_Cost": 20.0, "Tags": "Competition|Skill", "Ad_Slots": 1
         },
         {
             "ID": "ACT_GM_AUTO", "Name": "자동사냥(방치)", "Category": "GAME", 
             "Media_Group": "GAME", "Intensity": 15, "Fun_Reward": 10.0, "Growth_Reward": 2.0, "Difficulty": 5, # 매우 쉬움
-            "Cost": 0, "Stress_Cost": 0.0, "Tags": "Growth|RPG"
+            "Cost": 0, "Stress_Cost": 0.0, "Tags": "Growth|RPG", "Ad_Slots": 2
         },
         {
             "ID": "ACT_GM_GACHA", "Name": "아이템 뽑기", "Category": "GAME", 
             "Media_Group": "GAME", "Intensity": 40, "Fun_Reward": 100.0, "Growth_Reward": 0.0, "Difficulty": 5, # 돈만 있으면 됨
-            "Cost": 3000, "Stress_Cost": -5.0, "Tags": "Gambling|Collection"
+            "Cost": 3000, "Stress_Cost": -5.0, "Tags": "Gambling|Collection", "Ad_Slots": 0
         },
         
         # --- VIDEO (도파민 위주, 난이도 최하) ---
         {
             "ID": "ACT_MD_SHORT", "Name": "숏폼(틱톡/릴스)", "Category": "MEDIA", 
             "Media_Group": "VIDEO", "Intensity": 20, "Fun_Reward": 95.0, "Growth_Reward": -5.0, "Difficulty": 5, # 뇌 빼고 보기 가능
-            "Cost": 0, "Stress_Cost": 5.0, "Tags": "Humor|Trend"
+            "Cost": 0, "Stress_Cost": 5.0, "Tags": "Humor|Trend", "Ad_Slots": 4
         },
         {
             "ID": "ACT_MD_NETFLIX", "Name": "넷플릭스 정주행", "Category": "MEDIA", 
             "Media_Group": "VIDEO", "Intensity": 40, "Fun_Reward": 40.0, "Growth_Reward": 2.0, "Difficulty": 10, 
-            "Cost": 0, "Stress_Cost": -10.0, "Tags": "Story|Relax"
+            "Cost": 0, "Stress_Cost": -10.0, "Tags": "Story|Relax", "Ad_Slots": 0
         },
 
         # --- BOOK/STUDY (성장 위주, 난이도 최상) ---
         {
             "ID": "ACT_BK_STUDY", "Name": "전공 공부/독서", "Category": "WORK", 
             "Media_Group": "BOOK", "Intensity": 85, "Fun_Reward": 5.0, "Growth_Reward": 80.0, "Difficulty": 75, # 지능/배경지식 필요
-            "Cost": -10, "Stress_Cost": 25.0, "Tags": "Knowledge|Future"
+            "Cost": -10, "Stress_Cost": 25.0, "Tags": "Knowledge|Future", "Ad_Slots": 0
         },
         
         # --- COMM (중간 성격) ---
         {
             "ID": "ACT_CM_BOARD", "Name": "커뮤니티 눈팅", "Category": "COMM", 
             "Media_Group": "COMM", "Intensity": 35, "Fun_Reward": 20.0, "Growth_Reward": 5.0, "Difficulty": 20, # 밈 이해도 필요
-            "Cost": 0, "Stress_Cost": 5.0, "Tags": "Social|Info"
+            "Cost": 0, "Stress_Cost": 5.0, "Tags": "Social|Info", "Ad_Slots": 2
         },
 
         # --- LIFE ---
         {
             "ID": "ACT_LF_WORK", "Name": "집중 업무", "Category": "WORK", 
             "Media_Group": "WORK", "Intensity": 90, "Fun_Reward": 0.0, "Growth_Reward": 40.0, "Difficulty": 60,
-            "Cost": -200, "Stress_Cost": 30.0, "Tags": "Responsibility"
+            "Cost": -200, "Stress_Cost": 30.0, "Tags": "Responsibility", "Ad_Slots": 0
         },
         {
             "ID": "ACT_LF_REST", "Name": "멍때리기/휴식", "Category": "LIFE", 
             "Media_Group": "LIFE", "Intensity": 5, "Fun_Reward": 5.0, "Growth_Reward": 5.0, "Difficulty": 0,
-            "Cost": 0, "Stress_Cost": -20.0, "Tags": "Relax"
+            "Cost": 0, "Stress_Cost": -20.0, "Tags": "Relax", "Ad_Slots": 0
         },
     ]
     
     # 컬럼 순서 명시적 지정
-    cols = ["ID", "Name", "Category", "Media_Group", "Intensity", "Fun_Reward", "Growth_Reward", "Difficulty", "Cost", "Stress_Cost", "Tags"]
+    cols = ["ID", "Name", "Category", "Media_Group", "Intensity", "Fun_Reward", "Growth_Reward", "Difficulty", "Cost", "Stress_Cost", "Tags", "Ad_Slots"]
     df_act = pd.DataFrame(activities_data, columns=cols)
     df_act.to_csv('data/activities.csv', index=False, encoding='utf-8-sig')
     print("-> Updated: data/activities.csv with Media Hierarchy schema")
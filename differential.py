@@ -0,0 +1,257 @@
+import numpy as np
+import pandas as pd
+import argparse
+import contextlib
+import io
+import os
+import genesis
+import psy_sim_config
+import inference
+import engine
+import fused_utility
+
+# ==========================================
+# Differential Test Harness v1.0
+# ==========================================
+# [Update Log]
+# - Frozen Reference: 현재 calculate_utility / decide_actions_knapsack / process_gacha_mechanics / run_simulation 을 기준으로 고정
+# - Golden Files: 기준 출력(입력은 시드로 재생성)을 .npz 로 압축 저장 → 기준 자체가 바뀌었는지 확인
+# - Backends: 같은 시그니처의 대체 구현(청크/float32/병렬/캐시 등)을 고정 시드 + 상태 노이즈 주입 입력으로 기준과 비교
+# - Tolerances: 검사별 허용 오차를 선언 (마스크는 불일치 비율, 실수 배열은 rtol/atol)
+# ==========================================
+
+GOLDEN_PATH = os.path.join("golden", "reference.npz")
+CASE_SEEDS = (11, 23, 37)
+CASE_AGENTS = 256
+SIM_AGENTS = 200
+
+# 기준 구현 (백엔드 dict 에서 빠진 함수는 이것으로 채움)
+REFERENCE_BACKEND = {
+    "calculate_utility": inference.calculate_utility,
+    "decide_actions_knapsack": inference.decide_actions_knapsack,
+    "process_gacha_mechanics": engine.process_gacha_mechanics,
+    "run_simulation": engine.run_simulation,
+}
+
+# 검사별 허용 오차. 대체 백엔드는 필요한 항목만 느슨하게 덮어씀 (예: float32 → utility rtol 1e-5)
+DEFAULT_TOLERANCES = {
+    "utility": {"rtol": 1e-12, "atol": 1e-9},
+    "mask": {"max_mismatch_frac": 0.0},
+    "state": {"rtol": 1e-12, "atol": 1e-9},
+    "logs": {"rtol": 1e-9, "atol": 1e-6},
+}
+
+# run_simulation 에서 비교할 로그 (틱별 스칼라 시계열 + 활동별 누적)
+COMPARED_LOG_KEYS = [
+    "total_revenue", "avg_stress", "avg_dopamine", "avg_anxiety",
+    "active_agents", "gacha_pulls", "action_counts", "viral_trends"
+]
+
+# 비교할 에이전트 상태
+COMPARED_STATE_KEYS = list(engine.DYNAMIC_STATE_KEYS)
+GACHA_STATE_KEYS = ["state_stress", "state_dopamine", "gacha_pity_count", "recent_fail_streak"]
+
+# ------------------------------------------
+# Inputs (시드로 재생성 → golden 파일에는 출력만 저장)
+# ------------------------------------------
+def inject_state_noise(agents, rng, scale=1.0):
+    """
+    갓 생성된 인구는 상태가 거의 0 이라 분기(클리핑/천장/분노 베팅 등)를 못 타므로
+    동적 상태에 노이즈를 섞어 입력 공간을 넓힙니다. dtype 은 유지합니다.
+    """
+    n_agents = len(agents['ids'])
+    for key in ("state_stress", "state_dopamine", "state_anxiety"):
+        noisy = agents[key] + rng.normal(50.0, 30.0 * scale, agents[key].shape)
+        agents[key] = np.clip(noisy, 0, 100)
+    agents['media_boredom'] = np.clip(agents['media_boredom'] + rng.random(agents['media_boredom'].shape) * scale, 0, 1)
+    agents['interests'] = np.clip(agents['interests'] + rng.normal(0, 0.2 * scale, agents['interests'].shape), 0, 1)
+    agents['state_current_media'] = rng.integers(-1, inference.NUM_MEDIA_TYPES, (n_agents, 1)).astype(agents['state_current_media'].dtype)
+    agents['recent_fail_streak'] = rng.integers(0, 6, (n_agents, 1)).astype(agents['recent_fail_streak'].dtype)
+    agents['gacha_pity_count'] = rng.integers(0, 120, (n_agents, 1)).astype(agents['gacha_pity_count'].dtype)
+    return agents
+
+def make_agents(seed, n_agents, noise_scale=1.0):
+    np.random.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        agents = genesis.create_agent_population(n_agents)
+    if noise_scale: inject_state_noise(agents, np.random.default_rng(seed + 1), noise_scale)
+    return agents
+
+def make_time_context(agents, tick, workspace):
+    _, stress_table, _ = psy_sim_config.load_life_patterns()
+    return engine.build_time_context(agents, stress_table[tick], (tick * 15) // 60, workspace)
+
+def copy_agents(agents):
+    return {k: v.copy() if isinstance(v, np.ndarray) else v for k, v in agents.items()}
+
+# ------------------------------------------
+# Cases
+# ------------------------------------------
+def run_cases(backend=None, seeds=CASE_SEEDS, n_agents=CASE_AGENTS, sim_agents=SIM_AGENTS, noise_scale=1.0):
+    """
+    모든 검사 케이스를 backend 로 실행해 출력 배열 dict 를 반환합니다. {"<검사>/<시드>/<필드>": array}
+    backend: REFERENCE_BACKEND 와 같은 키의 dict (빠진 키는 기준 구현 사용)
+    """
+    backend = {**REFERENCE_BACKEND, **(backend or {})}
+    df_activities = psy_sim_config.load_activity_table()
+    act_tag_matrix = inference.precompute_activity_tags_matrix(df_activities)
+    act_media_matrix = inference.precompute_media_matrix(df_activities)
+    n_acts = len(df_activities)
+    outputs = {}
+
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+
+        # 1. Utility: 같은 시드의 Workspace RNG → 같은 노이즈
+        agents = make_agents(seed, n_agents, noise_scale)
+        ws = inference.create_workspace(n_agents, n_acts, act_tag_matrix.shape[1], seed=seed)
+        time_context = make_time_context(agents, int(rng.integers(0, 96)), ws)
+        viral_scores = rng.random((1, inference.NUM_MEDIA_TYPES))
+        utility = backend["calculate_utility"](
+            agents, df_activities, act_tag_matrix, act_media_matrix, time_context, viral_scores=viral_scores, workspace=ws
+        )
+        outputs[f"utility/{seed}/utility"] = np.array(utility, dtype=float)
+
+        # 2. Knapsack: 동점(반올림)과 음수 효용을 일부러 섞음
+        utility_in = np.round(rng.normal(0, 40 * noise_scale, (n_agents, n_acts)), 0)
+        ws = inference.create_workspace(n_agents, n_acts, act_tag_matrix.shape[1], seed=seed)
+        mask = backend["decide_actions_knapsack"](utility_in, df_activities, copy_agents(agents), workspace=ws)
+        outputs[f"knapsack/{seed}/mask"] = np.array(mask, dtype=bool)
+
+        # 3. Gacha: 무작위 행동 마스크 + 같은 시드 RNG 로 성공/실패 판정
+        gacha_agents = copy_agents(agents)
+        action_mask = rng.random((n_agents, n_acts)) < 0.3
+        ws = inference.create_workspace(n_agents, n_acts, act_tag_matrix.shape[1], seed=seed)
+        backend["process_gacha_mechanics"](gacha_agents, action_mask, df_activities, act_tag_matrix, workspace=ws)
+        for key in GACHA_STATE_KEYS:
+            if key in gacha_agents: outputs[f"gacha/{seed}/{key}"] = np.array(gacha_agents[key])
+
+        # 4. Full Day: 이벤트 포함, np.random 시드 고정
+        sim_agents_ = make_agents(seed, sim_agents, noise_scale)
+        events = {
+            int(rng.integers(20, 40)): {"Type": "VIRAL_BOOST", "Target": "VIDEO", "Value": 0.5},
+            56: {"Type": "SERVER_DOWN", "Target": "GAME", "Value": 0},
+            80: {"Type": "HOT_TIME", "Target": "GAME", "Value": 3.0},
+        }
+        np.random.seed(seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            logs = backend["run_simulation"](sim_agents_, df_activities, events=events)
+        for key in COMPARED_LOG_KEYS:
+            outputs[f"simulation/{seed}/log.{key}"] = np.asarray(logs[key], dtype=float)
+        for key in COMPARED_STATE_KEYS:
+            if key in sim_agents_: outputs[f"simulation/{seed}/{key}"] = np.array(sim_agents_[key])
+
+    return outputs
+
+# ------------------------------------------
+# Comparison
+# ------------------------------------------
+def _tolerance_group(name):
+    check, _, field = name.split("/", 2)
+    if check == "utility": return "utility"
+    if check == "knapsack": return "mask"
+    if field.startswith("log."): return "logs"
+    return "state"
+
+def compare_outputs(expected, actual, tolerances=None):
+    """
+    두 출력 dict 를 필드별로 비교합니다.
+
+    Returns:
+        pd.DataFrame: field, group, max_abs_err, max_rel_err, mismatches, passed
+    """
+    tolerances = {group: {**tol, **(tolerances or {}).get(group, {})} for group, tol in DEFAULT_TOLERANCES.items()}
+    rows = []
+    for name in sorted(set(expected) | set(actual)):
+        group = _tolerance_group(name)
+        row = {"field": name, "group": group, "max_abs_err": np.nan, "max_rel_err": np.nan, "mismatches": 0, "passed": False}
+        if name not in expected or name not in actual or np.shape(expected[name]) != np.shape(actual[name]):
+            row["mismatches"] = -1 # 누락 또는 모양 불일치
+            rows.append(row)
+            continue
+
+        exp, act = expected[name], actual[name]
+        if group == "mask":
+            row["mismatches"] = int(np.count_nonzero(exp != act))
+            row["passed"] = row["mismatches"] <= tolerances["mask"]["max_mismatch_frac"] * exp.size
+        else:
+            exp, act = exp.astype(float), act.astype(float)
+            abs_err = np.abs(exp - act)
+            tol = tolerances[group]
+            bad = abs_err > tol["atol"] + tol["rtol"] * np.abs(exp)
+            row["max_abs_err"] = float(abs_err.max()) if abs_err.size else 0.0
+            row["max_rel_err"] = float((abs_err / np.maximum(np.abs(exp), 1e-12)).max()) if abs_err.size else 0.0
+            row["mismatches"] = int(np.count_nonzero(bad))
+            row["passed"] = row["mismatches"] == 0
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def compare_backends(backend, tolerances=None, reference=None, **case_kwargs):
+    """backend 를 (현재) 기준 구현과 같은 입력으로 실행해 비교"""
+    expected = run_cases(reference, **case_kwargs)
+    actual = run_cases(backend, **case_kwargs)
+    return compare_outputs(expected, actual, tolerances)
+
+# ------------------------------------------
+# Golden Files
+# ------------------------------------------
+def record_golden(path=GOLDEN_PATH, backend=None):
+    """기준 출력 저장. 모델 동작을 의도적으로 바꾼 커밋에서만 다시 기록"""
+    outputs = run_cases(backend)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # bool/정수 상태는 원래 dtype 그대로 저장 (압축률 유지)
+    np.savez_compressed(path, **outputs)
+    return outputs
+
+def load_golden(path=GOLDEN_PATH):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+def check_golden(path=GOLDEN_PATH, backend=None, tolerances=None):
+    """backend (기본: 현재 기준 구현)의 출력을 golden 파일과 비교"""
+    return compare_outputs(load_golden(path), run_cases(backend), tolerances)
+
+# ------------------------------------------
+# Built-in Alternative Backends
+# ------------------------------------------
+def _fused_utility(*args, **kwargs):
+    # 작은 블록 + 여러 스레드로 블록 경계/병렬 경로까지 검사
+    return fused_utility.calculate_utility_fused(*args, block_rows=37, n_threads=4, **kwargs)
+
+def _fused_simulation(agents, df_activities, **kwargs):
+    return engine.run_simulation(agents, df_activities, fused_utility=True, **kwargs)
+
+# {이름: (backend dict, tolerances)} — 최적화 경로를 추가하면 여기 등록해 기본 실행에서 함께 검사
+BUILTIN_BACKENDS = {
+    "fused": ({"calculate_utility": _fused_utility, "run_simulation": _fused_simulation}, None),
+}
+
+def print_report(title, report):
+    n_failed = int((~report["passed"]).sum())
+    print(f"\n=== {title}: {len(report) - n_failed}/{len(report)} fields passed ===")
+    failed = report[~report["passed"]]
+    if len(failed): print(failed.to_string(index=False))
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential test harness (reference engine vs golden / alternative backends)")
+    parser.add_argument("--record", action="store_true", help="현재 기준 구현의 출력을 golden 파일로 다시 기록")
+    parser.add_argument("--golden", default=GOLDEN_PATH)
+    args = parser.parse_args()
+
+    if args.record:
+        outputs = record_golden(args.golden)
+        print(f"Recorded {len(outputs)} fields → {args.golden} ({os.path.getsize(args.golden) / 1024:.1f} KB)")
+        return
+
+    all_passed = True
+    report = check_golden(args.golden)
+    print_report("Reference vs Golden", report)
+    all_passed &= bool(report["passed"].all())
+    for name, (backend, tolerances) in BUILTIN_BACKENDS.items():
+        report = compare_backends(backend, tolerances)
+        print_report(f"Backend '{name}' vs Reference", report)
+        all_passed &= bool(report["passed"].all())
+    raise SystemExit(0 if all_passed else 1)
+
+if __name__ == "__main__":
+    main()
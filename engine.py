@@ -1,7 +1,18 @@
 import numpy as np
 import pandas as pd
+import copy
 import inference
 import psy_sim_config
+import tracer as agent_tracer
+import gacha
+import ads
+import sketches
+import segments as agent_segments
+import fused_utility as fused_kernel
+import rollup as log_rollup
+import genesis
+import population
+import telemetry as telemetry_mod
 
 # ==========================================
 # Simulation Engine v2.2 (Dynamic World) - Hotfix
@@ -10,53 +21,242 @@ import psy_sim_config
 # - Fixed KeyError: Added missing 'avg_dopamine' and 'avg_anxiety' logs
 # - Event System: 특정 틱에 전역 버프/디버프 적용
 # - Dynamic Modifiers: 활동의 보상/비용을 실시간으로 조작
+# - Workspace Arena: 틱 루프의 중간 배열을 실행 단위 버퍼로 재사용 (in-place 갱신)
+# - Active Set: 수면 등 비활성 Context 의 에이전트는 Idle Decay 만 적용, 활성 에이전트만 압축 계산
+# - Agent Tracer: 샘플 코호트의 틱별 상태/선택 활동 기록 (옵션)
+# - Distribution Sketches: 상태/지갑/누적 과금의 틱별 히스토그램 + p50/p90/p99
+# - Scenario Fork: fork_tick 에서 상태 스냅샷을 남기고 중단, resume_from 으로 스냅샷에서 이어서 실행
+# - Sim Params: 하드코딩된 가챠 확률 등을 params dict 로 조정 가능 (파라미터 스윕용)
+# - Multi-Banner Gacha: 배너 표(data/banners.csv) 기반 배너별 확률/천장/연차, 배너별 천장은 int16 행렬
+# - Compact Tag Space: 관심사/활동-태그 행렬 차원 = 인구의 관심사 열 수 (기본 len(TAG_LIST)), 큰 어휘는 희소 행렬
+# - Fused Utility: 효용 + Knapsack 가성비를 에이전트 블록 단위 한 패스로 계산 (옵션, 결과 동일)
+# - Ad Monetization: 활동별 광고 슬롯 × (틱, 패턴) 광고 효율 × 매체별 CPM → 광고 매출 (total_revenue 에 포함)
+# - Segment Cube: (틱, 세그먼트, 활동) 선택 수 / 과금을 루프 안에서 누적 (logs["segment_cube"], segments.query_cube 로 조회)
+# - Dynamic Population: 스트레스/지루함 지속 시 이탈, 일정에 따른 신규 코호트 온보딩 (live 인덱스 + 주기적 압축, logs["cohorts"])
+# - Common Random Numbers: crn_seed 를 주면 틱마다 (seed, tick) 으로 난수 흐름을 다시 시드 (A/B 짝 실행용, ab_test.py)
+# - Telemetry: 처리량 / 단계별 지연 / 최대 RSS / 진행률을 OpenMetrics·JSON-lines sink 로 발행 (옵션, 끄면 None 비교만)
+# - Log Rollup: 차트용 시계열의 다중 해상도 min/max/mean 피라미드를 틱마다 갱신 (logs["rollup"], rollup.query_series 로 조회)
 # ==========================================
 
-def process_gacha_mechanics(agents, action_mask, df_activities, act_tag_matrix):
-    # (기존 v2.1 로직 동일 - 생략 없이 포함)
-    n_agents = len(agents['ids'])
-    gambling_tag_idx = inference.TAG_TO_IDX.get("Gambling")
-    if gambling_tag_idx is None: return
-    
-    is_gacha_act = act_tag_matrix[:, gambling_tag_idx] > 0
-    gacha_actions_mask = action_mask[:, is_gacha_act]
-    did_gacha = np.any(gacha_actions_mask, axis=1)
+# run_simulation(params=...) 로 덮어쓸 수 있는 모델 상수
+DEFAULT_PARAMS = {
+    "gacha_base_prob": 0.05,  # 가챠 기본 성공 확률
+    "gacha_pity_step": 0.005, # 실패 1회당 성공 확률 증가 (천장)
+    "learning_rate": 0.001,   # 관심사 학습률 (LEARNING_RATE)
+    "viral_decay": 0.95,      # 틱당 유행 점수 감쇠
+    "inertia_weight": inference.INERTIA_WEIGHT,
+    "rage_weight": inference.RAGE_BET_WEIGHT,
+}
+
+# logs["rollup"] 에 누적하는 틱별 시계열 (+ pattern_stress [패턴], quantiles.<metric> [p50, p90, p99])
+ROLLUP_SERIES = ("total_revenue", "ad_revenue", "avg_stress", "avg_dopamine", "avg_anxiety", "active_agents", "gacha_pulls",
+                 "viral_trends", "ad_revenue_by_media", "ad_revenue_by_pattern")
+
+# 온보딩 코호트 Generator 시드 = [실행 시드, 틱, ONBOARDING_STREAM] (CRN 노이즈 [seed, tick] 과 다른 흐름)
+ONBOARDING_STREAM = 1
+
+# 이벤트 Modifier 가 틱마다 덮어쓰는 활동 컬럼 (run_simulation 종료 시 실행 전 값으로 복구)
+EVENT_MODIFIED_COLUMNS = ("Fun_Reward", "Difficulty")
+
+def process_gacha_mechanics(agents, action_mask, df_activities, act_tag_matrix, workspace=None, base_prob=DEFAULT_PARAMS["gacha_base_prob"], pity_step=DEFAULT_PARAMS["gacha_pity_step"], banners=None):
+    """
+    가챠 판정 (gacha.resolve_pulls 로 위임). 
+    banners: gacha.compile_banners 결과. None 이면 Gambling 태그 활동 = base_prob / pity_step 선형 천장 배너 하나 (v2.1 동작)
+
+    Returns:
+        did (np.array): [N, B] 배너별 뽑기 여부
+    """
+    if banners is None:
+        banners = gacha.compile_banners(gacha.legacy_banner_table(df_activities, base_prob, pity_step), df_activities)
+    return gacha.resolve_pulls(agents, action_mask, banners, workspace=workspace)
+
+
+LEARNING_RATE = DEFAULT_PARAMS["learning_rate"]
+
+# Active Set 압축 후 전체 인구로 되돌려 써야 하는 동적 상태
+DYNAMIC_STATE_KEYS = [
+    "state_stress", "state_dopamine", "state_anxiety", "state_current_media",
+    "media_boredom", "gacha_pity_count", "banner_pity", "recent_fail_streak", "wallet", "total_spent", "interests",
+]
+
+def gather_agents(agents, indices, buffers):
+    """indices 에 해당하는 에이전트만 buffers 앞부분에 모아 압축된 agents dict 를 반환합니다."""
+    n_active = len(indices)
+    active_agents = {}
+    for key, values in agents.items():
+        active_agents[key] = np.take(values, indices, axis=0, out=buffers[key][:n_active], mode='clip')
+    return active_agents
+
+def scatter_agents(agents, active_agents, indices):
+    """압축된 에이전트의 동적 상태를 전체 인구 배열에 되돌려 씁니다."""
+    for key in DYNAMIC_STATE_KEYS:
+        agents[key][indices] = active_agents[key]
+
+def take_snapshot(agents, tick, viral_scores, total_revenue, rng, logs, segment_ids=None, population_state=None, onboarding_seed=None):
+    """
+    tick 을 처리하기 직전의 시뮬레이션 상태를 저장합니다.
+    동적 상태(DYNAMIC_STATE_KEYS)만 한 번에 복사하고, 정적 속성(성향/패턴 등)은 원본을 그대로 공유합니다.
+    segment_ids: 실행 시작 시 정한 세그먼트 번호 (이어서 실행해도 같은 구간화를 쓰도록 함께 저장)
+    population_state: 동적 인구(churn / onboarding) 상태. 행 구성이 바뀌므로 저장소 전체를 복사
+    onboarding_seed: 온보딩 코호트 시드 (남은 코호트를 전체 실행과 같게 생성)
+    """
+    snapshot_logs = {k: v for k, v in logs.items() if k != "snapshot"}
+    return {
+        "tick": tick,
+        "agents": {k: agents[k].copy() for k in DYNAMIC_STATE_KEYS if k in agents},
+        "viral_scores": viral_scores.copy(),
+        "total_revenue": total_revenue,
+        "rng_state": rng.bit_generator.state,
+        "logs": copy.deepcopy(snapshot_logs),
+        "segment_ids": segment_ids.copy() if population_state is not None and segment_ids is not None else segment_ids,
+        "population": population.copy_population(population_state) if population_state is not None else None,
+        "onboarding_seed": onboarding_seed,
+    }
+
+def apply_idle_decay(agents, inactive_mask):
+    """
+    활동하지 않은 틱의 상태 변화 (빈 action_mask 로 State Update 를 돌린 것과 동일한 닫힌 형태)
+    도파민 -2.0, 불안 +0.5, 매체 지루함 -0.05
+    """
+    np.subtract(agents['state_dopamine'], 2.0, out=agents['state_dopamine'], where=inactive_mask)
+    np.clip(agents['state_dopamine'], 0, 100, out=agents['state_dopamine'])
+    np.add(agents['state_anxiety'], 0.5, out=agents['state_anxiety'], where=inactive_mask)
+    np.clip(agents['state_anxiety'], 0, 100, out=agents['state_anxiety'])
+    np.subtract(agents['media_boredom'], 0.05, out=agents['media_boredom'], where=inactive_mask)
+    np.clip(agents['media_boredom'], 0.0, 1.0, out=agents['media_boredom'])
+
+def build_time_context(agents, step_stress_mods, hour, workspace):
+    # Context Mapping: 패턴별 계수를 에이전트별 [N, 1] 로 펼침
+    # (광고 효율은 패턴 단위로 ads.tick_ad_metrics 에서 바로 쓰므로 에이전트별로 펼치지 않음)
+    agent_pattern_ids = agents['life_pattern'].ravel()
+    current_agent_stress_mod = workspace['stress_mod']
+    np.take(step_stress_mods, agent_pattern_ids, out=current_agent_stress_mod.ravel(), mode='clip')
+    return {
+        'Stress_Mod': current_agent_stress_mod, 
+        'Hour': hour
+    }
+
+def step_agents(agents, df_activities, act_tag_matrix, act_media_matrix, time_context, viral_scores, update_cols, dynamic_lr, workspace, params=DEFAULT_PARAMS, banners=None, fused_utility=False):
+    """
+    한 틱의 Perception → Decision → Gacha → State Update 를 agents 에 in-place 로 적용합니다.
+    agents 는 전체 인구이거나 Active Set 으로 압축된 부분 집합입니다.
+
+    Returns:
+        action_mask_f (np.array): [N, M] 선택 활동 (float)
+        agent_media_activity (np.array): [N, Media] 매체별 참여
+        revenue (float): 이번 틱 매출
+    """
+    ws = workspace
+
+    # 1. Perception & Decision (Modified Vectors)
+    ratios = None
+    if fused_utility:
+        ratios = ws['ratios']
+        utility_matrix = fused_kernel.calculate_utility_fused(
+            agents, df_activities, act_tag_matrix, act_media_matrix,
+            time_context, viral_scores=viral_scores, workspace=ws,
+            inertia_weight=params["inertia_weight"], rage_weight=params["rage_weight"], ratio_out=ratios
+        )
+    else:
+        utility_matrix = inference.calculate_utility(
+            agents, df_activities, act_tag_matrix, act_media_matrix, 
+            time_context, viral_scores=viral_scores, workspace=ws,
+            inertia_weight=params["inertia_weight"], rage_weight=params["rage_weight"]
+        )
+    action_mask = inference.decide_actions_knapsack(
+        utility_matrix, df_activities, agents, workspace=ws, ratios=ratios
+    )
+    action_mask_f = ws['action_mask_f']
+    np.copyto(action_mask_f, action_mask)
     
-    if not np.any(did_gacha): return
+    # ----------------------------------------
+    # [Gacha & Social Logic] (v2.1과 동일)
+    # ----------------------------------------
+    process_gacha_mechanics(
+        agents, action_mask, df_activities, act_tag_matrix, workspace=ws,
+        base_prob=params["gacha_base_prob"], pity_step=params["gacha_pity_step"], banners=banners
+    )
     
-    base_prob = 0.05
-    pity_bonus = agents['gacha_pity_count'][did_gacha] * 0.005
-    success_prob = base_prob + pity_bonus
+    agent_media_activity = np.dot(action_mask_f, act_media_matrix, out=ws['media_activity'])
     
-    roll = np.random.rand(np.sum(did_gacha), 1)
-    is_success = roll < success_prob
+    # ----------------------------------------
+    # State Update
+    # ----------------------------------------
+    money_spent = np.dot(action_mask_f, update_cols['money'], out=ws['col_a']) # 비용은 Base 사용
+    np.subtract(agents['wallet'], money_spent, out=agents['wallet'], casting='unsafe')
+    spent = np.maximum(money_spent, 0, out=ws['col_b'])
+    revenue = spent.sum()
+    agents['total_spent'] += spent
     
-    success_indices = np.where(did_gacha)[0][is_success.flatten()]
-    fail_indices = np.where(did_gacha)[0][~is_success.flatten()]
+    stress_change = np.dot(action_mask_f, update_cols['stress_cost'], out=ws['col_a'])
+    agents['state_stress'] += stress_change
+    np.clip(agents['state_stress'], 0, 100, out=agents['state_stress'])
     
-    if len(success_indices) > 0:
-        agents['state_dopamine'][success_indices] = 100.0
-        agents['state_stress'][success_indices] -= 30.0
-        agents['gacha_pity_count'][success_indices] = 0
-        agents['recent_fail_streak'][success_indices] = 0
-        
-    if len(fail_indices) > 0:
-        agents['state_stress'][fail_indices] += 20.0
-        agents['gacha_pity_count'][fail_indices] += 1
-        agents['recent_fail_streak'][fail_indices] += 1
-        agents['state_dopamine'][fail_indices] -= 5.0
+    # Needs Update (Modified Rewards 적용)
+    fun_gained = np.dot(action_mask_f, update_cols['fun'], out=ws['col_a'])
+    fun_gained *= 0.2
+    fun_gained -= 2.0
+    agents['state_dopamine'] += fun_gained
+    np.clip(agents['state_dopamine'], 0, 100, out=agents['state_dopamine'])
 
-    agents['state_stress'] = np.clip(agents['state_stress'], 0, 100)
-    agents['state_dopamine'] = np.clip(agents['state_dopamine'], 0, 100)
+    growth_gained = np.dot(action_mask_f, update_cols['growth'], out=ws['col_a'])
+    growth_gained *= 0.2
+    agents['state_anxiety'] -= growth_gained
+    agents['state_anxiety'] += 0.5
+    np.clip(agents['state_anxiety'], 0, 100, out=agents['state_anxiety'])
 
+    has_activity = np.greater(agent_media_activity.sum(axis=1, out=ws['col_a'].ravel()), 0, out=ws['has_activity'])
+    if np.any(has_activity):
+        primary_media_indices = np.argmax(agent_media_activity, axis=1, out=ws['primary_media'])
+        np.copyto(agents['state_current_media'], primary_media_indices[:, np.newaxis], where=has_activity[:, np.newaxis])
 
-def run_simulation(agents, df_activities, df_time_slots=None, events=None): 
+    # 활동 매체: +0.1, 비활동 매체: -0.05  →  +0.15 * active - 0.05
+    is_active_media = np.greater(agent_media_activity, 0, out=ws['media_active'])
+    boredom_delta = np.multiply(is_active_media, 0.15, out=ws['media_scratch'])
+    boredom_delta -= 0.05
+    agents['media_boredom'] += boredom_delta
+    np.clip(agents['media_boredom'], 0.0, 1.0, out=agents['media_boredom'])
+
+    experienced_tags = inference.tag_exposure(action_mask_f, act_tag_matrix, out=ws['tag_scratch'])
+    experienced_tags *= dynamic_lr
+    agents['interests'] += experienced_tags
+    np.clip(agents['interests'], 0.0, 1.0, out=agents['interests'])
+
+    return action_mask_f, agent_media_activity, revenue
+
+
+def run_simulation(agents, df_activities, df_time_slots=None, events=None, inactive_contexts=None, tracer=None, track_distributions=True, on_tick=None, fork_tick=None, resume_from=None, params=None, banners=None, segments=None, fused_utility=False, churn=None, onboarding=None, compact_every=population.DEFAULT_COMPACT_EVERY, crn_seed=None, telemetry=None): 
     """
     events: dict { tick: {"Type": str, "Target": str, "Value": float} }
+    inactive_contexts: 비활성으로 볼 Life Pattern Context 목록 (예: ("SLEEP",))
+                       지정하면 해당 틱의 에이전트는 Idle Decay 만 적용하고 효용/Knapsack 계산에서 제외
+    tracer: tracer.create_tracer() 로 만든 궤적 기록기. 매 틱 샘플 에이전트의 상태/선택 활동을 기록
+    track_distributions: True 이면 상태/지갑/누적 과금의 틱별 히스토그램·분위수 스케치를 logs 에 기록
+    on_tick: 매 틱 로그 기록 후 호출되는 콜백 on_tick(tick, logs). False 를 반환하면 시뮬레이션을 중단
+             (중단 시 logs["stopped_at_tick"] 에 마지막 틱 기록)
+    fork_tick: 이 틱을 처리하기 직전에 상태를 logs["snapshot"] 에 저장하고 중단 (scenarios.run_forked_scenarios 참고)
+    resume_from: fork_tick 으로 만든 스냅샷. 에이전트 동적 상태/유행 점수/매출/난수 상태/로그를 복원하고 스냅샷 틱부터 이어서 실행
+                 (events 는 전체 일정 기준 틱 번호 그대로 사용, 스냅샷 이전 틱의 이벤트는 무시됨)
+    params: DEFAULT_PARAMS 중 덮어쓸 값 (예: {"gacha_base_prob": 0.03})
+    banners: 배너 표 DataFrame (gacha.BANNER_COLUMNS). None 이면 data/banners.csv, 그것도 없으면
+             Gambling 태그 활동 하나짜리 기본 배너 (params 의 gacha_base_prob / gacha_pity_step 사용)
+    segments: 세그먼트 차원 목록 (segments.pattern_dimension() 등). None 이면 생활 패턴 × 지갑 10분위, False 이면 큐브를 만들지 않음
+              에이전트는 실행 시작 시점 값으로 한 번만 구간화됩니다.
+    fused_utility: True 이면 효용/가성비를 fused_utility 커널로 계산 (numba 가 있으면 numba, 없으면 NumPy 블록 루프)
+    churn: True 이면 population.DEFAULT_CHURN 규칙으로 이탈, dict 이면 규칙 일부를 덮어씀 (예: {"patience_ticks": 4})
+           이탈 에이전트는 다음 틱부터 효용/Knapsack 계산에서 빠지고 compact_every 틱마다 저장소에서 제거됩니다.
+    onboarding: { tick: 신규 에이전트 수 } 해당 틱 시작 시 genesis 로 만든 코호트를 일괄 추가
+                코호트 난수는 (실행 시드, 틱) 에서 유도 (crn_seed 가 있으면 그 값, 스냅샷에 저장 → 포크/재개해도 같은 코호트)
+    churn / onboarding 을 쓰면 실행 후 agents 는 남은 에이전트로 바뀌고, 코호트별 리텐션/LTV 는 logs["cohorts"] 에 기록됩니다.
+    (tracer 와 함께 쓸 수 없음)
+    telemetry: telemetry.create_telemetry(sinks) 로 만든 상태. 틱마다 단계별 시간을 재고 발행 간격마다 sink 로 보냄
+               (종료 시 status = done / stopped / forked, 예외면 failed 로 최종 발행 후 예외 전파, sink 는 호출자가 close_sinks 로 닫음)
+    crn_seed: 공통 난수(Common Random Numbers). 주면 매 틱 노이즈/가챠 난수를 (crn_seed, tick) 으로 다시 시드해서
+              이벤트/파라미터가 다른 실행끼리도 같은 틱·같은 행에 같은 난수를 씀 (앞 틱의 뽑기 수 차이가 뒤로 번지지 않음)
+    이벤트가 틱마다 덮어쓰는 df_activities 의 Fun_Reward / Difficulty 는 정상 종료든 예외든 실행 전 값으로 복구됩니다.
     """
-    n_agents = len(agents['ids'])
-    n_acts = len(df_activities)
-    
+    if telemetry is not None: telemetry_mod.start_run(telemetry)
+
     # Data Setup
     expected_cols = ['Fun_Reward', 'Growth_Reward', 'Difficulty']
     if not all(col in df_activities.columns for col in expected_cols):
@@ -64,7 +264,36 @@ def run_simulation(agents, df_activities, df_time_slots=None, events=None):
         if 'Growth_Reward' not in df_activities.columns: df_activities['Growth_Reward'] = 0.0
         if 'Difficulty' not in df_activities.columns: df_activities['Difficulty'] = 0
 
-    act_tag_matrix = inference.precompute_activity_tags_matrix(df_activities)
+    # 이벤트 Modifier 가 덮어쓰는 컬럼 (정상 종료 / 예외 모두 finally 에서 복구)
+    base_columns = {col: df_activities[col].values.copy() for col in EVENT_MODIFIED_COLUMNS}
+    try:
+        return _simulate(
+            agents, df_activities, df_time_slots, events, inactive_contexts, tracer, track_distributions, on_tick,
+            fork_tick, resume_from, params, banners, segments, fused_utility, churn, onboarding, compact_every,
+            crn_seed, telemetry
+        )
+    except Exception:
+        if telemetry is not None: telemetry_mod.finish_run(telemetry, "failed")
+        raise
+    finally:
+        for col, values in base_columns.items(): df_activities[col] = values
+
+
+def _simulate(agents, df_activities, df_time_slots, events, inactive_contexts, tracer, track_distributions, on_tick, fork_tick, resume_from, params, banners, segments, fused_utility, churn, onboarding, compact_every, crn_seed, telemetry):
+    """run_simulation 본체 (인자는 run_simulation 참고, 컬럼 복구 / failed 발행은 run_simulation 이 담당)"""
+    n_agents = len(agents['ids'])
+    n_acts = len(df_activities)
+    unknown_params = set(params or {}) - set(DEFAULT_PARAMS)
+    if unknown_params: raise ValueError(f"Unknown simulation params: {sorted(unknown_params)}")
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    dynamic_population = bool(churn) or bool(onboarding)
+    if dynamic_population and tracer is not None:
+        raise ValueError("tracer cannot be used with churn / onboarding (agent rows move on compaction)")
+    churn_params = population.churn_rules(**(churn if isinstance(churn, dict) else {})) if churn else None
+    onboarding = {int(t): int(n) for t, n in (onboarding or {}).items()}
+    
+    # 태그 차원은 인구의 관심사 열 수를 따름 (이전 버전 genesis 의 50열 인구 호환)
+    act_tag_matrix = inference.precompute_activity_tags_matrix(df_activities, num_tags=agents['interests'].shape[1])
     act_media_matrix = inference.precompute_media_matrix(df_activities)
     
     # [Base Vectors] 초기값 저장 (이벤트 끝나면 복구용)
@@ -74,34 +303,189 @@ def run_simulation(agents, df_activities, df_time_slots=None, events=None):
     base_vec_diff = df_activities['Difficulty'].values.reshape(1, -1)
     vec_stress_cost = df_activities['Stress_Cost'].values.reshape(1, -1)
 
-    _, stress_table, ad_eff_table = psy_sim_config.load_life_patterns()
+    # [Gacha] 배너 표 → 천장별 역CDF 조회 테이블 (실행당 한 번)
+    if banners is None: banners = psy_sim_config.load_banner_table()
+    if banners is None: banners = gacha.legacy_banner_table(df_activities, params["gacha_base_prob"], params["gacha_pity_step"])
+    compiled_banners = gacha.compile_banners(banners, df_activities)
+    gacha.ensure_banner_state(agents, compiled_banners)
+
+    df_patterns, stress_table, ad_eff_table = psy_sim_config.load_life_patterns()
     TOTAL_TICKS = len(stress_table)
 
+    # [Ads] 활동별 슬롯 / 매체별 CPM (실행당 한 번)
+    ad_table = ads.compile_ad_table(df_activities, act_media_matrix, psy_sim_config.load_ad_cpm_table())
+
+    # [Workspace] 틱마다 재사용할 버퍼 (정상 상태에서 [N, *] 크기 할당 없음)
+    # 동적 인구면 온보딩 일정 합계까지 미리 잡아 둠 (일정 안에서는 재할당 없음)
+    ws_rows = n_agents + sum(onboarding.values())
+    if resume_from is not None and resume_from.get("population") is not None: ws_rows = resume_from["population"]["capacity"]
+    ws = inference.create_workspace(ws_rows, n_acts, act_tag_matrix.shape[1], n_banners=compiled_banners["n_banners"], n_patterns=ad_eff_table.shape[1])
+    rows_ws = ws if not dynamic_population else None # agents 행 수에 맞춘 Workspace (동적 인구면 틱 루프에서 맞춤)
+    current_vec_fun = np.empty_like(base_vec_fun, dtype=float)
+    current_vec_diff = np.empty_like(base_vec_diff, dtype=float)
+    # 상태 갱신용 [M, 1] 열벡터 (float) - 행렬곱 out= 버퍼와 dtype 일치
+    update_cols = {
+        "money": base_vec_money.T.astype(float),
+        "growth": base_vec_growth.T.astype(float),
+        "stress_cost": vec_stress_cost.T.astype(float),
+        "fun": current_vec_fun.T, # 이벤트가 반영된 현재 재미 보상 (view)
+    }
+    agent_pattern_ids = agents['life_pattern'].ravel()
+    pattern_counts = np.bincount(agent_pattern_ids, minlength=4)
+    # 학습률은 정적 성향(Big5[0])에만 의존하므로 실행당 한 번만 계산
+    dynamic_lr = params["learning_rate"] * (1.0 + agents['traits_big5'][:, 0].reshape(-1, 1))
+
+    # 누적 과금액 (이전 버전 genesis 로 만든 인구 호환)
+    if 'total_spent' not in agents:
+        agents['total_spent'] = np.zeros((n_agents, 1))
+
+    # [Active Set] inactive_contexts 에 해당하는 틱에는 해당 패턴 에이전트를 계산에서 제외
+    inactive_table = None
+    if inactive_contexts:
+        inactive_table = psy_sim_config.build_inactive_table(df_patterns, inactive_contexts)
+        present_patterns = pattern_counts[:inactive_table.shape[1]] > 0
+        inactive_mask = np.empty((n_agents, 1), dtype=bool)
+    if inactive_contexts or dynamic_population:
+        active_buffers = {k: np.empty_like(v) for k, v in agents.items()}
+        active_lr = np.empty_like(dynamic_lr)
+        active_set_cache = {} # (비활성 패턴 조합) → (활성 인덱스, 압축 Workspace), 동적 인구면 행 구성이 바뀔 때 비움
+
     logs = {
         "time": [],
         "total_revenue": [],
         "avg_stress": [],
         "avg_dopamine": [], # [FIX] Added missing key
         "avg_anxiety": [],  # [FIX] Added missing key
+        "active_agents": [], # 틱별 활동을 하나 이상 고른 에이전트 수 (DAU 곡선 비교용)
+        "gacha_pulls": [],   # 틱별 가챠 뽑기 수 (연차는 뽑기 수만큼)
         "pattern_stress": {0:[], 1:[], 2:[], 3:[]}, # [FIX] Added missing key
+        "ad_revenue": [],             # 누적 광고 매출 (total_revenue 에 포함)
+        "ad_impressions_by_media": [], # 틱별 [Media] 광고 노출
+        "ad_revenue_by_media": [],     # 틱별 [Media] 광고 매출
+        "ad_revenue_by_pattern": [],   # 틱별 [Pattern] 광고 매출
         "action_counts": np.zeros(n_acts),
         "viral_trends": [],
-        "events": [] 
+        "events": [],
+        "distributions": {},          # {metric: [틱별 counts]}
+        "distribution_quantiles": {}, # {metric: {"p50": [], "p90": [], "p99": []}}
+        "distribution_specs": {},
+        "rollup": log_rollup.create_rollup(), # 차트용 다중 해상도 요약 (긴 실행에서도 조회 크기 고정)
     }
+    distribution_specs = sketches.default_distribution_specs() if track_distributions else {}
+    for metric, (_, spec) in distribution_specs.items():
+        logs["distributions"][metric] = []
+        logs["distribution_quantiles"][metric] = {"p50": [], "p90": [], "p99": []}
+        logs["distribution_specs"][metric] = spec
     total_revenue = 0
+    ad_revenue = 0
     viral_scores = np.zeros((1, inference.NUM_MEDIA_TYPES))
 
+    # [Segments] 에이전트 구간화는 실행당 한 번, 틱마다 결합 키 bincount 한 번
+    segment_ids = segment_key_base = None
+    segment_dims = segments or agent_segments.default_segment_dimensions()
+    if segments is not False:
+        if resume_from is not None and resume_from.get("segment_ids") is not None:
+            segment_ids = resume_from["segment_ids"]
+        else:
+            segment_ids, segment_levels = agent_segments.assign_segments(agents, segment_dims)
+            logs["segment_cube"] = agent_segments.create_cube(segment_levels, df_activities['ID'], base_vec_money.ravel(), TOTAL_TICKS)
+        segment_key_base = agent_segments.segment_key_base(segment_ids, n_acts)
+        active_key_base = np.empty_like(segment_key_base)
+
+    start_tick = 0
+    if resume_from is not None:
+        start_tick = resume_from["tick"]
+        if resume_from.get("population") is None:
+            for key, values in resume_from["agents"].items():
+                np.copyto(agents[key], values)
+        viral_scores = resume_from["viral_scores"].copy()
+        total_revenue = resume_from["total_revenue"]
+        ws['rng'].bit_generator.state = resume_from["rng_state"]
+        logs = copy.deepcopy(resume_from["logs"])
+        ad_revenue = logs["ad_revenue"][-1] if logs.get("ad_revenue") else 0
+
+    # [Population] 용량 행 저장소로 옮기고 agents 를 그 앞쪽 행 view 로 바꿈 (세그먼트 번호도 행과 함께 이동)
+    pop = None
+    onboarding_seed = None
+    if onboarding:
+        if resume_from is not None and resume_from.get("onboarding_seed") is not None: onboarding_seed = resume_from["onboarding_seed"]
+        elif crn_seed is not None: onboarding_seed = crn_seed
+        else: onboarding_seed = np.random.randint(0, 2**31 - 1)
+    if dynamic_population:
+        if resume_from is not None and resume_from.get("population") is not None:
+            pop = population.copy_population(resume_from["population"])
+        else:
+            row_arrays = {**agents, "segment_id": segment_ids} if segment_ids is not None else agents
+            pop = population.create_population(row_arrays, capacity=ws_rows, tick=start_tick)
+        caller_agents, agents = agents, population.rows_view(pop)
+        active_buffers = {k: np.empty_like(v) for k, v in pop["storage"].items()}
+        active_lr = np.empty((pop["capacity"], 1))
+        pop_version = None
+        for key in ("live_agents", "churned", "onboarded"):
+            logs.setdefault(key, [])
+
     print(f"Starting Simulation v2.2 (Dynamic) for {n_agents} agents...")
+    if telemetry is not None:
+        telemetry_mod.set_timeline(telemetry, TOTAL_TICKS, start_tick, pop["n_live"] if pop is not None else n_agents)
+        telemetry_mod.mark(telemetry, "setup")
     
-    for tick in range(TOTAL_TICKS):
+    for tick in range(start_tick, TOTAL_TICKS):
+        if tick == fork_tick:
+            logs["snapshot"] = take_snapshot(agents, tick, viral_scores, total_revenue, ws['rng'], logs, segment_ids, pop, onboarding_seed)
+            break
+
         hour = (tick * 15) // 60
+        if crn_seed is not None:
+            # Active Set 압축 Workspace 들도 같은 Generator 를 공유하므로 상태만 교체
+            ws['rng'].bit_generator.state = np.random.default_rng([crn_seed, tick]).bit_generator.state
+
+        # ----------------------------------------
+        # [Population] 온보딩 / 주기적 압축 → 행 구성이 바뀌면 행 단위 파생 배열을 다시 맞춤
+        # ----------------------------------------
+        if pop is not None:
+            tick_onboarded = onboarding.get(tick, 0)
+            if tick % compact_every == 0 or tick_onboarded:
+                population.compact(pop)
+            if tick_onboarded:
+                # 코호트는 (실행 시드, 틱) 전용 Generator 에서 생성 → 전역 난수 / 포크 지점과 무관하게 재현
+                cohort_rng = np.random.default_rng([onboarding_seed, tick, ONBOARDING_STREAM])
+                new_agents = genesis.create_agent_population(tick_onboarded, num_tags=agents['interests'].shape[1], rng=cohort_rng)
+                gacha.ensure_banner_state(new_agents, compiled_banners)
+                if segment_ids is not None:
+                    new_agents['segment_id'], _ = agent_segments.assign_segments(new_agents, segment_dims, logs["segment_cube"]["levels"])
+                population.onboard(pop, new_agents, tick)
+            if pop["version"] != pop_version:
+                pop_version = pop["version"]
+                if pop["capacity"] > ws["n_agents"]:
+                    # 일정 밖 추가로 저장소가 커진 경우만 버퍼 재할당 (노이즈 난수 흐름은 유지)
+                    rng = ws['rng']
+                    ws = inference.create_workspace(pop["capacity"], n_acts, act_tag_matrix.shape[1], seed=0, n_banners=compiled_banners["n_banners"], n_patterns=ad_eff_table.shape[1])
+                    ws['rng'] = rng
+                    active_buffers = {k: np.empty_like(v) for k, v in pop["storage"].items()}
+                    active_lr = np.empty((pop["capacity"], 1))
+                agents = population.rows_view(pop)
+                n_rows = pop["n_rows"]
+                rows_ws = inference.workspace_view(ws, n_rows)
+                agent_pattern_ids = agents['life_pattern'].ravel()
+                live_rows = population.live_indices(pop)
+                pattern_counts = np.bincount(agent_pattern_ids[live_rows], minlength=4)
+                dynamic_lr = params["learning_rate"] * (1.0 + agents['traits_big5'][:, 0].reshape(-1, 1))
+                if segment_ids is not None:
+                    segment_ids = agents['segment_id']
+                    segment_key_base = agent_segments.segment_key_base(segment_ids, n_acts)
+                    active_key_base = np.empty_like(segment_key_base)
+                if inactive_table is not None:
+                    present_patterns = pattern_counts[:inactive_table.shape[1]] > 0
+                    inactive_mask = np.empty((n_rows, 1), dtype=bool)
+                active_set_cache.clear()
+            if telemetry is not None: telemetry_mod.mark(telemetry, "population")
         
         # ----------------------------------------
         # [NEW] Event Processor
         # ----------------------------------------
         # 매 틱마다 Base Vector로 초기화 (이전 틱 효과 제거)
-        current_vec_fun = base_vec_fun.copy()
-        current_vec_diff = base_vec_diff.copy()
+        np.copyto(current_vec_fun, base_vec_fun)
+        np.copyto(current_vec_diff, base_vec_diff)
         
         event_msg = ""
         if events and tick in events:
@@ -131,98 +515,155 @@ def run_simulation(agents, df_activities, df_time_slots=None, events=None):
                     # 바이럴 마케팅: 유행 점수 강제 주입
                     viral_scores[0, target_media_idx] += evt.get("Value", 0.5)
 
-        # Context Mapping
-        step_stress_mods = stress_table[tick] 
-        step_ad_effs = ad_eff_table[tick]
-        agent_pattern_ids = agents['life_pattern'].flatten()
-        current_agent_stress_mod = step_stress_mods[agent_pattern_ids].reshape(-1, 1)
-        current_agent_ad_eff = step_ad_effs[agent_pattern_ids].reshape(-1, 1)
-        
-        time_context = {
-            'Stress_Mod': current_agent_stress_mod, 
-            'Ad_Efficiency': current_agent_ad_eff,
-            'Hour': hour
-        }
-        
-        # 1. Perception & Decision (Modified Vectors)
         # 임시 수정: inference.py가 df_activities를 참조하므로 값 덮어쓰기
         df_activities['Fun_Reward'] = current_vec_fun.flatten()
         df_activities['Difficulty'] = current_vec_diff.flatten()
-        
-        utility_matrix = inference.calculate_utility(
-            agents, df_activities, act_tag_matrix, act_media_matrix, 
-            time_context, viral_scores=viral_scores
-        )
-        action_mask = inference.decide_actions_knapsack(
-            utility_matrix, df_activities, agents
-        )
-        
-        # ----------------------------------------
-        # [Gacha & Social Logic] (v2.1과 동일)
-        # ----------------------------------------
-        process_gacha_mechanics(agents, action_mask, df_activities, act_tag_matrix)
-        
-        agent_media_participation = np.dot(action_mask.astype(float), act_media_matrix)
-        total_traffic = np.sum(agent_media_participation, axis=0).reshape(1, -1)
-        traffic_ratio = total_traffic / n_agents
-        viral_scores = (viral_scores * 0.95) + (traffic_ratio * 0.2)
-        
+        if telemetry is not None: telemetry_mod.mark(telemetry, "events")
+
         # ----------------------------------------
-        # State Update
+        # [Active Set] 수면/비활성 에이전트는 Idle Decay 만, 나머지만 압축해서 계산
         # ----------------------------------------
-        money_spent = (action_mask * base_vec_money).sum(axis=1).reshape(-1, 1) # 비용은 Base 사용
-        agents['wallet'] -= money_spent
-        total_revenue += np.sum(money_spent[money_spent > 0])
-        
-        stress_change = (action_mask * vec_stress_cost).sum(axis=1).reshape(-1, 1)
-        agents['state_stress'] = np.clip(agents['state_stress'] + stress_change, 0, 100)
-        
-        # Needs Update (Modified Rewards 적용)
-        fun_gained = (action_mask * current_vec_fun).sum(axis=1).reshape(-1, 1)
-        growth_gained = (action_mask * base_vec_growth).sum(axis=1).reshape(-1, 1)
-        
-        agents['state_dopamine'] = np.clip(agents['state_dopamine'] + (fun_gained * 0.2) - 2.0, 0, 100)
-        agents['state_anxiety'] = np.clip(agents['state_anxiety'] - (growth_gained * 0.2) + 0.5, 0, 100)
-
-        agent_media_activity = np.dot(action_mask.astype(float), act_media_matrix)
-        has_activity = agent_media_activity.sum(axis=1) > 0
-        if np.any(has_activity):
-            primary_media_indices = np.argmax(agent_media_activity, axis=1)
-            agents['state_current_media'][has_activity] = primary_media_indices[has_activity].reshape(-1, 1)
-
-        is_active_media = (agent_media_activity > 0).astype(float)
-        agents['media_boredom'] = np.clip(agents['media_boredom'] + (is_active_media * 0.1) - ((1.0 - is_active_media) * 0.05), 0.0, 1.0)
-
-        experienced_tags = np.dot(action_mask.astype(float), act_tag_matrix)
-        learning_rate = 0.001
-        dynamic_lr = learning_rate * (1.0 + agents['traits_big5'][:, 0].reshape(-1, 1))
-        agents['interests'] = np.clip(agents['interests'] + experienced_tags * dynamic_lr, 0.0, 1.0)
+        tick_agents, tick_ws, tick_lr = agents, rows_ws, dynamic_lr
+        active_indices = None
+        active_key = None
+        if inactive_table is not None:
+            tick_inactive = inactive_table[tick]
+            if np.any(tick_inactive[present_patterns]):
+                np.take(tick_inactive, agent_pattern_ids, out=inactive_mask.ravel(), mode='clip')
+                apply_idle_decay(agents, inactive_mask)
+                active_key = tick_inactive.tobytes()
+        # 이탈했지만 아직 압축 전인 행도 Active Set 처럼 계산에서 제외
+        dead_rows = pop is not None and population.has_dead_rows(pop)
+        if active_key is not None or dead_rows:
+            if active_key not in active_set_cache:
+                active_rows = ~inactive_mask.ravel() if active_key is not None else np.ones(n_rows, dtype=bool)
+                if dead_rows: active_rows &= pop["alive"][:n_rows]
+                active_indices = np.flatnonzero(active_rows)
+                active_set_cache[active_key] = (active_indices, inference.workspace_view(ws, len(active_indices)))
+            active_indices, tick_ws = active_set_cache[active_key]
+            if len(active_indices) > 0:
+                tick_agents = gather_agents(agents, active_indices, active_buffers)
+                tick_lr = np.take(dynamic_lr, active_indices, axis=0, out=active_lr[:len(active_indices)], mode='clip')
+            else:
+                tick_agents = None
+        if telemetry is not None: telemetry_mod.mark(telemetry, "active_set")
+
+        if tick_agents is not None:
+            time_context = build_time_context(tick_agents, stress_table[tick], hour, tick_ws)
+            action_mask_f, agent_media_activity, tick_revenue = step_agents(
+                tick_agents, df_activities, act_tag_matrix, act_media_matrix,
+                time_context, viral_scores, update_cols, tick_lr, tick_ws,
+                params=params, banners=compiled_banners, fused_utility=fused_utility
+            )
+            if tick_agents is not agents:
+                scatter_agents(agents, tick_agents, active_indices)
+            if telemetry is not None: telemetry_mod.mark(telemetry, "step")
+            # [Ads] 패턴 × 활동 선택 수 (행렬곱 한 번) → [패턴, 매체] 노출 / 매출
+            pattern_act_counts = ads.pattern_action_counts(action_mask_f, tick_agents['life_pattern'], tick_ws['pattern_onehot'])
+            ad_impressions, tick_ad_revenue = ads.tick_ad_metrics(ad_table, pattern_act_counts, ad_eff_table[tick])
+            total_revenue += tick_revenue + tick_ad_revenue.sum()
+            total_traffic = np.sum(agent_media_activity, axis=0).reshape(1, -1)
+            logs["action_counts"] += pattern_act_counts.sum(axis=0)
+            tick_active_agents = np.count_nonzero(tick_ws['has_activity'])
+            tick_gacha_pulls = int(np.count_nonzero(tick_ws['banner_did'], axis=0) @ compiled_banners["pulls"])
+            if segment_key_base is not None:
+                tick_key_base = segment_key_base
+                if tick_agents is not agents:
+                    tick_key_base = np.take(segment_key_base, active_indices, out=active_key_base[:len(active_indices)], mode='clip')
+                agent_segments.accumulate_tick(logs["segment_cube"], tick, action_mask_f, tick_key_base, tick_ws)
+        else:
+            total_traffic = np.zeros((1, inference.NUM_MEDIA_TYPES))
+            tick_active_agents = tick_gacha_pulls = 0
+            ad_impressions = tick_ad_revenue = np.zeros((ad_eff_table.shape[1], inference.NUM_MEDIA_TYPES))
+
+        if telemetry is not None: telemetry_mod.mark(telemetry, "aggregate")
+
+        if tracer is not None:
+            tick_action_mask = tick_ws['action_mask'] if tick_agents is not None else None
+            agent_tracer.record_tick(tracer, agents, tick, tick_action_mask, active_indices)
+
+        # [Population] 틱 끝 상태로 이탈 판정. 로그 통계는 살아 있는 에이전트만 (압축 전이면 live 행만 모음)
+        stat_agents, stat_pattern_ids, stat_pattern_counts, n_stat = agents, agent_pattern_ids, pattern_counts, n_agents
+        if pop is not None:
+            tick_churned = len(population.update_churn(pop, agents, churn_params)) if churn_params else 0
+            n_stat = pop["n_live"]
+            if population.has_dead_rows(pop):
+                live_rows = population.live_indices(pop)
+                stat_keys = {"state_stress", "state_dopamine", "state_anxiety", "life_pattern", *(key for key, _ in distribution_specs.values())}
+                stat_agents = {key: agents[key][live_rows] for key in stat_keys}
+                stat_pattern_ids = stat_agents['life_pattern'].ravel()
+                stat_pattern_counts = np.bincount(stat_pattern_ids, minlength=4)
+
+        # [Social] 유행 점수 갱신 (비활성 에이전트는 트래픽 0)
+        traffic_ratio = total_traffic / max(n_stat, 1)
+        viral_scores = (viral_scores * params["viral_decay"]) + (traffic_ratio * 0.2)
         
         # Logs
         logs["time"].append(f"{hour:02d}:{tick%4*15:02d}")
         logs["total_revenue"].append(total_revenue)
-        logs["avg_stress"].append(np.mean(agents['state_stress']))
-        logs["avg_dopamine"].append(np.mean(agents['state_dopamine'])) # [FIX] Added
-        logs["avg_anxiety"].append(np.mean(agents['state_anxiety']))   # [FIX] Added
-        logs["action_counts"] += action_mask.sum(axis=0)
+        logs["avg_stress"].append(np.mean(stat_agents['state_stress']))
+        logs["avg_dopamine"].append(np.mean(stat_agents['state_dopamine'])) # [FIX] Added
+        logs["avg_anxiety"].append(np.mean(stat_agents['state_anxiety']))   # [FIX] Added
+        logs["active_agents"].append(tick_active_agents)
+        logs["gacha_pulls"].append(tick_gacha_pulls)
+        ad_revenue += tick_ad_revenue.sum()
+        logs["ad_revenue"].append(ad_revenue)
+        logs["ad_impressions_by_media"].append(ad_impressions.sum(axis=0))
+        logs["ad_revenue_by_media"].append(tick_ad_revenue.sum(axis=0))
+        logs["ad_revenue_by_pattern"].append(tick_ad_revenue.sum(axis=1))
         logs["viral_trends"].append(viral_scores.flatten().copy())
+        if pop is not None:
+            logs["live_agents"].append(n_stat)
+            logs["churned"].append(tick_churned)
+            logs["onboarded"].append(tick_onboarded)
 
-        # [FIX] Pattern Stress Logging
+        # [Distributions] 평균 대신 꼬리까지 보는 틱별 스케치 (N 크기 버퍼 재사용)
+        for metric, (agent_key, spec) in distribution_specs.items():
+            counts = sketches.sketch_counts(spec, stat_agents[agent_key], scratch=ws['col_a'][:n_stat].ravel(), index_scratch=ws['sketch_index'][:n_stat])
+            p50, p90, p99 = sketches.sketch_quantiles(spec, counts, (0.5, 0.9, 0.99))
+            logs["distributions"][metric].append(counts)
+            logs["distribution_quantiles"][metric]["p50"].append(p50)
+            logs["distribution_quantiles"][metric]["p90"].append(p90)
+            logs["distribution_quantiles"][metric]["p99"].append(p99)
+
+        # [FIX] Pattern Stress Logging (bincount 한 번으로 패턴별 합계)
+        pattern_stress_sum = np.bincount(stat_pattern_ids, weights=stat_agents['state_stress'].ravel(), minlength=4)
         for pid in range(4):
-            mask = (agents['life_pattern'] == pid).flatten()
-            if np.any(mask):
-                avg_s = np.mean(agents['state_stress'][mask])
-                logs["pattern_stress"][pid].append(avg_s)
+            if stat_pattern_counts[pid] > 0:
+                logs["pattern_stress"][pid].append(pattern_stress_sum[pid] / stat_pattern_counts[pid])
             else:
                 logs["pattern_stress"][pid].append(0)
+
+        # [Rollup] 차트 시계열을 다중 해상도 버킷에 누적 (레벨별 마지막 버킷만 갱신)
+        rollup_values = {name: logs[name][-1] for name in ROLLUP_SERIES}
+        rollup_values["pattern_stress"] = [logs["pattern_stress"][pid][-1] for pid in range(4)]
+        if pop is not None:
+            for name in ("live_agents", "churned", "onboarded"): rollup_values[name] = logs[name][-1]
+        for metric, bands in logs["distribution_quantiles"].items():
+            rollup_values[f"quantiles.{metric}"] = [bands["p50"][-1], bands["p90"][-1], bands["p99"][-1]]
+        log_rollup.append_tick(logs["rollup"], rollup_values)
         
         if tick % 16 == 0:
             extra_info = f" | {event_msg}" if event_msg else ""
             print(f"[{logs['time'][-1]}] Rev: {total_revenue:,.0f}{extra_info}")
 
-    # Restore DF (Clean up)
-    df_activities['Fun_Reward'] = base_vec_fun.flatten()
-    df_activities['Difficulty'] = base_vec_diff.flatten()
+        if telemetry is not None:
+            telemetry_mod.mark(telemetry, "logs")
+            telemetry_mod.end_tick(telemetry, tick, n_stat, total_revenue)
+
+        if on_tick is not None and on_tick(tick, logs) is False:
+            logs["stopped_at_tick"] = tick
+            break
+        if telemetry is not None and on_tick is not None: telemetry_mod.mark(telemetry, "callback")
+
+    # [Population] 마지막으로 압축하고 호출자의 agents 를 남은 에이전트로 갱신
+    if pop is not None:
+        population.compact(pop)
+        caller_agents.update({k: v for k, v in population.rows_view(pop).items() if k != "segment_id"})
+        logs["cohorts"] = population.cohort_table(pop)
+
+    if telemetry is not None:
+        telemetry_mod.finish_run(telemetry, "forked" if "snapshot" in logs else "stopped" if "stopped_at_tick" in logs else "done")
 
     print("Simulation v2.2 (Dynamic) Complete.")
     return logs
\ No newline at end of file
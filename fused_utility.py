@@ -0,0 +1,203 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+import inference
+
+# ==========================================
+# Fused Utility Kernel v1.0
+# ==========================================
+# [Update Log]
+# - Fused Pass: calculate_utility 의 원소별 항(가중치/관심/난이도/관성/포화/소셜/분노 베팅/고통/노이즈)을
+#   에이전트 블록 단위로 한 번에 계산 → [N, M] 을 항마다 다시 읽고 쓰지 않음
+# - Backends: numba 가 있으면 원소 단위 병렬 커널(prange), 없으면 NumPy 블록 루프 (블록 = 캐시 크기, 스레드 풀)
+# - Knapsack Ratio: 가성비(utility / intensity)도 같은 패스에서 계산 (decide_actions_knapsack(ratios=...))
+# - Exact: 원소별 연산 순서가 calculate_utility 와 같아서 결과가 비트 단위로 동일 (differential.py "fused" 백엔드)
+# ==========================================
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+FUSED_BACKEND = "numba" if numba is not None else "numpy"
+
+# NumPy 블록 하나의 [rows, M] 버퍼 크기 (u + 항 버퍼가 L2 에 머무르도록)
+BLOCK_BYTES = 256 * 1024
+
+def activity_columns(df_activities, act_tag_matrix, act_media_matrix, viral_scores=None, inertia_weight=inference.INERTIA_WEIGHT):
+    """
+    활동별 [1, M] 계수 (calculate_utility 와 같은 값). 틱마다 한 번, M 크기만 계산합니다.
+    """
+    n_acts = len(df_activities)
+    as_row = lambda values: np.ascontiguousarray(values, dtype=float).reshape(1, -1)
+    is_video_act = act_media_matrix[:, inference.MEDIA_TO_IDX.get("VIDEO", 1)].reshape(1, -1)
+    inertia_table = np.zeros((inference.NUM_MEDIA_TYPES + 1, n_acts))
+    inertia_table[:inference.NUM_MEDIA_TYPES] = act_media_matrix.T * inertia_weight
+
+    gambling_tag_idx = inference.TAG_TO_IDX.get("Gambling", -1)
+    intensities = df_activities['Intensity'].values.astype(float).reshape(1, -1) if 'Intensity' in df_activities.columns else np.ones((1, n_acts))
+    safe_intensities = intensities.copy()
+    safe_intensities[safe_intensities == 0] = 0.1
+    has_media = act_media_matrix.any(axis=1)
+    return {
+        "fun": as_row(df_activities.get('Fun_Reward', pd.Series(0)).values),
+        "growth": as_row(df_activities.get('Growth_Reward', pd.Series(0)).values),
+        "diff": as_row(df_activities.get('Difficulty', pd.Series(0)).values),
+        "stress_cost": as_row(df_activities['Stress_Cost'].values),
+        "money_pain": as_row(df_activities['Cost'].values.reshape(1, -1) * 0.001),
+        "sat_coef": as_row(np.where(is_video_act > 0, 2.0 * 0.5, 2.0)),
+        "inertia_table": inertia_table,
+        "viral": as_row(np.dot(viral_scores, act_media_matrix.T)) if viral_scores is not None else None,
+        "gambling": as_row(inference.activity_tag_column(act_tag_matrix, gambling_tag_idx)) if gambling_tag_idx != -1 else None,
+        "safe_intensity": safe_intensities,
+        # 활동의 매체 번호 (매체 없음 = -1): 포화 페널티 = media_boredom[i, 매체]
+        "media_idx": np.where(has_media, np.argmax(act_media_matrix, axis=1), -1).astype(np.int64),
+    }
+
+# ------------------------------------------
+# NumPy Block Backend
+# ------------------------------------------
+def _numpy_block(rows, out, affinity, noise, ratio_out, agents, cols, act_media_matrix, stress_mod, rage_weight):
+    """rows = (시작, 끝) 에이전트 블록. calculate_utility 와 같은 순서의 연산을 블록 안에서만 수행"""
+    sl = slice(*rows)
+    u = out[sl]
+    t = np.empty_like(u)
+
+    w_fun = np.subtract(100.0, agents['state_dopamine'][sl])
+    w_fun /= 100.0
+    np.clip(w_fun, 0.1, 2.0, out=w_fun)
+    w_growth = np.divide(agents['state_anxiety'][sl], 20.0)
+    w_growth += 1.0
+    np.multiply(cols['fun'], w_fun, out=u)
+    np.multiply(cols['growth'], w_growth, out=t)
+    u += t
+    np.add(affinity[sl], 1.0, out=t)
+    u *= t
+
+    np.subtract(cols['diff'], agents['traits_intel'][sl], out=t)
+    np.maximum(t, 0, out=t)
+    t *= 1.5
+    u -= t
+    np.take(cols['inertia_table'], agents['state_current_media'][sl].ravel(), axis=0, out=t, mode='wrap')
+    u += t
+    np.dot(agents['media_boredom'][sl], act_media_matrix.T, out=t)
+    t *= cols['sat_coef']
+    u -= t
+
+    if cols['viral'] is not None:
+        extraversion_weight = np.multiply(agents['traits_big5'][sl, 2:3], 5.0)
+        np.multiply(cols['viral'], extraversion_weight, out=t)
+        u += t
+    if cols['gambling'] is not None:
+        rage_factor = np.multiply(agents['recent_fail_streak'][sl], agents['gambler_fallacy'][sl])
+        rage_factor *= rage_weight
+        np.multiply(rage_factor, cols['gambling'], out=t)
+        u += t
+
+    stress_weight = np.multiply(agents['state_stress'][sl], 0.01)
+    stress_weight += 1.0
+    np.multiply(cols['stress_cost'], stress_mod[sl], out=t)
+    t *= stress_weight
+    t += cols['money_pain']
+    t *= agents['loss_aversion'][sl]
+    u -= t
+
+    np.multiply(noise[sl], 2.0, out=t)
+    u += t
+    if ratio_out is not None: np.divide(u, cols['safe_intensity'], out=ratio_out[sl])
+
+# ------------------------------------------
+# Numba Backend
+# ------------------------------------------
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _numba_kernel(out, affinity, noise, ratio_out, with_ratio,
+                      fun, growth, diff, stress_cost, money_pain, sat_coef, inertia_table, viral, gambling, safe_intensity, media_idx,
+                      dopamine, anxiety, intel, current_media, boredom, extraversion, fail_streak, gambler_fallacy, stress, loss_aversion,
+                      stress_mod, rage_weight):
+        n_agents, n_acts = out.shape
+        n_media = inertia_table.shape[0] - 1
+        for i in numba.prange(n_agents):
+            w_fun = min(max((100.0 - dopamine[i]) / 100.0, 0.1), 2.0)
+            w_growth = anxiety[i] / 20.0 + 1.0
+            media_row = current_media[i] if current_media[i] >= 0 else n_media
+            extraversion_weight = extraversion[i] * 5.0
+            rage_factor = fail_streak[i] * gambler_fallacy[i] * rage_weight
+            stress_weight = stress[i] * 0.01 + 1.0
+            for j in range(n_acts):
+                u = fun[j] * w_fun
+                u = u + growth[j] * w_growth
+                u = u * (affinity[i, j] + 1.0)
+                u = u - max(diff[j] - intel[i], 0.0) * 1.5
+                u = u + inertia_table[media_row, j]
+                saturation = boredom[i, media_idx[j]] if media_idx[j] >= 0 else 0.0
+                u = u - saturation * sat_coef[j]
+                u = u + viral[j] * extraversion_weight
+                u = u + rage_factor * gambling[j]
+                u = u - ((stress_cost[j] * stress_mod[i]) * stress_weight + money_pain[j]) * loss_aversion[i]
+                u = u + noise[i, j] * 2.0
+                out[i, j] = u
+                if with_ratio: ratio_out[i, j] = u / safe_intensity[j]
+
+def _run_numba(out, affinity, noise, ratio_out, agents, cols, stress_mod, rage_weight):
+    n_acts = out.shape[1]
+    zeros = np.zeros(n_acts)
+    flat = lambda values: values.ravel().astype(float)
+    _numba_kernel(
+        out, affinity, noise, ratio_out if ratio_out is not None else out, ratio_out is not None,
+        cols['fun'].ravel(), cols['growth'].ravel(), cols['diff'].ravel(), cols['stress_cost'].ravel(), cols['money_pain'].ravel(),
+        cols['sat_coef'].ravel(), cols['inertia_table'],
+        cols['viral'].ravel() if cols['viral'] is not None else zeros,
+        cols['gambling'].ravel() if cols['gambling'] is not None else zeros,
+        cols['safe_intensity'].ravel(), cols['media_idx'],
+        flat(agents['state_dopamine']), flat(agents['state_anxiety']), flat(agents['traits_intel']),
+        agents['state_current_media'].ravel().astype(np.int64), np.ascontiguousarray(agents['media_boredom'], dtype=float),
+        np.ascontiguousarray(agents['traits_big5'][:, 2]), flat(agents['recent_fail_streak']), flat(agents['gambler_fallacy']),
+        flat(agents['state_stress']), flat(agents['loss_aversion']), flat(stress_mod), float(rage_weight)
+    )
+
+# ------------------------------------------
+# Entry Point
+# ------------------------------------------
+def calculate_utility_fused(agents, df_activities, act_tag_matrix, act_media_matrix, time_context, viral_scores=None, out=None, workspace=None,
+                            inertia_weight=inference.INERTIA_WEIGHT, rage_weight=inference.RAGE_BET_WEIGHT,
+                            ratio_out=None, backend=None, n_threads=None, block_rows=None):
+    """
+    inference.calculate_utility 와 같은 입력/출력 (결과 비트 단위 동일).
+
+    ratio_out: [N, M] 버퍼를 주면 Knapsack 가성비(utility / intensity)도 같은 패스에서 채움
+    backend: "numba" | "numpy" (기본 FUSED_BACKEND)
+    n_threads: NumPy 블록 루프 스레드 수 (기본 CPU 수, NumPy 연산은 GIL 을 놓음)
+    block_rows: NumPy 블록 행 수 (기본: [rows, M] float 버퍼가 BLOCK_BYTES 가 되도록)
+    """
+    n_agents = len(agents['ids'])
+    n_acts = len(df_activities)
+    backend = backend or FUSED_BACKEND
+    if out is None: out = inference.get_buffer(workspace, 'utility', (n_agents, n_acts))
+    cols = activity_columns(df_activities, act_tag_matrix, act_media_matrix, viral_scores, inertia_weight)
+
+    # 행렬곱(관심 점수)과 노이즈는 전체에 대해 한 번 (BLAS / 같은 난수 흐름 유지)
+    # 관심 점수는 ratio 버퍼를 빌려 씀: 각 원소의 가성비는 그 원소의 관심 점수를 읽은 뒤에 쓰여짐
+    affinity = ratio_out if ratio_out is not None else inference.get_buffer(workspace, 'ratios', (n_agents, n_acts))
+    inference.tag_affinity(agents['interests'], act_tag_matrix, out=affinity)
+    noise = inference.get_buffer(workspace, 'scratch', (n_agents, n_acts))
+    if workspace is not None: workspace['rng'].standard_normal(out=noise)
+    else: noise[:] = np.random.normal(0, 1.0, size=(n_agents, n_acts))
+    stress_mod = time_context['Stress_Mod']
+
+    if backend == "numba":
+        if numba is None: raise ImportError("numba is required for the 'numba' fused utility backend")
+        _run_numba(out, affinity, noise, ratio_out, agents, cols, stress_mod, rage_weight)
+        return out
+
+    block_rows = block_rows or max(1, BLOCK_BYTES // (8 * max(n_acts, 1)))
+    blocks = [(start, min(start + block_rows, n_agents)) for start in range(0, n_agents, block_rows)]
+    n_threads = n_threads or os.cpu_count() or 1
+    run_block = lambda rows: _numpy_block(rows, out, affinity, noise, ratio_out, agents, cols, act_media_matrix, stress_mod, rage_weight)
+    if n_threads == 1 or len(blocks) == 1:
+        for rows in blocks: run_block(rows)
+    else:
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            list(pool.map(run_block, blocks))
+    return out
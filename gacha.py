@@ -0,0 +1,362 @@
+import numpy as np
+import pandas as pd
+import inference
+
+# ==========================================
+# Gacha Engine v1.0 (Multi-Banner)
+# ==========================================
+# [Update Log]
+# - Banner Table: 배너별 기본 확률 / 소프트 천장(시작, 증가폭) / 하드 천장 / 1회 행동당 뽑기 수(10연차 등)
+# - Per-Banner Pity: 에이전트 × 배너 천장 스택을 int16 행렬(agents['banner_pity'])로 저장
+# - Inverse-CDF Lookup: (배너, 현재 천장) 마다 "k연차 결과(성공 수, 마지막 성공 후 실패 수)" 누적분포를 미리 계산
+#   → 틱마다 모든 (에이전트, 배너) 뽑기를 searchsorted 한 번으로 판정
+# - Zero-Alloc Pulls: 뽑은 쌍 압축 / 조회 키 / 에이전트 구간 합산을 Workspace 뽑기 풀(pull_pool)에서 out= 로 계산
+#   (searchsorted 만 SEARCH_CHUNK 개씩 임시 결과) → 틱당 할당이 N 과 무관
+# - Pull Pool: 뽑기 버퍼는 [N×B] 대신 이번 틱 뽑기 수만큼 (모자랄 때만 두 배로 늘림), 난수는 ROLL_CHUNK 칸씩 뽑아 바로 압축
+# - Legacy: 배너 표가 없으면 Gambling 태그 활동 전체를 1연차 배너 하나로 취급 (v2.1 과 같은 결과)
+# - Linear-Time CDF: 첫 성공 시점으로 분해해 결과 분포를 O(H·k) 로 계산 (천장 32767 / 확률 증가 0 배너도 즉시), 표 크기 상한 검사
+# ==========================================
+
+# 뽑기 결과가 상태에 주는 영향 (v2.1 과 동일)
+SUCCESS_DOPAMINE = 100.0  # 성공 시 도파민 (덮어쓰기)
+SUCCESS_STRESS = -30.0
+FAIL_DOPAMINE = -5.0
+FAIL_STRESS = 20.0
+
+BANNER_COLUMNS = ["Banner_ID", "Activity_IDs", "Base_Rate", "Soft_Pity_Start", "Soft_Pity_Step", "Hard_Pity", "Pulls"]
+
+# 난수 정밀도: rng.random() 의 53비트 정수를 그대로 비교 (행 번호를 상위 비트에 붙여 한 배열로 검색)
+RANDOM_BITS = 53
+MAX_ROW_BITS = 10
+SEARCH_CHUNK = 4096 # searchsorted 한 번에 검색할 키 수 (임시 결과 배열 크기 상한)
+ROLL_CHUNK = 65536 # 난수를 한 번에 뽑는 (에이전트, 배너) 칸 수 → 난수 버퍼 크기 상한 (뽑는 순서는 [N, B] 전체와 같음)
+MAX_CDF_ENTRIES = 1 << 24 # 전체 배너 CDF 표 크기 상한 (Σ Hard_Pity × (Pulls² + 1), int64 키 기준 128 MiB)
+
+def legacy_banner_table(df_activities, base_prob=0.05, pity_step=0.005):
+    """Gambling 태그 활동 전체 = 선형 천장(base + step × pity) 1연차 배너 하나"""
+    act_ids = [aid for aid, tags in zip(df_activities['ID'], df_activities['Tags']) if "Gambling" in (tags or [])]
+    # 하드 천장 = 선형 확률이 처음으로 1 이상이 되는 스택 + 1 (그 스택부터 확정 성공)
+    hard_pity = 32767
+    if pity_step > 0:
+        reaches_one = np.flatnonzero(np.arange(32766) * pity_step + base_prob >= 1.0)
+        if len(reaches_one): hard_pity = int(reaches_one[0]) + 1
+    return pd.DataFrame([{
+        "Banner_ID": "LEGACY", "Activity_IDs": "|".join(act_ids), "Base_Rate": base_prob,
+        "Soft_Pity_Start": 0, "Soft_Pity_Step": pity_step, "Hard_Pity": min(hard_pity, 32767), "Pulls": 1
+    }], columns=BANNER_COLUMNS)
+
+def pull_success_probs(base_rate, soft_pity_start, soft_pity_step, hard_pity):
+    """
+    천장 스택 p (0 ~ hard_pity-1) 에서 다음 1회 뽑기의 성공 확률 [hard_pity]
+    마지막 스택(hard_pity-1)은 확정 성공
+    """
+    pity = np.arange(hard_pity)
+    probs = np.maximum(pity - soft_pity_start, 0) * float(soft_pity_step)
+    probs += base_rate
+    np.clip(probs, 0.0, 1.0, out=probs)
+    probs[-1] = 1.0
+    return probs
+
+def build_outcome_cdf(probs, pulls):
+    """
+    시작 천장별 k연차 결과의 누적분포 [H, k*k + 1]
+
+    결과 상태 번호 (성공 결과가 앞쪽 → 1연차에서 u < q 이면 성공으로 기존 판정과 일치):
+        성공 s 회 (1 ≤ s ≤ k), 마지막 성공 뒤 실패 f 회 → (k - s) * k + f
+        성공 0 회 → k * k  (천장은 p + k)
+
+    첫 성공 시점으로 나눠 계산: 첫 성공이 j 번째면 천장이 0 으로 돌아가므로 남은 k - j 회는 시작 천장과 무관
+    → 시작 천장별 생존 확률 O(H·k) + 천장 0 에서의 r 연차 결과표(r < k) 를 행렬곱으로 합침
+    """
+    hard_pity, k = len(probs), pulls
+    n_states = k * k + 1
+    fail_probs = 1.0 - probs
+
+    def first_success(start):
+        # first[:, j]: 시작 천장 start 에서 (j+1) 번째에 처음 성공할 확률, survive: k 회 모두 실패할 확률
+        first = np.empty((len(start), k))
+        survive = np.ones(len(start))
+        for j in range(k):
+            # 확정 성공 스택(H-1)을 넘는 천장은 도달 확률 0 → 마지막 스택으로 clip
+            stack = np.minimum(start + j, hard_pity - 1)
+            np.multiply(survive, probs[stack], out=first[:, j])
+            survive *= fail_probs[stack]
+        return first, survive
+
+    # tail[r]: 천장 0 에서 r 연차 결과 (성공 수, 마지막 성공 뒤 실패 수) → [k + 1, k + 1]
+    #          성공 0 회면 실패 수 자리에 r (첫 성공 뒤 연속 실패로 이어짐)
+    first_0, _ = first_success(np.zeros(1, dtype=np.int64))
+    tail = [np.zeros((k + 1, k + 1)) for _ in range(k)]
+    tail[0][0, 0] = 1.0
+    for r in range(1, k):
+        tail[r][0, r] = 1.0 - first_0[0, :r].sum()
+        for j in range(1, r + 1):
+            tail[r][1:, :] += first_0[0, j - 1] * tail[r - j][:-1, :]
+
+    # after[j]: j+1 번째 첫 성공 이후의 결과를 최종 상태 번호로 펼친 행 [k, k*k + 1]
+    after = np.zeros((k, n_states))
+    for j in range(k):
+        rest = tail[k - 1 - j]
+        for extra in range(k - j):
+            after[j, (k - 1 - extra) * k:(k - 1 - extra) * k + k] = rest[extra, :k]
+
+    first, survive = first_success(np.arange(hard_pity))
+    outcome = first @ after
+    outcome[:, k * k] = survive
+    cdf = np.cumsum(outcome, axis=1, out=outcome)
+    cdf[:, -1] = 1.0
+    return cdf
+
+def compile_banners(df_banners, df_activities):
+    """
+    배너 표를 틱 루프용 조회 테이블로 변환합니다. (실행당 한 번)
+
+    Returns:
+        dict:
+            banner_ids, n_banners
+            act_matrix [M, B] bool: 활동 → 배너
+            primary_acts [B]: 배너별 첫 활동 인덱스 (없으면 -1), extra_acts: [(배너, 활동)] 나머지 연결
+            pulls [B], hard_pity [B]
+            row_base [B]: 배너 b, 천장 p 의 CDF 행 번호 = row_base[b] + p
+            row_start [R]: 행별 table_keys 시작 위치
+            table_keys [Σ 행 길이] int64: (행 번호 << bits) + CDF 정수값 (전체가 오름차순)
+            bits: CDF 정수 비트 수
+    """
+    act_index = {aid: i for i, aid in enumerate(df_activities['ID'])}
+    n_banners = len(df_banners)
+    act_matrix = np.zeros((len(df_activities), n_banners), dtype=bool)
+    pulls = df_banners['Pulls'].to_numpy(dtype=np.int64)
+    hard_pity = df_banners['Hard_Pity'].to_numpy(dtype=np.int64)
+    if np.any(pulls < 1) or np.any(hard_pity < 1) or np.any(hard_pity > np.iinfo(np.int16).max):
+        raise ValueError("Banner Pulls must be >= 1 and Hard_Pity in [1, 32767]")
+    n_entries = int(np.sum(hard_pity * (pulls * pulls + 1)))
+    if n_entries > MAX_CDF_ENTRIES:
+        raise ValueError(f"Banner CDF tables need {n_entries:,} entries (sum of Hard_Pity x (Pulls^2 + 1)), "
+                         f"limit is {MAX_CDF_ENTRIES:,}: lower Hard_Pity or Pulls")
+
+    cdfs = []
+    for b, row in enumerate(df_banners.itertuples(index=False)):
+        for aid in str(row.Activity_IDs).split('|'):
+            if aid in act_index: act_matrix[act_index[aid], b] = True
+        probs = pull_success_probs(row.Base_Rate, row.Soft_Pity_Start, row.Soft_Pity_Step, row.Hard_Pity)
+        cdfs.append(build_outcome_cdf(probs, row.Pulls))
+
+    primary_acts = np.full(n_banners, -1, dtype=np.int64)
+    extra_acts = []
+    for b in range(n_banners):
+        linked = np.flatnonzero(act_matrix[:, b])
+        if len(linked): primary_acts[b] = linked[0]
+        extra_acts += [(b, int(act)) for act in linked[1:]]
+
+    n_rows = int(hard_pity.sum())
+    # 행 번호가 상위 비트에 들어갈 자리가 부족하면 CDF 정밀도를 그만큼 낮춤 (기본 배너는 53비트 그대로)
+    bits = RANDOM_BITS - max(0, int(np.ceil(np.log2(n_rows + 1))) - MAX_ROW_BITS)
+    scale = float(2 ** bits)
+
+    row_base = np.concatenate([[0], np.cumsum(hard_pity)[:-1]]).astype(np.int64)
+    row_lengths = np.concatenate([np.full(len(cdf), cdf.shape[1]) for cdf in cdfs])
+    row_start = np.concatenate([[0], np.cumsum(row_lengths)[:-1]]).astype(np.int64)
+    row_ids = np.repeat(np.arange(n_rows, dtype=np.int64), row_lengths)
+    cdf_int = np.concatenate([np.ceil(cdf * scale).astype(np.int64).ravel() for cdf in cdfs])
+    table_keys = (row_ids << bits) + cdf_int
+
+    return {
+        "banner_ids": list(df_banners['Banner_ID']),
+        "n_banners": n_banners,
+        "act_matrix": act_matrix,
+        "primary_acts": primary_acts,
+        "extra_acts": extra_acts,
+        "empty_banners": np.flatnonzero(primary_acts < 0),
+        "pulls": pulls,
+        "hard_pity": hard_pity,
+        "row_base": row_base,
+        "row_start": row_start,
+        "table_keys": table_keys,
+        "bits": bits,
+    }
+
+def ensure_banner_state(agents, banners):
+    """agents['banner_pity'] [N, B] int16 준비. 없으면 기존 단일 천장(gacha_pity_count)에서 시작"""
+    n_agents = len(agents['ids'])
+    pity = agents.get('banner_pity')
+    if pity is not None and pity.shape == (n_agents, banners['n_banners']): return
+    start = np.minimum(agents['gacha_pity_count'], banners['hard_pity'][np.newaxis, :] - 1)
+    agents['banner_pity'] = start.astype(np.int16)
+
+def _gather_positions(mask, positions, rank, out):
+    """
+    mask 가 True 인 위치의 positions 값을 out 앞쪽에 순서대로 모읍니다. (할당 없는 np.flatnonzero)
+    rank: mask 와 같은 길이의 int64 작업 버퍼, out: mask 와 같은 길이
+
+    Returns:
+        int: 모은 개수
+    """
+    np.copyto(rank, mask)
+    np.cumsum(rank, out=rank)
+    count = int(rank[-1]) if len(rank) else 0
+    rank *= mask
+    rank -= 1
+    # 고르지 않은 위치(-1)는 wrap 으로 out 마지막 칸에 씀 → count 뒤쪽이라 결과에 영향 없음
+    np.put(out, rank, positions, mode='wrap')
+    return count
+
+def _pull_buffer(workspace, key, n, dtype=np.int64, reserve=True):
+    """
+    workspace['pull_pool'][key] 의 앞 n 칸 (workspace 가 없으면 임시 배열)
+    용량이 모자라면 max(n, 예약 용량, 기존 × 2) 로 다시 잡음 → 뽑기 수가 틱마다 조금씩 늘어도 재할당은 몇 번뿐
+    reserve: False 이면 예약 용량(pull_pool['reserve']) 무시 (ROLL_CHUNK 이하 고정 크기 버퍼)
+    """
+    if workspace is None: return np.empty(n, dtype=dtype)
+    pool = workspace['pull_pool']
+    buffer = pool.get(key)
+    if buffer is None or len(buffer) < n:
+        capacity = max(n, pool['reserve'] if reserve else 0, 2 * len(buffer) if buffer is not None else 0)
+        buffer = pool[key] = np.empty(capacity, dtype=dtype)
+    return buffer[:n]
+
+def _pull_slots(workspace, n):
+    """0 ~ n-1 (pull_pool['slots'] 재사용, 늘릴 때만 다시 채움)"""
+    if workspace is None: return np.arange(n)
+    slots = workspace['pull_pool'].get('slots')
+    if slots is None or len(slots) < n:
+        _pull_buffer(workspace, 'slots', n)
+        slots = workspace['pull_pool']['slots']
+        slots[:] = np.arange(len(slots))
+    return slots[:n]
+
+def resolve_pulls(agents, action_mask, banners, workspace=None):
+    """
+    이번 틱의 모든 배너 뽑기를 판정하고 상태를 in-place 갱신합니다.
+
+    Returns:
+        did (np.array): [N, B] bool 배너별 뽑기 여부
+    """
+    n_agents = len(agents['ids'])
+    n_banners = banners['n_banners']
+    shape = (n_agents, n_banners)
+    ensure_banner_state(agents, banners)
+    pity = agents['banner_pity']
+
+    # 배너별 뽑기 여부: 대표 활동 열을 모은 뒤 추가 활동을 OR (bool 행렬곱보다 훨씬 빠름)
+    did = np.take(action_mask, banners['primary_acts'], axis=1, out=inference.get_buffer(workspace, 'banner_did', shape, dtype=bool), mode='clip')
+    for b, act in banners['extra_acts']:
+        did[:, b] |= action_mask[:, act]
+    if len(banners['empty_banners']): did[:, banners['empty_banners']] = False
+    did_any = np.any(did, axis=1, keepdims=True, out=inference.get_buffer(workspace, 'gacha_did', (n_agents, 1), dtype=bool))
+    if not np.any(did_any): return did
+
+    # 1. 실제로 뽑은 (에이전트, 배너) 쌍만 모아 조회 키 생성
+    #    난수는 [N, B] 전체에 대해 뽑음 (뽑기 여부와 무관하게 같은 난수 흐름 유지) → ROLL_CHUNK 칸씩 뽑아 뽑은 칸만 남김
+    #    키 = (CDF 행 번호 << bits) + 53비트 난수 정수 (정밀도를 낮춘 경우 하위 비트 버림)
+    #    모든 중간값은 뽑기 풀의 앞쪽 n_pulled 칸 (정상 상태에서 할당 없음)
+    n_slots = n_agents * n_banners
+    did_flat = did.ravel()
+    n_pulled = int(np.count_nonzero(did_flat))
+    pulled = _pull_buffer(workspace, 'index', n_pulled)
+    keys_f = _pull_buffer(workspace, 'scratch', n_pulled, float)
+    roll_chunk = min(ROLL_CHUNK, n_slots)
+    roll = _pull_buffer(workspace, 'roll', roll_chunk, float, reserve=False)
+    chunk_rank = _pull_buffer(workspace, 'chunk_rank', roll_chunk, reserve=False)
+    chunk_index = _pull_buffer(workspace, 'chunk_index', roll_chunk, reserve=False)
+    n_done = 0
+    for start in range(0, n_slots, roll_chunk):
+        n_chunk = min(roll_chunk, n_slots - start)
+        if workspace is not None: workspace['rng'].random(out=roll[:n_chunk])
+        else: roll[:n_chunk] = np.random.rand(n_chunk)
+        count = _gather_positions(did_flat[start:start + n_chunk], _pull_slots(workspace, n_chunk), chunk_rank[:n_chunk], chunk_index[:n_chunk])
+        np.take(roll, chunk_index[:count], out=keys_f[n_done:n_done + count], mode='clip')
+        np.add(chunk_index[:count], start, out=pulled[n_done:n_done + count])
+        n_done += count
+
+    pulled_banner = np.remainder(pulled, n_banners, out=_pull_buffer(workspace, 'banner', n_pulled))
+    tmp = _pull_buffer(workspace, 'tmp', n_pulled)
+    keys_f *= float(2 ** RANDOM_BITS)
+    keys = _pull_buffer(workspace, 'keys', n_pulled)
+    np.copyto(keys, keys_f, casting='unsafe')
+    keys >>= RANDOM_BITS - banners['bits']
+    pulled_pity = np.take(pity.ravel(), pulled, out=_pull_buffer(workspace, 'pity', n_pulled, np.int16), mode='clip')
+    rows = _pull_buffer(workspace, 'rows', n_pulled)
+    np.copyto(rows, pulled_pity)
+    rows += np.take(banners['row_base'], pulled_banner, out=tmp, mode='clip')
+    keys += np.left_shift(rows, banners['bits'], out=tmp)
+
+    # 2. 역CDF: searchsorted 로 모든 뽑기의 결과 상태 (out= 이 없어 SEARCH_CHUNK 개씩 → 임시 배열 크기가 N 과 무관)
+    outcome = _pull_buffer(workspace, 'outcome', n_pulled)
+    for chunk in range(0, n_pulled, SEARCH_CHUNK):
+        outcome[chunk:chunk + SEARCH_CHUNK] = np.searchsorted(banners['table_keys'], keys[chunk:chunk + SEARCH_CHUNK], side='right')
+    outcome -= np.take(banners['row_start'], rows, out=tmp, mode='clip')
+
+    # 3. 결과 상태 → 성공 수 / 마지막 성공 뒤 실패 수 (성공 0 회 상태 k*k 는 successes = 0)
+    pulls = np.take(banners['pulls'], pulled_banner, out=_pull_buffer(workspace, 'count', n_pulled), mode='clip')
+    successes = np.floor_divide(outcome, pulls, out=_pull_buffer(workspace, 'success', n_pulled))
+    np.subtract(pulls, successes, out=successes)
+    tail = np.remainder(outcome, pulls, out=outcome)
+    hit = np.greater(successes, 0, out=_pull_buffer(workspace, 'hit', n_pulled, bool))
+
+    # 배너별 천장: 성공했으면 마지막 성공 뒤 실패 수, 아니면 +k
+    rows -= np.take(banners['row_base'], pulled_banner, out=tmp, mode='clip') # = 현재 천장
+    rows += pulls
+    np.copyto(rows, tail, where=hit)
+    np.copyto(pulled_pity, rows, casting='unsafe')
+    pity.ravel()[pulled] = pulled_pity
+
+    # 4. 에이전트별 합산 (pulled 는 에이전트 → 배너 순으로 정렬돼 있어 에이전트마다 연속 구간)
+    #    여러 배너를 뽑으면 표 순서대로 뽑은 것으로 간주
+    pulled_agent = np.floor_divide(pulled, n_banners, out=pulled_banner)
+    seg_flag = _pull_buffer(workspace, 'flag', n_pulled, bool)
+    seg_flag[0] = True
+    np.not_equal(pulled_agent[1:], pulled_agent[:-1], out=seg_flag[1:])
+    seg_start = _pull_buffer(workspace, 'seg_start', n_pulled)
+    n_seg = _gather_positions(seg_flag, _pull_slots(workspace, n_pulled), _pull_buffer(workspace, 'rank', n_pulled), seg_start)
+    seg_start = seg_start[:n_seg]
+    seg = lambda key, dtype=np.int64: _pull_buffer(workspace, key, n_seg, dtype)
+    seg_agent = np.take(pulled_agent, seg_start, out=seg('seg_agent'), mode='clip')
+
+    # 스트레스: 실패 × (+20) + 성공 × (-30) = 20k - 50s
+    stress_values = np.multiply(pulls, FAIL_STRESS, out=keys_f)
+    stress_values += np.multiply(successes, SUCCESS_STRESS - FAIL_STRESS, out=_pull_buffer(workspace, 'scratch_b', n_pulled, float))
+    stress_delta = np.add.reduceat(stress_values, seg_start, out=seg('seg_scratch', float))
+
+    # 마지막 성공 이후 누적 실패 (trailing): 누적 성공 수가 구간 끝과 같은 뽑기 = 마지막 성공 뽑기와 그 뒤 뽑기
+    #   (성공이 없는 구간은 전부 해당, 마지막 성공 뽑기는 tail 만 실패)
+    seg_id = _pull_buffer(workspace, 'seg_id', n_pulled)
+    np.copyto(seg_id, seg_flag)
+    np.cumsum(seg_id, out=seg_id)
+    seg_id -= 1
+    hits_through = _pull_buffer(workspace, 'hits_through', n_pulled)
+    np.copyto(hits_through, hit)
+    np.cumsum(hits_through, out=hits_through)
+    seg_last = seg('seg_last')
+    np.subtract(seg_start[1:], 1, out=seg_last[:-1])
+    seg_last[-1] = n_pulled - 1
+    seg_end_hits = np.take(hits_through, seg_last, out=seg('seg_end_hits'), mode='clip')
+    after_last_hit = np.equal(hits_through, np.take(seg_end_hits, seg_id, out=tmp, mode='clip'), out=seg_flag)
+    fails = tmp
+    np.copyto(fails, pulls)
+    np.copyto(fails, tail, where=hit)
+    fails *= after_last_hit
+    trailing = np.add.reduceat(fails, seg_start, out=seg('seg_trailing'))
+    any_hit = np.logical_or.reduceat(hit, seg_start, out=seg('seg_any_hit', bool))
+
+    # 도파민 / 연속 실패: 한 번이라도 성공 → 100 - 5 × trailing, trailing / 전부 실패 → 누적
+    stress, dopamine, streak = agents['state_stress'], agents['state_dopamine'], agents['recent_fail_streak']
+    seg_values = np.take(stress.ravel(), seg_agent, out=seg('seg_values', float), mode='clip')
+    seg_values += stress_delta
+    stress.ravel()[seg_agent] = np.clip(seg_values, 0, 100, out=seg_values)
+    np.take(dopamine.ravel(), seg_agent, out=seg_values, mode='clip')
+    np.copyto(seg_values, SUCCESS_DOPAMINE, where=any_hit)
+    seg_values += np.multiply(trailing, FAIL_DOPAMINE, out=stress_delta)
+    dopamine.ravel()[seg_agent] = np.clip(seg_values, 0, 100, out=seg_values)
+    seg_streak = np.take(streak.ravel(), seg_agent, out=seg('seg_streak'), mode='clip')
+    np.copyto(seg_streak, 0, where=any_hit)
+    seg_streak += trailing
+    streak.ravel()[seg_agent] = seg_streak
+
+    # 대표 천장 = 배너 천장 중 최댓값 (뽑은 에이전트 행만, 배너 열마다 flat index 로 모아 비교)
+    flat_index = np.multiply(seg_agent, n_banners, out=seg('seg_index'))
+    seg_pity = np.take(pity.ravel(), flat_index, out=seg('seg_pity', np.int16), mode='clip')
+    for _ in range(1, n_banners):
+        flat_index += 1
+        np.maximum(seg_pity, np.take(pity.ravel(), flat_index, out=seg('seg_pity_b', np.int16), mode='clip'), out=seg_pity)
+    agents['gacha_pity_count'].ravel()[seg_agent] = seg_pity
+    return did
@@ -6,6 +6,8 @@ import pandas as pd
 # ==========================================
 # [Update Log]
 # - Algorithmic Resistance: VIDEO 매체는 지루함 페널티 감소 (알고리즘 효과)
+# - Workspace Arena: 틱마다 재사용하는 버퍼(out=) 지원 → 정상 상태 할당 0
+# - Compact Tag Space: 태그 차원 = 실제 태그 어휘 수 (고정 50 → len(TAG_LIST)), 어휘가 크면 활동-태그 행렬을 희소(CSR)로
 # ==========================================
 
 TAG_LIST = [
@@ -15,21 +17,73 @@ TAG_LIST = [
     "Future", "Knowledge"
 ]
 TAG_TO_IDX = {tag: i for i, tag in enumerate(TAG_LIST)}
+NUM_TAGS = len(TAG_LIST)
+
+# 태그 수가 이 이상이면 활동-태그 행렬을 희소(CSR)로 만듦 (scipy 가 있을 때만, 활동당 태그는 몇 개뿐이므로)
+SPARSE_TAG_THRESHOLD = 1024
 
 MEDIA_TYPES = ["GAME", "VIDEO", "BOOK", "WORK", "COMM", "LIFE"]
 MEDIA_TO_IDX = {m: i for i, m in enumerate(MEDIA_TYPES)}
 NUM_MEDIA_TYPES = len(MEDIA_TYPES)
 
-def precompute_activity_tags_matrix(df_activities, num_tags=50):
+# 효용 가중치 (보정 대상: calibration.py)
+INERTIA_WEIGHT = 10.0  # 직전 매체 유지 보너스
+RAGE_BET_WEIGHT = 50.0 # 연속 실패 × 도박사의 오류 → 가챠 효용 보너스
+
+def precompute_activity_tags_matrix(df_activities, num_tags=None, sparse=None):
+    """
+    활동-태그 행렬 [M, num_tags] (해당 태그면 1.0)
+    num_tags: 태그 차원 (기본 NUM_TAGS, agents['interests'] 열 수와 같아야 함)
+    sparse: True 이면 scipy.sparse CSR, None 이면 num_tags >= SPARSE_TAG_THRESHOLD 이고 scipy 가 있을 때만 CSR
+    """
+    num_tags = NUM_TAGS if num_tags is None else num_tags
     num_acts = len(df_activities)
-    act_tag_matrix = np.zeros((num_acts, num_tags))
+    rows, cols = [], []
     for i, tags in enumerate(df_activities['Tags']):
         if isinstance(tags, str): tag_list = tags.split('|')
         else: tag_list = tags if isinstance(tags, list) else []
         for tag in tag_list:
-            if tag in TAG_TO_IDX: act_tag_matrix[i, TAG_TO_IDX[tag]] = 1.0
+            if tag in TAG_TO_IDX and TAG_TO_IDX[tag] < num_tags:
+                rows.append(i)
+                cols.append(TAG_TO_IDX[tag])
+
+    if sparse is None and num_tags >= SPARSE_TAG_THRESHOLD:
+        try:
+            import scipy.sparse # noqa: F401
+            sparse = True
+        except ImportError:
+            sparse = False
+    if sparse:
+        import scipy.sparse
+        pairs = sorted(set(zip(rows, cols)))
+        data = np.ones(len(pairs))
+        return scipy.sparse.csr_matrix((data, ([r for r, _ in pairs], [c for _, c in pairs])), shape=(num_acts, num_tags))
+
+    act_tag_matrix = np.zeros((num_acts, num_tags))
+    act_tag_matrix[rows, cols] = 1.0
     return act_tag_matrix
 
+def tag_affinity(interests, act_tag_matrix, out=None):
+    """에이전트-활동 관심 점수 interests @ act_tag_matrix.T → [N, M] (희소 행렬이면 태그가 있는 칸만 계산)"""
+    if isinstance(act_tag_matrix, np.ndarray): return np.dot(interests, act_tag_matrix.T, out=out)
+    result = (act_tag_matrix @ interests.T).T
+    if out is None: return np.ascontiguousarray(result)
+    np.copyto(out, result)
+    return out
+
+def tag_exposure(action_mask_f, act_tag_matrix, out=None):
+    """선택한 활동들의 태그 합 action_mask_f @ act_tag_matrix → [N, num_tags] (관심사 학습용)"""
+    if isinstance(act_tag_matrix, np.ndarray): return np.dot(action_mask_f, act_tag_matrix, out=out)
+    result = (act_tag_matrix.T @ action_mask_f.T).T
+    if out is None: return np.ascontiguousarray(result)
+    np.copyto(out, result)
+    return out
+
+def activity_tag_column(act_tag_matrix, tag_idx):
+    """태그 하나의 활동별 값 [M] (dense / 희소 공통)"""
+    if isinstance(act_tag_matrix, np.ndarray): return act_tag_matrix[:, tag_idx]
+    return act_tag_matrix[:, [tag_idx]].toarray().ravel()
+
 def precompute_media_matrix(df_activities):
     num_acts = len(df_activities)
     act_media_matrix = np.zeros((num_acts, NUM_MEDIA_TYPES))
@@ -39,7 +93,101 @@ def precompute_media_matrix(df_activities):
             act_media_matrix[i, MEDIA_TO_IDX[media_group]] = 1.0
     return act_media_matrix
 
-def calculate_utility(agents, df_activities, act_tag_matrix, act_media_matrix, time_context, viral_scores=None):
+def create_workspace(n_agents, n_acts, num_tags, seed=None, n_banners=1, n_patterns=4):
+    """
+    한 번의 시뮬레이션 실행 동안 재사용하는 작업 버퍼(Arena)를 생성합니다.
+    calculate_utility / decide_actions_knapsack 에 workspace= 로 넘기면
+    모든 [N, M] 중간값을 이 버퍼 안에서 in-place 로 계산합니다.
+
+    seed: 노이즈 Generator 시드. None 이면 전역 np.random 상태에서 뽑아
+          np.random.seed() 로 재현성을 유지합니다.
+    n_banners: 가챠 배너 수 (gacha.resolve_pulls 의 [N, B] 뽑기 여부 버퍼)
+    n_patterns: 생활 패턴 수 (광고 집계용 [N, P] one-hot 버퍼)
+    """
+    if seed is None:
+        seed = np.random.randint(0, 2**31 - 1)
+
+    workspace = {
+        "n_agents": n_agents,
+        "n_acts": n_acts,
+        "rng": np.random.default_rng(seed),
+
+        # [N, M] 버퍼
+        "utility": np.empty((n_agents, n_acts)),
+        "scratch": np.empty((n_agents, n_acts)),
+        "ratios": np.empty((n_agents, n_acts)),
+        "cum_intensities": np.empty((n_agents, n_acts)),
+        "allowed_sorted": np.empty((n_agents, n_acts), dtype=bool),
+        "sort_keys": np.empty((n_agents, n_acts), dtype=np.int64),
+        "sort_index": np.empty((n_agents, n_acts), dtype=np.int64),
+        "sorted_keys": _sorted_keys_buffer(n_agents, n_acts),
+        "sorted_row_offsets": np.arange(n_agents, dtype=np.int64) * (n_acts + 1),
+        "action_mask": np.empty((n_agents, n_acts), dtype=bool),
+        "action_mask_f": np.empty((n_agents, n_acts)),
+        "segment_keys": np.empty((n_agents, n_acts), dtype=np.int64),
+
+        # [N, 1] 버퍼
+        "col_a": np.empty((n_agents, 1)),
+        "col_b": np.empty((n_agents, 1)),
+        "col_c": np.empty((n_agents, 1)),
+        "stress_mod": np.empty((n_agents, 1)),
+
+        # [N, Media] / [N, Tag] 버퍼
+        "media_activity": np.empty((n_agents, NUM_MEDIA_TYPES)),
+        "media_active": np.empty((n_agents, NUM_MEDIA_TYPES), dtype=bool),
+        "media_scratch": np.empty((n_agents, NUM_MEDIA_TYPES)),
+        "tag_scratch": np.empty((n_agents, num_tags)),
+
+        # [N] 버퍼
+        "has_activity": np.empty(n_agents, dtype=bool),
+        "primary_media": np.empty(n_agents, dtype=np.intp),
+        "sketch_index": np.empty(n_agents, dtype=np.int64),
+        "select_count": np.empty(n_agents, dtype=np.int64),
+        "select_flat_idx": np.empty(n_agents, dtype=np.int64),
+        "select_threshold": np.empty(n_agents, dtype=np.int64),
+
+        # [N, 1] bool 버퍼 (Gacha)
+        "gacha_did": np.empty((n_agents, 1), dtype=bool),
+
+        # [N, Banner] 버퍼 (Gacha) - 배너별 뽑기 여부
+        "banner_did": np.empty((n_agents, n_banners), dtype=bool),
+
+        # 뽑기 풀 (gacha.resolve_pulls) - 이번 틱에 실제로 뽑은 쌍 수만큼만 쓰고 모자랄 때만 늘림
+        # 에이전트당 1회 분량을 예약 용량으로 시작 (1연차 배너 하나면 늘어나지 않음), Active Set view 와 같은 dict 를 공유
+        "pull_pool": {"reserve": n_agents},
+
+        # [N, Pattern] 버퍼 (Ads) - 열 우선(F) 배치: 패턴별 열이 연속이라 채우기/전치 행렬곱이 빠름
+        "pattern_onehot": np.empty((n_agents, n_patterns), order='F'),
+    }
+    return workspace
+
+def _sorted_keys_buffer(n_agents, n_acts):
+    # 마지막 열은 INT64_MAX 보초값: 선택 개수가 0인 에이전트의 임계값으로 사용
+    sorted_keys = np.empty((n_agents, n_acts + 1), dtype=np.int64)
+    sorted_keys[:, n_acts] = np.iinfo(np.int64).max
+    return sorted_keys
+
+def workspace_view(workspace, n_agents):
+    """
+    workspace 의 앞쪽 n_agents 행만 가리키는 view 를 반환합니다. (Active Set 압축 계산용)
+    행 슬라이스는 C-contiguous 를 유지하므로 out= 버퍼로 그대로 사용할 수 있습니다.
+    """
+    full_n = workspace['n_agents']
+    view = {}
+    for key, value in workspace.items():
+        if isinstance(value, np.ndarray) and value.ndim > 0 and value.shape[0] == full_n:
+            view[key] = value[:n_agents]
+        else:
+            view[key] = value
+    view['n_agents'] = n_agents
+    return view
+
+def get_buffer(workspace, key, shape, dtype=float):
+    # workspace 가 없으면 기존처럼 임시 배열을 할당
+    if workspace is None: return np.empty(shape, dtype=dtype)
+    return workspace[key]
+
+def calculate_utility(agents, df_activities, act_tag_matrix, act_media_matrix, time_context, viral_scores=None, out=None, workspace=None, inertia_weight=INERTIA_WEIGHT, rage_weight=RAGE_BET_WEIGHT):
     n_agents = len(agents['ids'])
     n_acts = len(df_activities)
     
@@ -56,90 +204,143 @@ def calculate_utility(agents, df_activities, act_tag_matrix, act_media_matrix, t
     state_current_media = agents['state_current_media']
     traits_intel = agents['traits_intel']
     loss_aversion = agents['loss_aversion']
-    traits_extraversion = agents['traits_big5'][:, 2].reshape(-1, 1)
+    traits_extraversion = agents['traits_big5'][:, 2:3]
+
+    # --- Buffers ---
+    # utility: 최종 결과 (out), scratch: 각 항을 잠시 담는 [N, M] 버퍼
+    if out is None: out = get_buffer(workspace, 'utility', (n_agents, n_acts))
+    utility_matrix = out
+    scratch = get_buffer(workspace, 'scratch', (n_agents, n_acts))
+    col_a = get_buffer(workspace, 'col_a', (n_agents, 1))
+    col_b = get_buffer(workspace, 'col_b', (n_agents, 1))
 
     # 1. Needs Weighting
-    w_fun = np.clip((100.0 - state_dopamine) / 100.0, 0.1, 2.0)
-    w_growth = 1.0 + (state_anxiety / 20.0)
-    base_utility = (vec_fun * w_fun) + (vec_growth * w_growth)
+    w_fun = np.subtract(100.0, state_dopamine, out=col_a)
+    w_fun /= 100.0
+    np.clip(w_fun, 0.1, 2.0, out=w_fun)
+    w_growth = np.divide(state_anxiety, 20.0, out=col_b)
+    w_growth += 1.0
+    np.multiply(vec_fun, w_fun, out=utility_matrix)
+    np.multiply(vec_growth, w_growth, out=scratch)
+    utility_matrix += scratch
     
-    interest_scores = np.dot(agents['interests'], act_tag_matrix.T)
-    base_utility *= (1.0 + interest_scores)
+    interest_scores = tag_affinity(agents['interests'], act_tag_matrix, out=scratch)
+    interest_scores += 1.0
+    utility_matrix *= interest_scores
 
     # 2. Difficulty Penalty
-    diff_gap = vec_diff - traits_intel
-    penalty_flow = np.maximum(diff_gap, 0) * 1.5 
+    penalty_flow = np.subtract(vec_diff, traits_intel, out=scratch)
+    np.maximum(penalty_flow, 0, out=penalty_flow)
+    penalty_flow *= 1.5
+    utility_matrix -= penalty_flow
     
     # 3. Inertia Bonus
-    agent_media_onehot = np.zeros((n_agents, NUM_MEDIA_TYPES))
-    valid_mask = (state_current_media >= 0).flatten()
-    if np.any(valid_mask):
-        valid_indices = state_current_media[valid_mask].flatten()
-        agent_media_onehot[valid_mask, valid_indices] = 1.0
-    inertia_matrix = np.dot(agent_media_onehot, act_media_matrix.T)
-    inertia_bonus = inertia_matrix * 10.0
+    # one-hot matmul 대신 인덱스 gather: 마지막 행(0)은 매체 없음(-1)용 → mode='wrap'
+    inertia_table = np.zeros((NUM_MEDIA_TYPES + 1, n_acts))
+    inertia_table[:NUM_MEDIA_TYPES] = act_media_matrix.T * inertia_weight
+    inertia_bonus = np.take(inertia_table, state_current_media.ravel(), axis=0, out=scratch, mode='wrap')
+    utility_matrix += inertia_bonus
 
     # 4. Media Saturation (Tuned for Short-form)
     # 일반적인 물림 페널티
-    saturation_penalty = np.dot(agents['media_boredom'], act_media_matrix.T) * 2.0
+    saturation_penalty = np.dot(agents['media_boredom'], act_media_matrix.T, out=scratch)
     
     # [FIX] VIDEO(Short-form) 계열은 알고리즘 추천으로 인해 지루함이 덜함
     # act_media_matrix에서 VIDEO 컬럼(idx 1)이 1인 활동들 찾기
     video_idx = MEDIA_TO_IDX.get("VIDEO", 1)
     is_video_act = act_media_matrix[:, video_idx].reshape(1, -1) # [1, M]
     
-    # 비디오 활동에 대해서는 페널티를 50%만 적용
-    saturation_penalty = np.where(is_video_act > 0, saturation_penalty * 0.5, saturation_penalty)
+    # 비디오 활동에 대해서는 페널티를 50%만 적용 (기본 계수 2.0)
+    saturation_penalty *= np.where(is_video_act > 0, 2.0 * 0.5, 2.0)
+    utility_matrix -= saturation_penalty
 
     # 5. Social Bonus
-    social_bonus = 0
     if viral_scores is not None:
         media_viral_val = np.dot(viral_scores, act_media_matrix.T) 
-        social_bonus = media_viral_val * (traits_extraversion * 5.0)
+        extraversion_weight = np.multiply(traits_extraversion, 5.0, out=col_a)
+        social_bonus = np.multiply(media_viral_val, extraversion_weight, out=scratch)
+        utility_matrix += social_bonus
         
     # [Rage Bet Bonus]
     gambler_fallacy = agents['gambler_fallacy']
     fail_streak = agents['recent_fail_streak']
     gambling_tag_idx = TAG_TO_IDX.get("Gambling", -1)
-    rage_bonus = np.zeros((n_agents, n_acts))
     if gambling_tag_idx != -1:
-        is_gambling_act = act_tag_matrix[:, gambling_tag_idx].reshape(1, -1)
-        rage_factor = (fail_streak * gambler_fallacy * 50.0)
-        rage_bonus = rage_factor * is_gambling_act
+        is_gambling_act = activity_tag_column(act_tag_matrix, gambling_tag_idx).reshape(1, -1)
+        rage_factor = np.multiply(fail_streak, gambler_fallacy, out=col_a)
+        rage_factor *= rage_weight
+        rage_bonus = np.multiply(rage_factor, is_gambling_act, out=scratch)
+        utility_matrix += rage_bonus
 
     # 6. Cost & Context
     stress_mod = time_context['Stress_Mod']
-    pain_stress = (vec_stress_cost * stress_mod) * (1.0 + (state_stress * 0.01))
-    pain_money = vec_money_cost * 0.001 
-    total_pain = (pain_stress + pain_money) * loss_aversion
-
-    # Final Aggregation
-    utility_matrix = base_utility + inertia_bonus + social_bonus + rage_bonus - penalty_flow - saturation_penalty - total_pain
+    stress_weight = np.multiply(state_stress, 0.01, out=col_a)
+    stress_weight += 1.0
+    total_pain = np.multiply(vec_stress_cost, stress_mod, out=scratch)
+    total_pain *= stress_weight
+    total_pain += vec_money_cost * 0.001
+    total_pain *= loss_aversion
+    utility_matrix -= total_pain
     
-    noise = np.random.normal(0, 2.0, size=(n_agents, n_acts))
+    # Noise
+    if workspace is not None:
+        noise = workspace['rng'].standard_normal(out=scratch)
+        noise *= 2.0
+    else:
+        noise = np.random.normal(0, 2.0, size=(n_agents, n_acts))
     utility_matrix += noise
     
     return utility_matrix
 
-def decide_actions_knapsack(utility_matrix, df_activities, agents):
-    # (기존 Knapsack 로직 동일)
+def decide_actions_knapsack(utility_matrix, df_activities, agents, out=None, workspace=None, ratios=None):
+    """
+    Greedy Knapsack: 가성비(utility/intensity) 내림차순으로 누적 강도가 attention_cap 이하인 활동 선택
+
+    ratios: 이미 계산된 가성비 [N, M] (fused_utility 가 효용과 같은 패스에서 채운 값). None 이면 여기서 나눔
+    """
     n_agents, n_acts = utility_matrix.shape
     agent_caps = agents['attention_cap']
-    intensities = df_activities['Intensity'].values.reshape(1, -1)
+    intensities = df_activities['Intensity'].values.astype(float).reshape(1, -1)
     safe_intensities = intensities.copy()
     safe_intensities[safe_intensities == 0] = 0.1
-    ratios = utility_matrix / safe_intensities
-    
-    sorted_indices = np.argsort(ratios, axis=1)[:, ::-1]
-    row_indices = np.arange(n_agents)[:, np.newaxis]
-    
-    sorted_intensities = intensities[0][sorted_indices]
-    cum_intensities = np.cumsum(sorted_intensities, axis=1)
-    
-    allowed_mask_sorted = cum_intensities <= agent_caps
+    if ratios is None:
+        ratios = np.divide(utility_matrix, safe_intensities, out=get_buffer(workspace, 'ratios', (n_agents, n_acts)))
+
+    # [Packed Sort Key] argsort 대신 (가성비 | 활동 인덱스)를 int64 하나에 담아 제자리 정렬
+    # - float64 비트를 순서 보존 정수로 변환 (음수는 크기 비트 반전)
+    # - 하위 index_bits 비트를 활동 인덱스로 교체 → 동률이면 인덱스가 큰 활동이 먼저 (기존 argsort[::-1]과 동일)
+    index_bits = max(1, (n_acts - 1).bit_length())
+    index_mask = (1 << index_bits) - 1
+    bits = ratios.view(np.int64)
+    sort_keys = get_buffer(workspace, 'sort_keys', (n_agents, n_acts), dtype=np.int64)
+    np.right_shift(bits, 63, out=sort_keys)
+    np.bitwise_and(sort_keys, np.iinfo(np.int64).max, out=sort_keys)
+    np.bitwise_xor(sort_keys, bits, out=sort_keys)
+    np.bitwise_and(sort_keys, ~index_mask, out=sort_keys)
+    np.bitwise_or(sort_keys, np.arange(n_acts), out=sort_keys)
+
+    if workspace is None: sorted_keys_full = _sorted_keys_buffer(n_agents, n_acts)
+    else: sorted_keys_full = workspace['sorted_keys']
+    sorted_keys = sorted_keys_full[:, :n_acts]
+    np.copyto(sorted_keys, sort_keys)
+    sorted_keys.sort(axis=1) # 오름차순 (내림차순은 뒤집어서 읽음)
+
+    sorted_indices = np.bitwise_and(sorted_keys, index_mask, out=get_buffer(workspace, 'sort_index', (n_agents, n_acts), dtype=np.int64))
+    cum_intensities = np.take(intensities[0], sorted_indices, out=get_buffer(workspace, 'cum_intensities', (n_agents, n_acts)), mode='clip')
+    cum_desc = cum_intensities[:, ::-1]
+    np.cumsum(cum_desc, axis=1, out=cum_desc)
     
-    final_mask = np.zeros((n_agents, n_acts), dtype=bool)
-    flat_sorted_indices = row_indices * n_acts + sorted_indices
-    final_mask.ravel()[flat_sorted_indices.ravel()] = allowed_mask_sorted.ravel()
+    allowed_mask_sorted = np.less_equal(cum_intensities, agent_caps, out=get_buffer(workspace, 'allowed_sorted', (n_agents, n_acts), dtype=bool))
+    select_count = np.sum(allowed_mask_sorted, axis=1, out=get_buffer(workspace, 'select_count', n_agents, dtype=np.int64))
+
+    # 선택된 활동은 정렬 순서상 접두사 → 마지막으로 선택된 키를 임계값으로 원래 순서에서 비교
+    if workspace is None: row_offsets = np.arange(n_agents, dtype=np.int64) * (n_acts + 1)
+    else: row_offsets = workspace['sorted_row_offsets']
+    flat_idx = np.subtract(n_acts, select_count, out=get_buffer(workspace, 'select_flat_idx', n_agents, dtype=np.int64))
+    flat_idx += row_offsets
+    threshold = np.take(sorted_keys_full.ravel(), flat_idx, out=get_buffer(workspace, 'select_threshold', n_agents, dtype=np.int64), mode='clip')
+
+    if out is None: out = get_buffer(workspace, 'action_mask', (n_agents, n_acts), dtype=bool)
+    final_mask = np.greater_equal(sort_keys, threshold[:, np.newaxis], out=out)
     
-    return final_mask
\ No newline at end of file
+    return final_mask
@@ -0,0 +1,188 @@
+import numpy as np
+
+# ==========================================
+# Dynamic Population v1.0
+# ==========================================
+# [Update Log]
+# - Live Index: 에이전트 배열은 용량(capacity) 행 저장소의 앞쪽 n_rows 행, 이탈 에이전트는 alive=False 로만 표시
+#   → 엔진은 살아 있는 행만 Active Set 으로 모아 계산 (이탈 에이전트는 효용/Knapsack 비용 없음)
+# - Churn: 스트레스 또는 매체 지루함(평균)이 임계값 이상인 상태가 patience_ticks 틱 연속이면 이탈
+# - Onboarding: 신규 코호트를 저장소 끝에 일괄 추가 (용량이 모자랄 때만 GROWTH_FACTOR 배로 재할당)
+# - Compaction: 주기적으로 살아 있는 행을 앞으로 모아 저장소를 압축 (행 순서 유지)
+# - Cohorts: 코호트(합류 틱)별 인원 / 이탈 수 / 이탈 에이전트 누적 과금 (리텐션 / LTV 분석용)
+# ==========================================
+
+DEFAULT_CHURN = {
+    "stress_threshold": 60.0,  # 스트레스가 이 값 이상이면 이탈 위험
+    "boredom_threshold": 0.55, # 매체 지루함 평균이 이 값 이상이면 이탈 위험
+    "patience_ticks": 8,       # 위험 상태가 연속으로 이만큼 지속되면 이탈 (8틱 = 2시간)
+}
+DEFAULT_COMPACT_EVERY = 16 # 압축 주기 (틱)
+GROWTH_FACTOR = 1.5
+
+def churn_rules(**overrides):
+    """DEFAULT_CHURN 중 일부를 덮어쓴 이탈 규칙 (예: churn_rules(patience_ticks=4))"""
+    unknown = set(overrides) - set(DEFAULT_CHURN)
+    if unknown: raise ValueError(f"Unknown churn rules: {sorted(unknown)}")
+    return {**DEFAULT_CHURN, **overrides}
+
+def _allocate(values, capacity):
+    storage = np.zeros((capacity,) + values.shape[1:], dtype=values.dtype)
+    storage[:len(values)] = values
+    return storage
+
+def create_population(agents, capacity=None, tick=0):
+    """
+    agents (genesis 인구 dict) 를 capacity 행 저장소로 옮긴 동적 인구 상태.
+    capacity: 미리 잡아 둘 행 수 (기본 현재 인구, 온보딩 일정을 알면 합계를 넘기면 재할당 없음)
+    """
+    n_agents = len(agents['ids'])
+    capacity = max(int(capacity or n_agents), n_agents, 1)
+    storage = {key: _allocate(values, capacity) for key, values in agents.items()}
+    storage.setdefault("joined_tick", np.zeros((capacity, 1), dtype=np.int64))
+    storage["joined_tick"][:n_agents] = tick
+    storage.setdefault("churn_streak", np.zeros((capacity, 1), dtype=np.int16))
+    alive = np.zeros(capacity, dtype=bool)
+    alive[:n_agents] = True
+    return {
+        "storage": storage,
+        "capacity": capacity,
+        "n_rows": n_agents,
+        "n_live": n_agents,
+        "alive": alive,
+        "next_id": int(agents['ids'].max()) + 1 if n_agents else 0,
+        "version": 0, # 행 구성이 바뀔 때마다 증가 (Active Set 캐시 무효화용)
+        "live_cache": None,
+        "cohorts": {tick: {"size": n_agents, "churned": 0, "churned_spend": 0.0}},
+    }
+
+def copy_population(population):
+    """스냅샷용 깊은 복사 (저장소는 사용 중인 n_rows 행만)"""
+    n_rows = population["n_rows"]
+    copied = dict(population)
+    copied["storage"] = {key: _allocate(values[:n_rows], population["capacity"]) for key, values in population["storage"].items()}
+    copied["alive"] = population["alive"].copy()
+    copied["live_cache"] = None
+    copied["cohorts"] = {t: dict(c) for t, c in population["cohorts"].items()}
+    return copied
+
+def rows_view(population):
+    """저장소 앞쪽 n_rows 행을 가리키는 agents dict (이탈했지만 아직 압축 전인 행 포함)"""
+    n_rows = population["n_rows"]
+    return {key: values[:n_rows] for key, values in population["storage"].items()}
+
+def live_indices(population):
+    """살아 있는 행 번호 (정렬됨, 행 구성이 바뀔 때까지 캐시)"""
+    if population["live_cache"] is None or population["live_cache"][0] != population["version"]:
+        population["live_cache"] = (population["version"], np.flatnonzero(population["alive"][:population["n_rows"]]))
+    return population["live_cache"][1]
+
+def has_dead_rows(population):
+    return population["n_live"] < population["n_rows"]
+
+def _grow(population, min_capacity):
+    capacity = max(int(population["capacity"] * GROWTH_FACTOR), min_capacity)
+    population["storage"] = {key: _allocate(values[:population["n_rows"]], capacity) for key, values in population["storage"].items()}
+    population["alive"] = _allocate(population["alive"][:population["n_rows"]], capacity)
+    population["capacity"] = capacity
+
+def onboard(population, new_agents, tick):
+    """
+    신규 에이전트를 저장소 끝에 일괄 추가합니다. ids 는 이어지는 번호로 다시 매깁니다.
+    new_agents 에 없는 키(엔진이 추가한 천장/누적 과금 등)는 0 으로 시작합니다.
+
+    Returns:
+        slice: 추가된 행 범위
+    """
+    n_new = len(new_agents['ids'])
+    start = population["n_rows"]
+    stop = start + n_new
+    if stop > population["capacity"]: _grow(population, stop)
+    storage = population["storage"]
+    unknown = set(new_agents) - set(storage)
+    if unknown: raise ValueError(f"New agents have keys missing from the population: {sorted(unknown)}")
+    for key, values in storage.items():
+        if key in new_agents: values[start:stop] = new_agents[key]
+        else: values[start:stop] = 0
+    storage['ids'][start:stop] = np.arange(population["next_id"], population["next_id"] + n_new)
+    storage['joined_tick'][start:stop] = tick
+    population["alive"][start:stop] = True
+    population["next_id"] += n_new
+    population["n_rows"] = stop
+    population["n_live"] += n_new
+    population["version"] += 1
+    cohort = population["cohorts"].setdefault(tick, {"size": 0, "churned": 0, "churned_spend": 0.0})
+    cohort["size"] += n_new
+    return slice(start, stop)
+
+def update_churn(population, agents, rules):
+    """
+    틱 끝의 상태로 이탈 위험 연속 틱을 갱신하고, patience_ticks 에 도달한 에이전트를 이탈 처리합니다.
+    agents: rows_view(population) (행 순서가 저장소와 같아야 함)
+
+    Returns:
+        churned (np.array): 이번 틱에 이탈한 행 번호
+    """
+    alive = population["alive"][:population["n_rows"]]
+    at_risk = agents['state_stress'].ravel() >= rules["stress_threshold"]
+    at_risk |= agents['media_boredom'].mean(axis=1) >= rules["boredom_threshold"]
+    at_risk &= alive
+    streak = agents['churn_streak'].ravel()
+    np.add(streak, 1, out=streak, where=at_risk)
+    streak[~at_risk] = 0
+    churned = np.flatnonzero(streak >= rules["patience_ticks"])
+    if len(churned) == 0: return churned
+
+    alive[churned] = False
+    population["n_live"] -= len(churned)
+    population["version"] += 1
+    joined = agents['joined_tick'][churned].ravel()
+    spend = agents['total_spent'][churned].ravel()
+    for t in np.unique(joined):
+        cohort = population["cohorts"][int(t)]
+        in_cohort = joined == t
+        cohort["churned"] += int(np.count_nonzero(in_cohort))
+        cohort["churned_spend"] += float(spend[in_cohort].sum())
+    return churned
+
+def compact(population):
+    """
+    살아 있는 행을 저장소 앞으로 모읍니다 (행 순서 유지). 이탈한 행이 없으면 아무것도 하지 않습니다.
+
+    Returns:
+        keep (np.array | None): 압축 후 행 i 의 이전 행 번호 (압축하지 않았으면 None)
+    """
+    if not has_dead_rows(population): return None
+    keep = live_indices(population)
+    n_live = len(keep)
+    for values in population["storage"].values():
+        values[:n_live] = values[keep]
+    population["alive"][:population["n_rows"]] = False
+    population["alive"][:n_live] = True
+    population["n_rows"] = n_live
+    population["version"] += 1
+    return keep
+
+def cohort_table(population):
+    """
+    코호트(합류 틱)별 리텐션 / LTV 요약
+
+    Returns:
+        dict: joined_tick, size, live, churned, retention, spend (코호트 전체 누적 과금), ltv (1인당)
+    """
+    agents = rows_view(population)
+    live = live_indices(population)
+    joined = agents['joined_tick'][live].ravel()
+    spend = agents['total_spent'][live].ravel()
+    table = {"joined_tick": [], "size": [], "live": [], "churned": [], "retention": [], "spend": [], "ltv": []}
+    for t, cohort in sorted(population["cohorts"].items()):
+        in_cohort = joined == t
+        total_spend = cohort["churned_spend"] + float(spend[in_cohort].sum())
+        table["joined_tick"].append(t)
+        table["size"].append(cohort["size"])
+        table["live"].append(int(np.count_nonzero(in_cohort)))
+        table["churned"].append(cohort["churned"])
+        table["retention"].append(table["live"][-1] / cohort["size"] if cohort["size"] else 0.0)
+        table["spend"].append(total_spend)
+        table["ltv"].append(total_spend / cohort["size"] if cohort["size"] else 0.0)
+    return table
@@ -9,6 +9,9 @@ import create_csv_data
 # 이 파일은 시뮬레이션에 필요한 모든 CSV 데이터를 로드합니다.
 # load_activity_table: 활동 데이터 로드
 # load_life_patterns: 라이프 패턴 데이터 로드
+# build_inactive_table: 비활성(수면 등) Context Lookup Table 생성
+# load_banner_table: 가챠 배너 표 로드 (선택)
+# load_ad_cpm_table: 매체별 광고 CPM 표 로드 (선택)
 # ==========================================
 
 DATA_PATH = './data'
@@ -87,4 +90,48 @@ def load_life_patterns():
         new_ad[:rows, :cols] = ad_eff_table[:rows, :cols]
         ad_eff_table = new_ad
         
-    return df, stress_table, ad_eff_table
\ No newline at end of file
+    return df, stress_table, ad_eff_table
+
+def build_inactive_table(df_patterns, inactive_contexts=("SLEEP",)):
+    """
+    라이프 패턴의 Context 가 inactive_contexts 에 속하는 틱을 표시하는 Lookup Table 을 만듭니다.
+    (Active Set 스케줄링: 해당 틱의 에이전트는 효용/Knapsack 계산에서 제외)
+    
+    Returns:
+        inactive_table (np.array): [96, 4] (Time x Pattern) bool, True = 비활성
+    """
+    if 'Context' not in df_patterns.columns:
+        return np.zeros((96, 4), dtype=bool)
+
+    is_inactive = df_patterns.assign(Inactive=df_patterns['Context'].isin(list(inactive_contexts)))
+    inactive_table = is_inactive.pivot(index='Time_Index', columns='Pattern_ID', values='Inactive').fillna(False).values.astype(bool)
+
+    # stress_table 과 동일하게 [96, 4] 로 맞춤 (부족한 칸은 활성)
+    if inactive_table.shape != (96, 4):
+        new_inactive = np.zeros((96, 4), dtype=bool)
+        rows = min(96, inactive_table.shape[0])
+        cols = min(4, inactive_table.shape[1])
+        new_inactive[:rows, :cols] = inactive_table[:rows, :cols]
+        inactive_table = new_inactive
+
+    return inactive_table
+
+def load_banner_table():
+    """
+    data/banners.csv (가챠 배너 표)를 로드합니다. 선택 파일이므로 없으면 None.
+
+    Columns: Banner_ID, Activity_IDs ("ACT_A|ACT_B"), Base_Rate, Soft_Pity_Start, Soft_Pity_Step, Hard_Pity, Pulls
+    """
+    file_path = os.path.join(DATA_PATH, 'banners.csv')
+    if not os.path.exists(file_path): return None
+    return pd.read_csv(file_path)
+
+def load_ad_cpm_table():
+    """
+    data/ad_cpm.csv (매체별 광고 CPM)를 로드합니다. 선택 파일이므로 없으면 None (ads.DEFAULT_CPM 사용).
+
+    Columns: Media_Group, CPM
+    """
+    file_path = os.path.join(DATA_PATH, 'ad_cpm.csv')
+    if not os.path.exists(file_path): return None
+    return pd.read_csv(file_path)
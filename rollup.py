@@ -0,0 +1,109 @@
+import numpy as np
+
+# ==========================================
+# Multi-Resolution Log Rollup v1.0
+# ==========================================
+# [Update Log]
+# - Pyramid: 레벨 k 버킷 = FANOUT^k 틱, 버킷마다 min / max / sum / count (레벨 0 = 틱 원본)
+# - Incremental: 틱마다 모든 시계열을 한 벡터로 묶어 레벨별 마지막 버킷만 갱신 (레벨 수 = log_FANOUT(틱 수))
+# - Query: 구간 [start, end) 를 max_points 개 이하 버킷으로 덮는 가장 세밀한 레벨을 골라 반환
+#   → 대시보드 차트/서버 응답 크기가 실행 길이와 무관하게 고정, 확대하면 더 세밀한 레벨 조회
+# ==========================================
+
+ROLLUP_FANOUT = 4
+DEFAULT_MAX_POINTS = 500
+
+def create_rollup(fanout=ROLLUP_FANOUT):
+    """
+    빈 롤업. 시계열 배치(layout)는 첫 append_tick 에서 정해집니다.
+    JSON 직렬화(sim_server.to_jsonable) 후에도 query_series 로 그대로 조회할 수 있습니다.
+    """
+    return {"fanout": int(fanout), "n_ticks": 0, "layout": {}, "levels": []}
+
+def _new_level():
+    return {"min": [], "max": [], "sum": [], "count": []}
+
+def _coarsen(level, fanout):
+    """레벨 버킷을 fanout 개씩 묶은 상위 레벨 (새 레벨을 만들 때 한 번만)"""
+    coarse = _new_level()
+    for start in range(0, len(level["count"]), fanout):
+        stop = start + fanout
+        coarse["min"].append(np.min(level["min"][start:stop], axis=0))
+        coarse["max"].append(np.max(level["max"][start:stop], axis=0))
+        coarse["sum"].append(np.sum(level["sum"][start:stop], axis=0))
+        coarse["count"].append(int(np.sum(level["count"][start:stop])))
+    return coarse
+
+def append_tick(rollup, values):
+    """
+    한 틱의 값을 추가합니다.
+    values: {시계열 이름: 스칼라 또는 1D 배열} (매 틱 같은 이름/길이)
+    """
+    if not rollup["layout"]:
+        offset = 0
+        for name, value in values.items():
+            width = np.size(value)
+            rollup["layout"][name] = [offset, offset + width]
+            offset += width
+        rollup["levels"].append(_new_level())
+    packed = np.concatenate([np.ravel(np.asarray(values[name], dtype=float)) for name in rollup["layout"]])
+
+    fanout = rollup["fanout"]
+    tick = rollup["n_ticks"]
+    bucket_ticks = 1
+    for level in rollup["levels"]:
+        if tick % bucket_ticks == 0:
+            level["min"].append(packed.copy())
+            level["max"].append(packed.copy())
+            level["sum"].append(packed.copy())
+            level["count"].append(1)
+        else:
+            np.minimum(level["min"][-1], packed, out=level["min"][-1])
+            np.maximum(level["max"][-1], packed, out=level["max"][-1])
+            level["sum"][-1] += packed
+            level["count"][-1] += 1
+        bucket_ticks *= fanout
+    rollup["n_ticks"] = tick + 1
+
+    # 최상위 레벨 버킷이 fanout 개를 넘으면 한 단계 더 거친 레벨 추가 (가장 거친 레벨은 항상 fanout 개 이하)
+    while len(rollup["levels"][-1]["count"]) > fanout:
+        rollup["levels"].append(_coarsen(rollup["levels"][-1], fanout))
+
+def series_names(rollup):
+    return list(rollup["layout"])
+
+def query_series(rollup, name, start=0, end=None, max_points=DEFAULT_MAX_POINTS):
+    """
+    구간 [start, end) 틱을 max_points 개 이하 버킷으로 요약합니다.
+    버킷 경계는 레벨 격자에 맞춰지므로 구간 양 끝 버킷이 구간 밖 틱을 일부 포함할 수 있습니다.
+
+    Returns:
+        dict: name, level, bucket_ticks, tick [B] (버킷 시작 틱), min / max / mean [B, width]
+    """
+    if name not in rollup["layout"]:
+        raise KeyError(f"Unknown rollup series: {name}")
+    n_ticks = rollup["n_ticks"]
+    fanout = rollup["fanout"]
+    start = min(max(int(start), 0), n_ticks)
+    end = n_ticks if end is None else min(max(int(end), start), n_ticks)
+    lo, hi = rollup["layout"][name]
+
+    levels = rollup["levels"]
+    for k, level in enumerate(levels):
+        bucket_ticks = fanout ** k
+        first, last = start // bucket_ticks, -(-end // bucket_ticks)
+        if last - first <= max(int(max_points), 1) or k == len(levels) - 1: break
+
+    if not levels or first >= last:
+        empty = np.zeros((0, hi - lo))
+        return {"name": name, "level": 0, "bucket_ticks": 1, "tick": np.zeros(0, dtype=np.int64), "min": empty, "max": empty, "mean": empty}
+    counts = np.asarray(level["count"][first:last], dtype=float).reshape(-1, 1)
+    return {
+        "name": name,
+        "level": k,
+        "bucket_ticks": bucket_ticks,
+        "tick": np.arange(first, last, dtype=np.int64) * bucket_ticks,
+        "min": np.asarray(level["min"][first:last], dtype=float)[:, lo:hi],
+        "max": np.asarray(level["max"][first:last], dtype=float)[:, lo:hi],
+        "mean": np.asarray(level["sum"][first:last], dtype=float)[:, lo:hi] / counts,
+    }
@@ -0,0 +1,111 @@
+import numpy as np
+import genesis
+import psy_sim_config
+import inference
+import engine
+import fused_utility
+import tracemalloc
+import contextlib
+import io
+import time
+
+# ==========================================
+# Benchmarks
+# ==========================================
+# - Workspace Arena: 틱 루프의 정상 상태 틱당 할당 peak (tracemalloc.reset_peak) 가 N 과 무관한지 검증
+# - Fused Utility: calculate_utility + 가성비 나눗셈 vs 한 패스 커널 (백엔드별 소요 시간 + 비트 일치)
+# ==========================================
+
+def bench_tick_allocations(agent_counts=(10000, 40000, 160000), warmup_ticks=8, tolerance_kb=64):
+    """
+    틱마다 tracemalloc.reset_peak() 로 peak 를 초기화하고, 그 틱 동안 틱 시작 사용량 위로 늘어난 최대치를 측정합니다.
+    틱 루프가 [N, *] 임시 배열을 만들지 않는다면 정상 상태(warmup_ticks 이후) 틱 peak 는 N 과 무관해야 합니다.
+    가장 작은 N 과 비교해 tolerance_kb 이상 커지면 AssertionError.
+    """
+    print("=== [Bench] Steady-State Tick Allocations (tracemalloc, per tick) ===\n")
+    df_activities = psy_sim_config.load_activity_table()
+
+    steady_peaks = {}
+    for n_agents in agent_counts:
+        with contextlib.redirect_stdout(io.StringIO()):
+            population = genesis.create_agent_population(n_agents)
+        tick_peaks = []
+        tick_start = [0]
+
+        def on_tick(tick, logs):
+            current, peak = tracemalloc.get_traced_memory()
+            tick_peaks.append(peak - tick_start[0])
+            tracemalloc.reset_peak()
+            tick_start[0] = current
+
+        tracemalloc.start()
+        start_time = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine.run_simulation(population, df_activities, on_tick=on_tick)
+        elapsed = time.time() - start_time
+        tracemalloc.stop()
+
+        steady = np.array(tick_peaks[warmup_ticks:]) / 1024
+        steady_peaks[n_agents] = steady.max()
+        print(f"N={n_agents:>7,} | Tick Peak median: {np.median(steady):8.1f} KB | max: {steady.max():8.1f} KB | {elapsed:.2f}s (traced)")
+
+    base = steady_peaks[min(agent_counts)]
+    growth = {n: peak - base for n, peak in steady_peaks.items()}
+    assert max(growth.values()) < tolerance_kb, f"Steady-state tick peak grows with N (KB over smallest N): {growth}"
+    print(f"\nSteady-state tick peak is independent of N (max growth {max(growth.values()):.1f} KB < {tolerance_kb} KB)")
+
+def bench_fused_utility(n_agents=100000, n_acts=100, n_repeats=5, seed=0):
+    """
+    실제 활동 표를 n_acts 개로 늘린(보상/난이도/비용 흔들기) 입력에서
+    기준 효용 + Knapsack 가성비 계산과 fused_utility 커널을 비교합니다. (같은 시드 → 같은 노이즈)
+    """
+    print("\n=== [Bench] Fused Utility Kernel vs Reference ===\n")
+    rng = np.random.default_rng(seed)
+    base_acts = psy_sim_config.load_activity_table()
+    df_acts = base_acts.iloc[rng.integers(0, len(base_acts), n_acts)].reset_index(drop=True)
+    for col in ("Fun_Reward", "Growth_Reward", "Difficulty", "Stress_Cost"):
+        df_acts[col] = df_acts[col].astype(float) * rng.uniform(0.5, 1.5, n_acts)
+    act_tag_matrix = inference.precompute_activity_tags_matrix(df_acts)
+    act_media_matrix = inference.precompute_media_matrix(df_acts)
+    with contextlib.redirect_stdout(io.StringIO()):
+        agents = genesis.create_agent_population(n_agents)
+    viral_scores = rng.random((1, inference.NUM_MEDIA_TYPES))
+    intensities = df_acts['Intensity'].values.astype(float).reshape(1, -1)
+    intensities[intensities == 0] = 0.1 # decide_actions_knapsack 과 같은 보정
+
+    def run_reference(ws):
+        time_context = engine.build_time_context(agents, np.ones(4), 8, ws)
+        utility = inference.calculate_utility(agents, df_acts, act_tag_matrix, act_media_matrix, time_context, viral_scores=viral_scores, workspace=ws)
+        np.divide(utility, intensities, out=ws['ratios'])
+        return utility
+
+    def run_fused(ws, backend):
+        time_context = engine.build_time_context(agents, np.ones(4), 8, ws)
+        return fused_utility.calculate_utility_fused(
+            agents, df_acts, act_tag_matrix, act_media_matrix, time_context, viral_scores=viral_scores, workspace=ws,
+            ratio_out=ws['ratios'], backend=backend
+        )
+
+    backends = ["numpy"] + (["numba"] if fused_utility.numba is not None else [])
+    runners = [("reference", run_reference)] + [(f"fused/{b}", lambda ws, b=b: run_fused(ws, b)) for b in backends]
+    results = {}
+    for name, runner in runners:
+        ws = inference.create_workspace(n_agents, n_acts, act_tag_matrix.shape[1], seed=seed)
+        runner(ws) # 워밍업 (numba JIT 컴파일)
+        ws['rng'] = np.random.default_rng(seed)
+        start_time = time.perf_counter()
+        for _ in range(n_repeats): utility = runner(ws)
+        elapsed = (time.perf_counter() - start_time) / n_repeats
+        results[name] = (elapsed, utility.copy(), ws['ratios'].copy())
+
+    ref_time, ref_utility, ref_ratios = results["reference"]
+    for name, (elapsed, utility, ratios) in results.items():
+        exact = np.array_equal(utility, ref_utility) and np.array_equal(ratios, ref_ratios)
+        print(f"N={n_agents:,} M={n_acts} | {name:<12} | {elapsed * 1000:8.2f} ms | x{ref_time / elapsed:5.2f} | Bit-exact: {exact}")
+
+def main():
+    bench_tick_allocations()
+    bench_fused_utility()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import engine
+
+# ==========================================
+# Scenario Fork v1.0
+# ==========================================
+# [Update Log]
+# - Shared Baseline: fork_tick 까지 한 번만 실행하고 상태 스냅샷을 저장
+# - Variants: 스냅샷에서 이벤트 변형별로 이어서 실행 (같은 난수 상태에서 출발 → 변형 간 차이 = 이벤트 효과)
+# - Side by Side: 변형별 틱 지표 / 요약 지표를 한 표로 비교
+# ==========================================
+
+SCENARIO_METRICS = ["total_revenue", "avg_stress", "avg_dopamine", "avg_anxiety"]
+
+def fork_agents(agents, snapshot):
+    """
+    스냅샷에서 이어서 실행할 에이전트 dict. 정적 속성은 원본 배열을 공유하고
+    동적 상태만 새 배열로 둡니다. (값은 run_simulation(resume_from=...) 이 스냅샷에서 채움)
+    """
+    forked = dict(agents)
+    for key, values in snapshot["agents"].items():
+        forked[key] = np.empty_like(values)
+    return forked
+
+def run_forked_scenarios(agents, df_activities, fork_tick, variants, base_events=None, **sim_kwargs):
+    """
+    공통 구간(0 ~ fork_tick-1)을 한 번만 실행한 뒤, 변형별 이벤트로 나머지 하루를 이어서 실행합니다.
+
+    variants: {이름: events} fork_tick 이후에 적용할 이벤트 (전체 일정 기준 틱 번호)
+              예) {"x2": {80: HOT_TIME x2}, "x3": {80: HOT_TIME x3}, "none": {}}
+    base_events: 모든 변형에 공통인 이벤트. fork_tick 이전 것은 공통 구간에, 이후 것은 각 변형에 적용
+    sim_kwargs: run_simulation 에 그대로 전달 (inactive_contexts 등, tracer 는 변형끼리 공유되므로 주의)
+
+    Returns:
+        dict: {이름: logs} 각 logs 는 하루 전체(공통 구간 포함) 기록
+    """
+    base_events = base_events or {}
+    prefix_events = {t: evt for t, evt in base_events.items() if t < fork_tick}
+    suffix_events = {t: evt for t, evt in base_events.items() if t >= fork_tick}
+
+    baseline_logs = engine.run_simulation(agents, df_activities, events=prefix_events, fork_tick=fork_tick, **sim_kwargs)
+    snapshot = baseline_logs["snapshot"]
+
+    results = {}
+    for name, variant_events in variants.items():
+        events = dict(suffix_events)
+        events.update(variant_events or {})
+        results[name] = engine.run_simulation(
+            fork_agents(agents, snapshot), df_activities, events=events, resume_from=snapshot, **sim_kwargs
+        )
+    return results
+
+def compare_scenarios(results, metrics=SCENARIO_METRICS):
+    """
+    변형별 틱 지표를 나란히 놓은 표.
+
+    Returns:
+        pd.DataFrame: index = 시각, columns = (metric, 변형 이름) MultiIndex
+    """
+    frames = {}
+    for name, logs in results.items():
+        frames[name] = pd.DataFrame({m: logs[m] for m in metrics}, index=pd.Index(logs["time"], name="time"))
+    return pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+
+def summarize_scenarios(results):
+    """변형별 요약 (하루 매출, 평균/최종 상태). 한 행 = 한 변형"""
+    rows = []
+    for name, logs in results.items():
+        rows.append({
+            "scenario": name,
+            "total_revenue": logs["total_revenue"][-1],
+            "mean_stress": float(np.mean(logs["avg_stress"])),
+            "final_stress": logs["avg_stress"][-1],
+            "final_dopamine": logs["avg_dopamine"][-1],
+            "final_anxiety": logs["avg_anxiety"][-1],
+        })
+    return pd.DataFrame(rows).set_index("scenario")
@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+import inference
+
+# ==========================================
+# Segment Cube v1.0
+# ==========================================
+# [Update Log]
+# - Dimensions: 생활 패턴 / 지갑 분위(10분위 등) / 성향(Big5) 분위로 에이전트를 실행 시작 시 한 번만 구간화
+# - Cube: 틱마다 (세그먼트, 활동) 선택 수를 결합 키 np.bincount 한 번으로 누적 → [틱, 세그먼트, 활동]
+#   (결합 키는 Workspace [N, M] 버퍼에 채우고 선택 여부는 가중치로 → 틱당 할당은 큐브 한 장 크기뿐)
+# - Query: 세그먼트 조건 / 활동 / 시간 단위로 큐브만 잘라서 집계 (재실행 / 에이전트별 데이터 불필요)
+# - Fixed Edges: 기존 구간 경계로 신규(온보딩) 에이전트를 구간화 (assign_segments(levels=...))
+# ==========================================
+
+PATTERN_NAMES = {0: "Office", 1: "Student", 2: "Free", 3: "Night"}
+BIG5_NAMES = ["openness", "conscientiousness", "extraversion", "agreeableness", "neuroticism"]
+
+# ------------------------------------------
+# Dimensions
+# ------------------------------------------
+def pattern_dimension():
+    """생활 패턴 (범주형)"""
+    return {"name": "life_pattern", "kind": "category", "agent_key": "life_pattern", "column": 0,
+            "labels": [PATTERN_NAMES[p] for p in sorted(PATTERN_NAMES)]}
+
+def quantile_dimension(name, agent_key, column=0, n_levels=10):
+    """
+    agents[agent_key][:, column] 의 분위 구간 (n_levels=10 → 10분위, 5 → 5분위)
+    구간 경계는 실행 시작 시점의 인구 분포로 정해지고 큐브에 함께 저장됩니다.
+    """
+    return {"name": name, "kind": "quantile", "agent_key": agent_key, "column": column, "n_levels": int(n_levels)}
+
+def wallet_decile_dimension():
+    return quantile_dimension("wallet_decile", "wallet", 0, 10)
+
+def trait_quantile_dimension(trait, n_levels=5):
+    """Big5 성향 분위 (예: trait_quantile_dimension("extraversion") → 외향성 5분위)"""
+    return quantile_dimension(f"{trait}_q{n_levels}", "traits_big5", BIG5_NAMES.index(trait), n_levels)
+
+def default_segment_dimensions():
+    """엔진 기본 세그먼트: 생활 패턴 × 지갑 10분위 (40 세그먼트)"""
+    return [pattern_dimension(), wallet_decile_dimension()]
+
+# ------------------------------------------
+# Segment Assignment
+# ------------------------------------------
+def assign_segments(agents, dimensions, levels=None):
+    """
+    에이전트별 세그먼트 번호 (차원별 수준을 혼합 기수로 합친 값, 첫 차원이 가장 상위)
+    levels: 이전 assign_segments 결과의 levels. 주면 분위 경계를 다시 계산하지 않고 그대로 사용
+            (실행 중 온보딩된 에이전트를 기존 큐브와 같은 구간으로 나눌 때)
+
+    Returns:
+        segment_ids (np.array): [N] int64
+        levels (list): 차원별 {"name", "labels", "edges"} (큐브에 저장되는 메타데이터)
+    """
+    n_agents = len(agents['ids'])
+    segment_ids = np.zeros(n_agents, dtype=np.int64)
+    fixed_levels, levels = levels, []
+    for i, dim in enumerate(dimensions):
+        values = agents[dim["agent_key"]]
+        values = values[:, dim["column"]] if values.ndim > 1 else values
+        if dim["kind"] == "category":
+            labels = list(dim["labels"])
+            codes = np.clip(values.astype(np.int64), 0, len(labels) - 1)
+            edges = None
+        else:
+            n_levels = dim["n_levels"]
+            if fixed_levels is not None: edges = np.asarray(fixed_levels[i]["edges"], dtype=float)
+            else: edges = np.quantile(values, np.arange(1, n_levels) / n_levels) if n_agents else np.zeros(n_levels - 1)
+            codes = np.searchsorted(edges, values, side='right')
+            labels = [f"Q{i + 1}" for i in range(n_levels)]
+        segment_ids *= len(labels)
+        segment_ids += codes
+        levels.append({"name": dim["name"], "labels": labels, "edges": edges})
+    return segment_ids, levels
+
+# ------------------------------------------
+# Cube
+# ------------------------------------------
+def create_cube(levels, activity_ids, activity_costs, n_ticks):
+    """
+    [틱, 세그먼트, 활동] 선택 수 / 과금 큐브.
+    과금은 활동 비용(양수만)이 고정이므로 선택 수 × 비용으로 채웁니다.
+    """
+    n_segments = int(np.prod([len(level["labels"]) for level in levels]))
+    n_acts = len(activity_ids)
+    return {
+        "levels": levels,
+        "activities": list(activity_ids),
+        "unit_spend": np.maximum(np.asarray(activity_costs, dtype=float), 0.0),
+        "counts": np.zeros((n_ticks, n_segments, n_acts), dtype=np.int64),
+        "spend": np.zeros((n_ticks, n_segments, n_acts)),
+    }
+
+def segment_key_base(segment_ids, n_acts):
+    """
+    에이전트별 결합 키 시작값 (세그먼트 × M). 여기에 활동 번호를 더하면 큐브 키 (세그먼트 × M + 활동)
+    (실행당 한 번 계산, Active Set 틱에서는 활성 에이전트 순서로 take)
+    """
+    return segment_ids * n_acts
+
+def accumulate_tick(cube, tick, action_mask_f, key_base, workspace=None):
+    """
+    이번 틱 선택을 큐브에 누적합니다. (가중치 np.bincount 한 번)
+    action_mask_f: [n, M] float 선택 활동 (전체 인구 또는 Active Set 압축 순서, engine.step_agents 결과)
+    key_base: action_mask_f 의 행 순서에 맞춘 segment_key_base
+    workspace: inference.create_workspace 버퍼 (결합 키 [n, M] 를 'segment_keys' 에 채움 → 틱당 [N, *] 할당 없음)
+    """
+    n_rows, n_acts = action_mask_f.shape
+    keys = inference.get_buffer(workspace, 'segment_keys', (n_rows, n_acts), dtype=np.int64)
+    np.add(key_base[:, np.newaxis], np.arange(n_acts), out=keys)
+    counts = cube["counts"][tick]
+    tally = np.bincount(keys.ravel(), weights=action_mask_f.ravel(), minlength=counts.size)
+    np.add(counts, tally.reshape(counts.shape), out=counts, casting='unsafe')
+    np.multiply(counts, cube["unit_spend"], out=cube["spend"][tick])
+
+# ------------------------------------------
+# Query
+# ------------------------------------------
+def segment_mask(cube, where=None):
+    """
+    where: {차원 이름: 수준 라벨 또는 라벨 목록} (예: {"life_pattern": "Student", "wallet_decile": ["Q1", "Q2"]})
+
+    Returns:
+        np.array: [세그먼트] bool
+    """
+    shape = [len(level["labels"]) for level in cube["levels"]]
+    mask = np.ones(shape, dtype=bool)
+    for axis, level in enumerate(cube["levels"]):
+        selected = (where or {}).get(level["name"])
+        if selected is None: continue
+        selected = [selected] if isinstance(selected, str) else list(selected)
+        keep = np.isin(level["labels"], selected)
+        index = [slice(None)] * len(shape)
+        index[axis] = ~keep
+        mask[tuple(index)] = False
+    unknown = set(where or {}) - {level["name"] for level in cube["levels"]}
+    if unknown: raise ValueError(f"Unknown segment dimensions: {sorted(unknown)}")
+    return mask.ravel()
+
+def query_cube(cube, metric="counts", where=None, activities=None, by=None, time="tick"):
+    """
+    큐브를 잘라서 집계합니다.
+
+    metric: "counts" (선택 수) | "spend" (과금)
+    where: segment_mask 조건 (없으면 전체 세그먼트)
+    activities: 포함할 활동 ID 목록 (없으면 전체). 예) 가챠 활동만 / VIDEO 매체 활동만
+    by: 결과 열로 나눠 볼 차원 이름 목록 ("activity" 포함 가능). 나머지 차원은 합산
+    time: "tick" (15분) | "hour" | None (하루 합계)
+
+    Returns:
+        pd.DataFrame: index = 시간(또는 "total" 한 행), columns = by 의 수준 조합 (by 가 없으면 metric 한 열)
+
+    예) 저지갑 학생의 시간대별 가챠 선택:
+        query_cube(cube, where={"life_pattern": "Student", "wallet_decile": "Q1"}, activities=gacha_ids, time="hour")
+    예) 외향성 5분위별 VIDEO 비중:
+        query_cube(cube, activities=video_ids, by=["extraversion_q5"], time=None) / query_cube(cube, by=["extraversion_q5"], time=None)
+    """
+    by = list(by or [])
+    levels = cube["levels"]
+    names = [level["name"] for level in levels]
+    unknown = set(by) - set(names) - {"activity"}
+    if unknown: raise ValueError(f"Unknown segment dimensions: {sorted(unknown)}")
+
+    data = cube[metric]
+    n_ticks = data.shape[0]
+    act_mask = np.ones(len(cube["activities"]), dtype=bool) if activities is None else np.isin(cube["activities"], list(activities))
+    data = np.where(segment_mask(cube, where)[None, :, None] & act_mask[None, None, :], data, 0)
+
+    # [틱, 차원1, 차원2, ..., 활동] 으로 펼친 뒤 by 에 없는 축을 합산
+    data = data.reshape((n_ticks, *[len(level["labels"]) for level in levels], data.shape[-1]))
+    axis_names = names + ["activity"]
+    drop = tuple(1 + i for i, name in enumerate(axis_names) if name not in by)
+    data = data.sum(axis=drop)
+    kept = [name for name in axis_names if name in by]
+    kept_labels = [(cube["activities"] if name == "activity" else levels[names.index(name)]["labels"]) for name in kept]
+
+    if time == "hour":
+        data = data.reshape((n_ticks // 4, 4, *data.shape[1:])).sum(axis=1)
+        index = pd.Index(np.arange(data.shape[0]), name="hour")
+    elif time is None:
+        data = data.sum(axis=0, keepdims=True)
+        index = pd.Index(["total"], name="time")
+    else:
+        index = pd.Index(np.arange(n_ticks), name="tick")
+
+    data = data.reshape(data.shape[0], -1)
+    if kept:
+        columns = pd.MultiIndex.from_product(kept_labels, names=kept) if len(kept) > 1 else pd.Index(kept_labels[0], name=kept[0])
+    else:
+        columns = pd.Index([metric])
+    return pd.DataFrame(data, index=index, columns=columns)
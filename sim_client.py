@@ -0,0 +1,90 @@
+import json
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+# ==========================================
+# Simulation Job Client v1.0
+# ==========================================
+# [Update Log]
+# - sim_server.py 용 얇은 클라이언트 (urllib, 표준 라이브러리만 사용)
+# - SSE 틱 스트림 파싱, 결과 logs 를 run_simulation 반환 형태로 복원
+# - 요약 / 시계열 구간 조회 (전체 logs 를 받지 않고 크기가 고정된 응답만 받음)
+# - 작업 삭제 (delete_job), 취소는 POST /jobs/{id}/cancel
+# ==========================================
+
+DEFAULT_SERVER_URL = "http://127.0.0.1:8765"
+
+def _request(method, url, payload=None, timeout=30):
+    data = None if payload is None else json.dumps(payload).encode()
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+def submit_job(scenario, server_url=DEFAULT_SERVER_URL):
+    """시나리오(dict: client, n_agents, events, inactive_contexts, seed)를 제출하고 job_id 반환"""
+    return _request("POST", f"{server_url}/jobs", scenario)["job_id"]
+
+def get_job(job_id, server_url=DEFAULT_SERVER_URL):
+    return _request("GET", f"{server_url}/jobs/{job_id}")
+
+def list_jobs(server_url=DEFAULT_SERVER_URL):
+    return _request("GET", f"{server_url}/jobs")
+
+def cancel_job(job_id, server_url=DEFAULT_SERVER_URL):
+    return _request("POST", f"{server_url}/jobs/{job_id}/cancel")
+
+def delete_job(job_id, server_url=DEFAULT_SERVER_URL):
+    """종료된 작업과 결과를 서버에서 삭제 (대기 / 실행 중이면 취소만 됨)"""
+    return _request("DELETE", f"{server_url}/jobs/{job_id}")
+
+def stream_job_events(job_id, server_url=DEFAULT_SERVER_URL, timeout=3600):
+    """
+    SSE 스트림을 (event, data) 튜플로 순회합니다.
+    event == "tick": 틱별 지표, event == "status": 종료 시 최종 작업 상태 (마지막 이벤트)
+    """
+    req = urllib.request.Request(f"{server_url}/jobs/{job_id}/events", headers={"Accept": "text/event-stream"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        event, data_lines = "message", []
+        for raw_line in resp:
+            line = raw_line.decode().rstrip("\r\n")
+            if line == "":
+                if data_lines:
+                    yield event, json.loads("\n".join(data_lines))
+                event, data_lines = "message", []
+            elif line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[5:].strip())
+
+def restore_logs(raw_logs):
+    """JSON 으로 받은 logs 를 engine.run_simulation 반환 형태(int 키, np.array)로 복원"""
+    logs = dict(raw_logs)
+    logs['pattern_stress'] = {int(k): v for k, v in raw_logs.get('pattern_stress', {}).items()}
+    logs['action_counts'] = np.array(raw_logs.get('action_counts', []))
+    for key in ('ad_impressions_by_media', 'ad_revenue_by_media', 'ad_revenue_by_pattern'):
+        if key in raw_logs: logs[key] = [np.array(v) for v in raw_logs[key]]
+    if 'distributions' in raw_logs:
+        logs['distributions'] = {k: np.array(v) for k, v in raw_logs['distributions'].items()}
+    return logs
+
+def get_job_result(job_id, server_url=DEFAULT_SERVER_URL):
+    """전체 logs (작업당 한 번만 받을 수 있음, 이후에는 get_job_summary / get_job_series)"""
+    return restore_logs(_request("GET", f"{server_url}/jobs/{job_id}/result", timeout=300))
+
+def get_job_summary(job_id, server_url=DEFAULT_SERVER_URL):
+    """최종 지표 / 활동별 선택 수 / 시계열 목록 (sim_server.result_summary)"""
+    summary = _request("GET", f"{server_url}/jobs/{job_id}/summary")
+    summary['action_counts'] = np.array(summary['action_counts'])
+    return summary
+
+def get_job_series(job_id, name, start=0, end=None, max_points=None, server_url=DEFAULT_SERVER_URL):
+    """시계열 구간 [start, end) 의 버킷 요약 (rollup.query_series 와 같은 형태, np.array 로 복원)"""
+    query = {"name": name, "start": start}
+    if end is not None: query["end"] = end
+    if max_points is not None: query["max_points"] = max_points
+    series = _request("GET", f"{server_url}/jobs/{job_id}/series?{urllib.parse.urlencode(query)}")
+    for key in ("tick", "min", "max", "mean"):
+        series[key] = np.array(series[key])
+    return series
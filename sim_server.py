@@ -0,0 +1,423 @@
+import asyncio
+import argparse
+import json
+import multiprocessing
+import time
+import traceback
+import uuid
+from collections import deque
+from urllib.parse import parse_qs
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# ==========================================
+# Simulation Job Server v1.0
+# ==========================================
+# [Update Log]
+# - Local Only: 127.0.0.1 에서만 동작하는 asyncio HTTP 서버 (표준 라이브러리만 사용)
+# - Worker Pool: 고정 크기 프로세스 풀에서 시뮬레이션 실행, 분석가(client)별 라운드 로빈 공정 스케줄링
+# - Streaming: 틱별 지표를 Server-Sent Events 로 전송
+# - Job API: 제출 / 상태 / 취소 / 결과 조회
+# - Bounded Views: 요약(최종 지표) / 시계열 구간 조회(logs["rollup"] 다중 해상도) → 응답 크기가 실행 길이와 무관
+# - Retention: 종료 작업은 FINISHED_JOB_TTL 초 / 최근 MAX_FINISHED_JOBS 개만 보관, 전체 logs 는 한 번 받으면 요약 + 롤업만 남김
+# ==========================================
+# POST   /jobs              {"client": "alice", "n_agents": 5000, "events": {...}} → {"job_id": ...}
+# GET    /jobs              작업 목록
+# GET    /jobs/{id}         작업 상태
+# GET    /jobs/{id}/events  틱별 지표 SSE 스트림 (처음부터 재생 후 실시간)
+# GET    /jobs/{id}/result  완료된 작업의 logs (JSON, 한 번만 - 이후 요약 / 시계열만 조회 가능, 410)
+# GET    /jobs/{id}/summary 완료된 작업의 최종 지표 / 활동별 선택 수 / 시계열 목록
+# GET    /jobs/{id}/series?name=avg_stress&start=0&end=96&max_points=500  시계열 구간 (버킷 min/max/mean)
+# DELETE /jobs/{id}         취소 (대기 중이면 큐에서 제거, 실행 중이면 다음 틱에서 중단), 이미 종료된 작업이면 삭제
+# ==========================================
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_QUEUED_JOBS = 256
+MAX_AGENTS = 2_000_000
+MAX_SERIES_POINTS = 5000
+MAX_FINISHED_JOBS = 64     # 보관할 종료 작업 수 (넘으면 오래된 것부터 삭제)
+FINISHED_JOB_TTL = 3600.0  # 종료 작업 보관 시간 (초)
+TERMINAL_STATUSES = ("done", "failed", "cancelled")
+
+HTTP_REASONS = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 410: "Gone", 500: "Internal Server Error", 503: "Service Unavailable"
+}
+
+# ------------------------------------------
+# Worker (별도 프로세스에서 실행)
+# ------------------------------------------
+def to_jsonable(value):
+    """numpy 배열/스칼라와 int 키 dict 를 JSON 으로 직렬화 가능한 형태로 변환"""
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def tick_metrics(tick, logs):
+    """SSE 로 보낼 틱별 요약 지표"""
+    return {
+        "tick": tick,
+        "time": logs['time'][-1],
+        "total_revenue": float(logs['total_revenue'][-1]),
+        "ad_revenue": float(logs['ad_revenue'][-1]),
+        "avg_stress": float(logs['avg_stress'][-1]),
+        "avg_dopamine": float(logs['avg_dopamine'][-1]),
+        "avg_anxiety": float(logs['avg_anxiety'][-1]),
+    }
+
+def result_summary(result):
+    """완료된 작업 logs(JSON) 중 크기가 틱 수와 무관한 부분 (대시보드 첫 화면용)"""
+    rollup = result["rollup"]
+    final = {name: result[name][-1] for name, (lo, hi) in rollup["layout"].items() if hi - lo == 1 and result.get(name)}
+    return {
+        "n_ticks": rollup["n_ticks"],
+        "series": {name: hi - lo for name, (lo, hi) in rollup["layout"].items()},
+        "final": final,
+        "action_counts": result["action_counts"],
+        "events": result["events"],
+        "stopped_at_tick": result.get("stopped_at_tick"),
+    }
+
+def series_view(log_rollup, query):
+    """GET /jobs/{id}/series 쿼리 → rollup.query_series 결과 (max_points 는 MAX_SERIES_POINTS 이하)"""
+    import rollup
+
+    params = {k: v[-1] for k, v in parse_qs(query).items()}
+    if "name" not in params: raise ValueError("series name is required")
+    end = params.get("end")
+    max_points = min(int(params.get("max_points", rollup.DEFAULT_MAX_POINTS)), MAX_SERIES_POINTS)
+    return to_jsonable(rollup.query_series(log_rollup, params["name"], int(params.get("start", 0)), None if end is None else int(end), max_points))
+
+def run_job(scenario, progress_queue, cancel_event):
+    """
+    워커 프로세스 진입점: 인구 생성 → 시뮬레이션.
+    매 틱 progress_queue 로 지표를 보내고, cancel_event 가 설정되면 다음 틱에서 중단합니다.
+    """
+    import genesis
+    import psy_sim_config
+    import engine
+
+    if scenario.get("seed") is not None:
+        np.random.seed(scenario["seed"])
+    df_activities = psy_sim_config.load_activity_table()
+    population = genesis.create_agent_population(scenario["n_agents"])
+    events = {int(t): evt for t, evt in scenario.get("events", {}).items()}
+
+    def on_tick(tick, logs):
+        progress_queue.put(tick_metrics(tick, logs))
+        return not cancel_event.is_set()
+
+    logs = engine.run_simulation(
+        population, df_activities, events=events,
+        inactive_contexts=scenario.get("inactive_contexts"), on_tick=on_tick
+    )
+    return to_jsonable(logs)
+
+# ------------------------------------------
+# Job Scheduling
+# ------------------------------------------
+def create_server_state(max_workers):
+    mp_context = multiprocessing.get_context("spawn")
+    return {
+        "pool": ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context),
+        "manager": mp_context.Manager(),
+        "slots": asyncio.Semaphore(max_workers),
+        "has_work": asyncio.Event(),
+        "jobs": {},             # job_id → job
+        "client_queues": {},    # client → deque[job_id]
+        "client_order": deque(),# 라운드 로빈 순서
+        "n_queued": 0,
+    }
+
+def validate_scenario(payload):
+    """제출된 시나리오를 검증/정규화. 잘못된 값이면 ValueError"""
+    if not isinstance(payload, dict): raise ValueError("scenario must be a JSON object")
+    n_agents = int(payload.get("n_agents", 5000))
+    if not 1 <= n_agents <= MAX_AGENTS: raise ValueError(f"n_agents must be in [1, {MAX_AGENTS}]")
+    events = payload.get("events") or {}
+    if not isinstance(events, dict): raise ValueError("events must be an object {tick: event}")
+    for tick, evt in events.items():
+        int(tick)
+        if not isinstance(evt, dict) or "Type" not in evt: raise ValueError("each event needs a 'Type'")
+    inactive_contexts = payload.get("inactive_contexts")
+    if inactive_contexts is not None and not isinstance(inactive_contexts, list):
+        raise ValueError("inactive_contexts must be a list")
+    seed = payload.get("seed")
+    return {
+        "n_agents": n_agents,
+        "events": events,
+        "inactive_contexts": inactive_contexts,
+        "seed": None if seed is None else int(seed),
+    }
+
+def job_summary(state, job):
+    summary = {
+        "job_id": job["job_id"],
+        "client": job["client"],
+        "status": job["status"],
+        "n_agents": job["scenario"]["n_agents"],
+        "ticks_done": len(job["metrics"]),
+        "submitted_at": job["submitted_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"],
+    }
+    if job["status"] == "queued":
+        summary["queue_position"] = list(state["client_queues"][job["client"]]).index(job["job_id"])
+    return summary
+
+async def notify(job):
+    async with job["changed"]:
+        job["changed"].notify_all()
+
+def submit_job(state, client, scenario):
+    job_id = uuid.uuid4().hex[:12]
+    job = {
+        "job_id": job_id,
+        "client": client,
+        "scenario": scenario,
+        "status": "queued",
+        "submitted_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "metrics": [],
+        "result": None,  # 전체 logs (GET /result 로 한 번 받으면 None)
+        "summary": None, # result_summary (작업 삭제 전까지 유지)
+        "rollup": None,  # logs["rollup"] (시계열 구간 조회용)
+        "error": None,
+        "cancel_event": state["manager"].Event(),
+        "changed": asyncio.Condition(),
+    }
+    state["jobs"][job_id] = job
+    if client not in state["client_queues"]:
+        state["client_queues"][client] = deque()
+        state["client_order"].append(client)
+    state["client_queues"][client].append(job_id)
+    state["n_queued"] += 1
+    state["has_work"].set()
+    return job
+
+def evict_finished_jobs(state, now=None):
+    """보관 시간이 지났거나 MAX_FINISHED_JOBS 를 넘는 종료 작업을 오래된 순으로 삭제"""
+    now = time.time() if now is None else now
+    finished = sorted((j for j in state["jobs"].values() if j["status"] in TERMINAL_STATUSES), key=lambda j: j["finished_at"])
+    n_over = len(finished) - MAX_FINISHED_JOBS
+    for i, job in enumerate(finished):
+        if i < n_over or now - job["finished_at"] > FINISHED_JOB_TTL:
+            del state["jobs"][job["job_id"]]
+
+def next_job(state):
+    """분석가별 큐를 라운드 로빈으로 돌며 다음 작업을 꺼냄 (한 사람이 큐를 독점하지 못하게)"""
+    for _ in range(len(state["client_order"])):
+        client = state["client_order"][0]
+        state["client_order"].rotate(-1)
+        queue = state["client_queues"][client]
+        if queue:
+            state["n_queued"] -= 1
+            return state["jobs"][queue.popleft()]
+    return None
+
+async def cancel_job(state, job):
+    if job["status"] == "queued":
+        state["client_queues"][job["client"]].remove(job["job_id"])
+        state["n_queued"] -= 1
+        job["status"] = "cancelled"
+        job["finished_at"] = time.time()
+        await notify(job)
+    elif job["status"] == "running":
+        job["cancel_event"].set()
+
+async def pump_progress(job, progress_queue):
+    # 워커가 보내는 틱 지표를 이벤트 루프로 옮김 (None = 종료 신호)
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await loop.run_in_executor(None, progress_queue.get)
+        if item is None: break
+        job["metrics"].append(item)
+        await notify(job)
+
+async def execute_job(state, job):
+    loop = asyncio.get_running_loop()
+    progress_queue = state["manager"].Queue()
+    job["status"] = "running"
+    job["started_at"] = time.time()
+    await notify(job)
+
+    pump = asyncio.create_task(pump_progress(job, progress_queue))
+    status, result, error = "done", None, None
+    try:
+        result = await loop.run_in_executor(state["pool"], run_job, job["scenario"], progress_queue, job["cancel_event"])
+        if "stopped_at_tick" in result: status = "cancelled"
+    except Exception as e:
+        status, error = "failed", repr(e)
+    finally:
+        progress_queue.put(None)
+        await pump
+        # 남은 지표를 모두 옮긴 뒤 상태를 바꿔야 SSE 가 마지막 틱을 놓치지 않음
+        job["status"], job["result"], job["error"] = status, result, error
+        if result is not None:
+            job["summary"], job["rollup"] = result_summary(result), result["rollup"]
+        job["finished_at"] = time.time()
+        await notify(job)
+        state["slots"].release()
+        evict_finished_jobs(state)
+
+async def dispatcher(state):
+    """워커 슬롯이 비면 다음 작업을 공정 순서로 꺼내 실행"""
+    while True:
+        await state["slots"].acquire()
+        job = next_job(state)
+        while job is None:
+            state["has_work"].clear()
+            await state["has_work"].wait()
+            job = next_job(state)
+        asyncio.create_task(execute_job(state, job))
+
+# ------------------------------------------
+# HTTP
+# ------------------------------------------
+async def send_json(writer, status_code, payload):
+    body = json.dumps(payload).encode()
+    header = (
+        f"HTTP/1.1 {status_code} {HTTP_REASONS[status_code]}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    writer.write(header.encode() + body)
+    await writer.drain()
+
+async def stream_events(state, job, writer):
+    """SSE: 지금까지의 틱 지표를 재생한 뒤 새 틱을 실시간 전송, 종료 시 status 이벤트"""
+    writer.write((
+        "HTTP/1.1 200 OK\r\n"
+        "Content-Type: text/event-stream\r\n"
+        "Cache-Control: no-cache\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode())
+    await writer.drain()
+
+    sent = 0
+    while True:
+        async with job["changed"]:
+            await job["changed"].wait_for(lambda: len(job["metrics"]) > sent or job["status"] in TERMINAL_STATUSES)
+        while sent < len(job["metrics"]):
+            writer.write(f"event: tick\ndata: {json.dumps(job['metrics'][sent])}\n\n".encode())
+            sent += 1
+        if job["status"] in TERMINAL_STATUSES and sent == len(job["metrics"]):
+            writer.write(f"event: status\ndata: {json.dumps(job_summary(state, job))}\n\n".encode())
+            await writer.drain()
+            return
+        await writer.drain()
+
+async def route(state, method, path, body, writer):
+    evict_finished_jobs(state)
+    parts = path.split("?", 1)[0].strip("/").split("/")
+    if parts[0] != "jobs":
+        return await send_json(writer, 404, {"error": "not found"})
+
+    if len(parts) == 1:
+        if method == "GET":
+            return await send_json(writer, 200, [job_summary(state, j) for j in state["jobs"].values()])
+        if method == "POST":
+            if state["n_queued"] >= MAX_QUEUED_JOBS:
+                return await send_json(writer, 503, {"error": "job queue is full"})
+            try:
+                payload = json.loads(body or b"{}")
+                scenario = validate_scenario(payload)
+            except (ValueError, TypeError) as e:
+                return await send_json(writer, 400, {"error": str(e)})
+            job = submit_job(state, str(payload.get("client", "anonymous")), scenario)
+            return await send_json(writer, 202, job_summary(state, job))
+        return await send_json(writer, 405, {"error": "method not allowed"})
+
+    job = state["jobs"].get(parts[1])
+    if job is None:
+        return await send_json(writer, 404, {"error": "unknown job"})
+    action = parts[2] if len(parts) > 2 else ""
+
+    if method == "GET" and action == "":
+        return await send_json(writer, 200, job_summary(state, job))
+    if method == "GET" and action == "events":
+        return await stream_events(state, job, writer)
+    if method == "GET" and action == "result":
+        if job["result"] is None:
+            if job["summary"] is not None:
+                return await send_json(writer, 410, {"error": "full result was already fetched; use /summary and /series"})
+            return await send_json(writer, 409, {"error": f"job is {job['status']}"})
+        # 전체 logs 는 한 번만 보관 → 이후에는 요약 + 롤업만 남김
+        result, job["result"] = job["result"], None
+        return await send_json(writer, 200, result)
+    if method == "GET" and action in ("summary", "series"):
+        if job["summary"] is None:
+            return await send_json(writer, 409, {"error": f"job is {job['status']}"})
+        if action == "summary":
+            return await send_json(writer, 200, job["summary"])
+        try:
+            return await send_json(writer, 200, series_view(job["rollup"], path.partition("?")[2]))
+        except (KeyError, ValueError) as e:
+            return await send_json(writer, 400, {"error": str(e)})
+    if method == "DELETE" and action == "" and job["status"] in TERMINAL_STATUSES:
+        del state["jobs"][job["job_id"]]
+        return await send_json(writer, 200, {**job_summary(state, job), "deleted": True})
+    if (method == "DELETE" and action == "") or (method == "POST" and action == "cancel"):
+        await cancel_job(state, job)
+        return await send_json(writer, 200, job_summary(state, job))
+    return await send_json(writer, 405, {"error": "method not allowed"})
+
+async def handle_connection(state, reader, writer):
+    try:
+        request_line = await reader.readline()
+        if not request_line: return
+        method, path, _ = request_line.decode().split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""): break
+            key, _, value = line.decode().partition(":")
+            headers[key.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        body = await reader.readexactly(length) if length else b""
+        try:
+            await route(state, method.upper(), path, body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception as e:
+            # 처리 중 예외: 로그를 남기고 500 으로 응답 (응답 없이 연결만 끊지 않음)
+            print(f"[Job Server] {method} {path} failed")
+            traceback.print_exc()
+            await send_json(writer, 500, {"error": f"internal server error: {e!r}"})
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(port=DEFAULT_PORT, max_workers=None):
+    max_workers = max_workers or max(1, multiprocessing.cpu_count() - 1)
+    state = create_server_state(max_workers)
+    server = await asyncio.start_server(lambda r, w: handle_connection(state, r, w), HOST, port)
+    print(f"[Job Server] http://{HOST}:{port} | workers={max_workers}")
+    try:
+        async with server:
+            await asyncio.gather(server.serve_forever(), dispatcher(state))
+    finally:
+        state["pool"].shutdown(cancel_futures=True)
+        state["manager"].shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local simulation job server (127.0.0.1 only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="프로세스 풀 크기 (기본: CPU - 1)")
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.workers))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import numpy as np
+
+# ==========================================
+# Distribution Sketches v1.0
+# ==========================================
+# [Update Log]
+# - Linear Histogram: 범위가 정해진 상태값(0~100)용 고정 구간 히스토그램
+# - Log Sketch: 지갑/과금처럼 꼬리가 긴 값용 상대 오차 보장 분위수 스케치 (DDSketch 방식)
+# - Mergeable: 같은 스펙의 counts 는 더하기만 하면 병합 (샤드/틱 합산)
+# ==========================================
+
+def default_distribution_specs():
+    """
+    엔진이 틱마다 추적하는 분포 목록: {metric: (agents 키, 스펙)}
+    상태값(0~100)은 1.0 폭 히스토그램, 지갑/누적 과금은 1% 상대 오차 로그 스케치
+    """
+    return {
+        "stress": ("state_stress", create_linear_histogram(0, 100, 100)),
+        "dopamine": ("state_dopamine", create_linear_histogram(0, 100, 100)),
+        "anxiety": ("state_anxiety", create_linear_histogram(0, 100, 100)),
+        "wallet": ("wallet", create_log_sketch(0.01)),
+        "spend": ("total_spent", create_log_sketch(0.01)),
+    }
+
+def create_linear_histogram(lo, hi, n_bins=100):
+    """[lo, hi] 를 n_bins 개의 같은 폭 구간으로 나눈 히스토그램 스펙. 범위 밖 값은 양 끝 구간에 포함"""
+    return {"kind": "linear", "lo": float(lo), "hi": float(hi), "n_bins": int(n_bins)}
+
+def create_log_sketch(relative_accuracy=0.01, min_value=1.0, max_value=1e10):
+    """
+    로그 구간 분위수 스케치 스펙. |x| >= min_value 인 값의 분위수를 상대 오차 relative_accuracy 이내로 추정합니다.
+    음수는 대칭 구간에, 정확히 0 인 값은 가운데 0 구간에, 0 < |x| < min_value 는 가장 작은 구간에 모읍니다.
+    구간 순서 = 값 순서이므로 누적합으로 분위수를 구합니다.
+    """
+    gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+    log_gamma = np.log(gamma)
+    key_min = int(np.ceil(np.log(min_value) / log_gamma))
+    key_max = int(np.ceil(np.log(max_value) / log_gamma))
+    n_side = key_max - key_min + 1
+    return {
+        "kind": "log", "gamma": gamma, "log_gamma": log_gamma, "min_value": float(min_value),
+        "key_min": key_min, "n_side": n_side, "n_bins": 2 * n_side + 1
+    }
+
+def sketch_counts(spec, values, scratch=None, index_scratch=None):
+    """
+    values 를 한 번의 벡터 연산 흐름으로 구간 인덱스로 바꿔 np.bincount 로 집계합니다.
+    scratch / index_scratch: values 와 같은 크기의 float / int64 버퍼 (주면 임시 배열을 만들지 않음)
+
+    Returns:
+        counts (np.array): [n_bins] int64
+    """
+    values = values.ravel()
+    if scratch is None: scratch = np.empty(values.shape)
+    if index_scratch is None: index_scratch = np.empty(values.shape, dtype=np.int64)
+    n_bins = spec["n_bins"]
+
+    if spec["kind"] == "linear":
+        np.subtract(values, spec["lo"], out=scratch)
+        scratch *= n_bins / (spec["hi"] - spec["lo"])
+        np.floor(scratch, out=scratch)
+        np.clip(scratch, 0, n_bins - 1, out=scratch)
+        np.copyto(index_scratch, scratch, casting='unsafe')
+        return np.bincount(index_scratch, minlength=n_bins)
+
+    # [Log] key = ceil(log|x| / log γ) → 양수: n_side+1+..., 0: n_side, 음수: n_side-1-...
+    n_side = spec["n_side"]
+    np.abs(values, out=scratch)
+    np.maximum(scratch, spec["min_value"], out=scratch)
+    np.log(scratch, out=scratch)
+    scratch /= spec["log_gamma"]
+    np.ceil(scratch, out=scratch)
+    scratch -= spec["key_min"]
+    np.clip(scratch, 0, n_side - 1, out=scratch)
+    scratch += 1.0
+    # 부호(-1, 0, +1)를 곱한 뒤 중앙(0 구간)으로 이동
+    scratch *= np.sign(values, out=index_scratch, casting='unsafe')
+    scratch += n_side
+    np.copyto(index_scratch, scratch, casting='unsafe')
+    return np.bincount(index_scratch, minlength=spec["n_bins"])
+
+def sketch_bin_values(spec):
+    """각 구간의 대표값 [n_bins] (분위수 추정/그래프용)"""
+    if spec["kind"] == "linear":
+        width = (spec["hi"] - spec["lo"]) / spec["n_bins"]
+        return spec["lo"] + (np.arange(spec["n_bins"]) + 0.5) * width
+    gamma, n_side = spec["gamma"], spec["n_side"]
+    keys = spec["key_min"] + np.arange(n_side)
+    magnitudes = 2.0 * gamma ** keys / (gamma + 1.0)
+    return np.concatenate([-magnitudes[::-1], [0.0], magnitudes])
+
+def sketch_quantiles(spec, counts, quantiles=(0.5, 0.9, 0.99)):
+    """
+    counts ([n_bins] 또는 틱별 [T, n_bins]) 에서 분위수를 추정합니다.
+
+    Returns:
+        np.array: [len(quantiles)] 또는 [T, len(quantiles)]
+    """
+    single = np.ndim(counts) == 1
+    counts = np.atleast_2d(counts)
+    cumulative = np.cumsum(counts, axis=1)
+    totals = cumulative[:, -1:]
+    targets = np.asarray(quantiles).reshape(1, -1) * np.maximum(totals, 1)
+    # 각 분위수마다 누적합이 목표 이상이 되는 첫 구간
+    bin_idx = np.sum(cumulative[:, np.newaxis, :] < targets[:, :, np.newaxis], axis=2)
+    bin_idx = np.minimum(bin_idx, spec["n_bins"] - 1)
+    result = sketch_bin_values(spec)[bin_idx]
+    result[totals[:, 0] == 0] = np.nan
+    return result[0] if single else result
+
+def merge_sketch_counts(counts_list):
+    """같은 스펙으로 만든 counts (샤드별, 틱별 등)를 합칩니다."""
+    return np.sum(np.stack([np.asarray(c) for c in counts_list]), axis=0)
@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+import itertools
+import multiprocessing
+import contextlib
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor
+import engine
+import inference
+
+# ==========================================
+# Parameter Sweep v1.0
+# ==========================================
+# [Update Log]
+# - Designs: 격자(grid) / 무작위(random) / 라틴 하이퍼큐브(LHS) 실험 설계
+# - Named Params: "sim.<키>" (engine.DEFAULT_PARAMS), "activity.<ID>.<열>" (activities 표), "event.<틱>.<필드>" (이벤트)
+# - Process Pool: 인구는 한 번만 생성해 워커에 읽기 전용으로 공유 (fork 시 복사 없음), 실행마다 동적 상태만 복사
+# - Tidy Result: 설계점 한 행 = 파라미터 + 요약 지표
+# ==========================================
+
+# ------------------------------------------
+# Designs
+# ------------------------------------------
+def grid_design(space):
+    """
+    space: {파라미터 이름: 값 목록} → 모든 조합
+
+    Returns:
+        pd.DataFrame: 한 행 = 한 설계점
+    """
+    names = list(space.keys())
+    return pd.DataFrame(list(itertools.product(*[space[n] for n in names])), columns=names)
+
+def random_design(space, n_points, seed=None):
+    """space: {파라미터 이름: (lo, hi)} → 각 축 균등 분포에서 n_points 개"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({name: rng.uniform(lo, hi, n_points) for name, (lo, hi) in space.items()})
+
+def latin_hypercube_design(space, n_points, seed=None):
+    """
+    space: {파라미터 이름: (lo, hi)} → 라틴 하이퍼큐브 n_points 개
+    각 축을 n_points 개 구간으로 나눠 구간마다 정확히 한 점씩 (축끼리는 무작위 순열로 짝지음)
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, (lo, hi) in space.items():
+        unit = (rng.permutation(n_points) + rng.random(n_points)) / n_points
+        columns[name] = lo + (hi - lo) * unit
+    return pd.DataFrame(columns)
+
+# ------------------------------------------
+# Applying a Design Point
+# ------------------------------------------
+def apply_point(point, df_activities, events=None):
+    """
+    설계점 하나를 실행 입력으로 변환합니다. (원본 표/이벤트는 수정하지 않음)
+
+    point: {파라미터 이름: 값}
+        "sim.gacha_base_prob"        → run_simulation(params=...)
+        "activity.ACT_GM_GACHA.Cost" → activities 표의 해당 ID 행, 해당 열
+        "event.80.Value"             → events[80]["Value"] (이벤트가 미리 있어야 함)
+
+    Returns:
+        (df_activities, events, params)
+    """
+    df = df_activities.copy()
+    events = {t: dict(evt) for t, evt in (events or {}).items()}
+    params = {}
+    for name, value in point.items():
+        kind, _, rest = name.partition(".")
+        if kind == "sim":
+            if rest not in engine.DEFAULT_PARAMS: raise ValueError(f"Unknown sim param: {name}")
+            params[rest] = float(value)
+        elif kind == "activity":
+            act_id, _, column = rest.rpartition(".")
+            rows = df['ID'] == act_id
+            if not rows.any() or column not in df.columns: raise ValueError(f"Unknown activity param: {name}")
+            df[column] = df[column].astype(float)
+            df.loc[rows, column] = float(value)
+        elif kind == "event":
+            tick, _, field = rest.partition(".")
+            if int(tick) not in events: raise ValueError(f"No event scheduled at tick {tick}: {name}")
+            events[int(tick)][field] = value
+        else:
+            raise ValueError(f"Unknown parameter namespace: {name}")
+    return df, events, params
+
+def summarize_logs(logs, agents, df_activities):
+    """한 번의 실행을 요약 지표 dict 로 (sweep 결과 표의 한 행)"""
+    gambling_idx = inference.TAG_TO_IDX.get("Gambling")
+    act_tags = inference.precompute_activity_tags_matrix(df_activities)
+    is_gacha = act_tags[:, gambling_idx] > 0 if gambling_idx is not None else np.zeros(len(df_activities), dtype=bool)
+    summary = {
+        "total_revenue": float(logs["total_revenue"][-1]),
+        "mean_stress": float(np.mean(logs["avg_stress"])),
+        "final_stress": float(logs["avg_stress"][-1]),
+        "final_dopamine": float(logs["avg_dopamine"][-1]),
+        "final_anxiety": float(logs["avg_anxiety"][-1]),
+        "payer_rate": float(np.mean(agents["total_spent"] > 0)),
+        "gacha_actions": float(np.sum(logs["action_counts"][is_gacha])),
+    }
+    if "spend" in logs.get("distribution_quantiles", {}):
+        summary["spend_p99"] = float(logs["distribution_quantiles"]["spend"]["p99"][-1])
+    return summary
+
+# ------------------------------------------
+# Workers
+# ------------------------------------------
+_WORKER = {} # 워커 프로세스별 공유 입력 (initializer 에서 한 번만 설정)
+
+def copy_dynamic_state(population):
+    """실행용 agents: 정적 속성은 population 과 공유, 실행이 바꾸는 동적 상태(engine.DYNAMIC_STATE_KEYS)만 복사"""
+    agents = dict(population)
+    for key in engine.DYNAMIC_STATE_KEYS:
+        if key in population: agents[key] = population[key].copy()
+    return agents
+
+def _init_worker(population, df_activities, events, sim_kwargs):
+    _WORKER.update(population=population, df_activities=df_activities, events=events, sim_kwargs=sim_kwargs)
+
+def _run_point(task):
+    point_id, point, seed = task
+    population = _WORKER["population"]
+    df, events, params = apply_point(point, _WORKER["df_activities"], _WORKER["events"])
+
+    agents = copy_dynamic_state(population)
+
+    if seed is not None: np.random.seed(seed)
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        logs = engine.run_simulation(agents, df, events=events, params=params, **_WORKER["sim_kwargs"])
+    row = {"point_id": point_id, **point, **summarize_logs(logs, agents, df)}
+    row["elapsed_sec"] = time.perf_counter() - start_time
+    return row
+
+def run_sweep(design, population, df_activities, events=None, n_workers=None, seed=0, chunksize=None, **sim_kwargs):
+    """
+    설계(design)의 모든 점을 프로세스 풀에서 실행하고 요약 지표 표를 반환합니다.
+
+    design: grid_design / random_design / latin_hypercube_design 결과 (또는 같은 형태의 DataFrame)
+    population: genesis.create_agent_population 결과. 워커에 한 번만 전달되고 수정되지 않음
+    events: 기준 이벤트 (설계점의 "event.*" 파라미터가 값을 덮어씀)
+    n_workers: 프로세스 수 (기본 CPU 수, 1 이면 현재 프로세스에서 순차 실행)
+    seed: 모든 설계점에 같은 난수 시드 사용 (공통 난수 → 점 간 차이 = 파라미터 효과). None 이면 매번 다름
+    sim_kwargs: run_simulation 에 그대로 전달 (inactive_contexts 등)
+
+    Returns:
+        pd.DataFrame: 한 행 = 한 설계점 (point_id, 파라미터 열, 요약 지표 열)
+    """
+    points = design.to_dict(orient="records")
+    tasks = [(i, point, seed) for i, point in enumerate(points)]
+    n_workers = n_workers or multiprocessing.cpu_count()
+    initargs = (population, df_activities, events or {}, sim_kwargs)
+
+    if n_workers == 1:
+        _init_worker(*initargs)
+        rows = [_run_point(task) for task in tasks]
+    else:
+        # fork 가능한 환경에서는 인구 배열을 복사 없이(copy-on-write) 워커와 공유
+        methods = multiprocessing.get_all_start_methods()
+        mp_context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        chunksize = chunksize or max(1, len(tasks) // (n_workers * 4))
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context, initializer=_init_worker, initargs=initargs) as pool:
+            rows = list(pool.map(_run_point, tasks, chunksize=chunksize))
+
+    return pd.DataFrame(rows).set_index("point_id")
@@ -0,0 +1,281 @@
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+# ==========================================
+# Run Telemetry v1.0
+# ==========================================
+# [Update Log]
+# - Run Metrics: 틱 처리량(ticks/s, agent-ticks/s), 단계별 지연(phase), 최대 RSS, 진행률
+# - Pluggable Sinks: OpenMetrics 텍스트 파일(node_exporter textfile 수집용) / 로컬 HTTP 익스포터(/metrics) / JSON-lines
+#   sink 는 {"publish": fn(record), "close": fn()} dict 또는 fn(record) (외부 의존성 없음, 오프라인 동작)
+# - Zero Cost When Off: engine.run_simulation(telemetry=None) 이면 틱 루프에서 None 비교만 수행
+# - Fleet: 한 sink 를 여러 실행이 공유하면 run_id 별 최신 값을 모아 함께 노출
+# ==========================================
+
+METRIC_PREFIX = "psysim"
+DEFAULT_HTTP_PORT = 9464
+DEFAULT_INTERVAL_SECONDS = 1.0 # 틱 중간 발행 최소 간격 (마지막 틱 / 종료 시에는 항상 발행)
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# ------------------------------------------
+# Telemetry State
+# ------------------------------------------
+def create_telemetry(sinks, run_id=None, labels=None, interval_seconds=DEFAULT_INTERVAL_SECONDS):
+    """
+    실행 하나의 텔레메트리 상태 (engine.run_simulation(telemetry=...) 에 넘김)
+
+    sinks: sink 목록 (openmetrics_file_sink / openmetrics_http_sink / jsonl_sink 또는 fn(record))
+    run_id: 실행 식별자 (기본 무작위). 스케줄러의 작업 ID 등을 넣으면 sink 에서 실행별로 구분됨
+    labels: 모든 지표에 붙일 추가 라벨 (예: {"scenario": "hot_time_x3"})
+    """
+    return {
+        "run_id": run_id or uuid.uuid4().hex[:12],
+        "labels": dict(labels or {}),
+        "sinks": [sink if isinstance(sink, dict) else {"publish": sink} for sink in sinks],
+        "interval_seconds": interval_seconds,
+        "status": "created",
+        "start_time": None,
+        "last_mark": None,
+        "last_publish": None,
+        "start_tick": 0,
+        "total_ticks": 0,
+        "tick": -1,
+        "ticks_done": 0,
+        "agent_ticks": 0,
+        "n_agents": 0,
+        "revenue": 0.0,
+        "phase_seconds": {},      # 단계별 누적 시간
+        "phase_last_seconds": {}, # 단계별 마지막 틱 시간
+    }
+
+def start_run(telemetry):
+    """실행 시작 (준비 단계 시간도 "setup" 단계로 잡히도록 run_simulation 진입 직후 호출)"""
+    now = time.perf_counter()
+    telemetry.update(status="running", start_time=now, last_mark=now, last_publish=now, wall_start=time.time())
+
+def set_timeline(telemetry, total_ticks, start_tick=0, n_agents=0):
+    """틱 루프 직전: 진행률 기준 (이어서 실행이면 start_tick 부터)"""
+    telemetry.update(total_ticks=int(total_ticks), start_tick=int(start_tick), tick=int(start_tick) - 1, n_agents=int(n_agents))
+
+def mark(telemetry, phase):
+    """직전 mark 이후 경과 시간을 phase 에 누적 (엔진 틱 루프의 단계 경계에서 호출)"""
+    now = time.perf_counter()
+    elapsed = now - telemetry["last_mark"]
+    telemetry["last_mark"] = now
+    telemetry["phase_seconds"][phase] = telemetry["phase_seconds"].get(phase, 0.0) + elapsed
+    telemetry["phase_last_seconds"][phase] = elapsed
+
+def end_tick(telemetry, tick, n_agents, revenue):
+    """틱 완료 기록. 발행 간격이 지났거나 마지막 틱이면 sink 로 발행"""
+    telemetry["tick"] = tick
+    telemetry["ticks_done"] += 1
+    telemetry["agent_ticks"] += n_agents
+    telemetry["n_agents"] = n_agents
+    telemetry["revenue"] = float(revenue)
+    if telemetry["last_mark"] - telemetry["last_publish"] >= telemetry["interval_seconds"] or tick + 1 >= telemetry["total_ticks"]:
+        publish(telemetry)
+
+def finish_run(telemetry, status="done"):
+    """실행 종료 (status: done / stopped / forked / failed). 최종 값을 발행하고 sink 는 닫지 않음"""
+    telemetry["status"] = status
+    publish(telemetry)
+
+def close_sinks(telemetry):
+    for sink in telemetry["sinks"]:
+        if sink.get("close") is not None: sink["close"]()
+
+# ------------------------------------------
+# Records
+# ------------------------------------------
+def peak_rss_bytes():
+    """프로세스 최대 RSS (resource 모듈이 없으면 None)"""
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024 # Linux 는 KB 단위
+
+def snapshot(telemetry):
+    """sink 로 보내는 현재 값 (JSON 직렬화 가능)"""
+    elapsed = time.perf_counter() - telemetry["start_time"] if telemetry["start_time"] is not None else 0.0
+    span = max(telemetry["total_ticks"] - telemetry["start_tick"], 1)
+    return {
+        "run_id": telemetry["run_id"],
+        "labels": telemetry["labels"],
+        "status": telemetry["status"],
+        "timestamp": time.time(),
+        "start_timestamp": telemetry.get("wall_start"),
+        "tick": telemetry["tick"],
+        "total_ticks": telemetry["total_ticks"],
+        "progress": min((telemetry["tick"] + 1 - telemetry["start_tick"]) / span, 1.0),
+        "ticks_done": telemetry["ticks_done"],
+        "elapsed_seconds": elapsed,
+        "ticks_per_second": telemetry["ticks_done"] / elapsed if elapsed > 0 else 0.0,
+        "agent_ticks_per_second": telemetry["agent_ticks"] / elapsed if elapsed > 0 else 0.0,
+        "agents": telemetry["n_agents"],
+        "revenue": telemetry["revenue"],
+        "peak_rss_bytes": peak_rss_bytes(),
+        "phase_seconds": dict(telemetry["phase_seconds"]),
+        "phase_last_seconds": dict(telemetry["phase_last_seconds"]),
+    }
+
+def publish(telemetry):
+    record = snapshot(telemetry)
+    telemetry["last_publish"] = time.perf_counter()
+    for sink in telemetry["sinks"]:
+        sink["publish"](record)
+
+# ------------------------------------------
+# OpenMetrics
+# ------------------------------------------
+# (이름, 종류, 설명, record → 값) / 단계별 지표는 phase 라벨로 펼침
+GAUGES = [
+    ("ticks_per_second", "gauge", "Average simulated ticks per wall-clock second", lambda r: r["ticks_per_second"]),
+    ("agent_ticks_per_second", "gauge", "Average agent-ticks per wall-clock second", lambda r: r["agent_ticks_per_second"]),
+    ("progress_ratio", "gauge", "Fraction of the run timeline completed", lambda r: r["progress"]),
+    ("current_tick", "gauge", "Last completed tick", lambda r: r["tick"]),
+    ("total_ticks", "gauge", "Ticks in the run timeline", lambda r: r["total_ticks"]),
+    ("agents", "gauge", "Live agents in the last completed tick", lambda r: r["agents"]),
+    ("revenue", "gauge", "Cumulative simulated revenue", lambda r: r["revenue"]),
+    ("peak_rss_bytes", "gauge", "Peak resident set size of the process", lambda r: r["peak_rss_bytes"]),
+    ("elapsed_seconds", "gauge", "Wall-clock seconds since the run started", lambda r: r["elapsed_seconds"]),
+    ("start_time_seconds", "gauge", "Unix time the run started", lambda r: r["start_timestamp"]),
+]
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(record, extra=None):
+    labels = {"run_id": record["run_id"], **record["labels"], **(extra or {})}
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def render_openmetrics(records):
+    """
+    실행별 최신 record 목록 → OpenMetrics 텍스트 (# EOF 로 끝남)
+    """
+    lines = []
+    def family(name, kind, help_text):
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+
+    family("run", "info", "Simulation run status")
+    for r in records:
+        lines.append(f"{METRIC_PREFIX}_run_info{_labels(r, {'status': r['status']})} 1")
+    family("ticks", "counter", "Simulated ticks completed")
+    for r in records:
+        lines.append(f"{METRIC_PREFIX}_ticks_total{_labels(r)} {r['ticks_done']}")
+    for name, kind, help_text, value in GAUGES:
+        samples = [(r, value(r)) for r in records if value(r) is not None]
+        if not samples: continue
+        family(name, kind, help_text)
+        for r, v in samples:
+            lines.append(f"{METRIC_PREFIX}_{name}{_labels(r)} {float(v)!r}")
+    family("phase_seconds", "counter", "Cumulative wall-clock seconds per engine phase")
+    for r in records:
+        for phase, seconds in r["phase_seconds"].items():
+            lines.append(f"{METRIC_PREFIX}_phase_seconds_total{_labels(r, {'phase': phase})} {float(seconds)!r}")
+    family("phase_last_seconds", "gauge", "Wall-clock seconds per engine phase in the last tick")
+    for r in records:
+        for phase, seconds in r["phase_last_seconds"].items():
+            lines.append(f"{METRIC_PREFIX}_phase_last_seconds{_labels(r, {'phase': phase})} {float(seconds)!r}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+# ------------------------------------------
+# Sinks
+# ------------------------------------------
+def openmetrics_file_sink(path):
+    """
+    OpenMetrics 텍스트 파일 (발행마다 임시 파일에 쓰고 교체 → 수집기가 반쯤 쓴 파일을 읽지 않음)
+    여러 실행이 공유하면 run_id 별 최신 값을 한 파일에 모읍니다.
+    """
+    runs = {}
+    def write(record):
+        runs[record["run_id"]] = record
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(render_openmetrics(list(runs.values())))
+        os.replace(tmp_path, path)
+    return {"kind": "openmetrics_file", "path": path, "publish": write, "runs": runs}
+
+def openmetrics_http_sink(port=DEFAULT_HTTP_PORT, host="127.0.0.1"):
+    """
+    로컬 HTTP 익스포터: 백그라운드 스레드에서 GET /metrics 로 최신 값을 노출 (port=0 이면 빈 포트)
+    close() 로 서버 종료. 스크레이프 대상: http://{host}:{port}/metrics
+    """
+    runs = {}
+    lock = threading.Lock()
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            with lock:
+                body = render_openmetrics(list(runs.values())).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def write(record):
+        with lock:
+            runs[record["run_id"]] = record
+
+    def close():
+        server.shutdown()
+        server.server_close()
+
+    return {"kind": "openmetrics_http", "url": f"http://{host}:{server.server_address[1]}/metrics", "publish": write, "close": close, "runs": runs}
+
+def jsonl_sink(path):
+    """발행마다 record 한 줄을 JSON-lines 파일에 추가"""
+    def write(record):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    return {"kind": "jsonl", "path": path, "publish": write}
+
+def main():
+    import argparse
+    import urllib.request
+    import genesis
+    import psy_sim_config
+    import engine
+
+    parser = argparse.ArgumentParser(description="Run one simulation with telemetry sinks")
+    parser.add_argument("--agents", type=int, default=5000)
+    parser.add_argument("--textfile", default=None, help="OpenMetrics 텍스트 파일 경로")
+    parser.add_argument("--jsonl", default=None, help="JSON-lines 파일 경로")
+    parser.add_argument("--port", type=int, default=None, help="로컬 HTTP 익스포터 포트 (0 = 빈 포트)")
+    args = parser.parse_args()
+
+    sinks = []
+    if args.textfile: sinks.append(openmetrics_file_sink(args.textfile))
+    if args.jsonl: sinks.append(jsonl_sink(args.jsonl))
+    if args.port is not None: sinks.append(openmetrics_http_sink(args.port))
+    telemetry = create_telemetry(sinks, labels={"agents": args.agents})
+    df_activities = psy_sim_config.load_activity_table()
+    engine.run_simulation(genesis.create_agent_population(args.agents), df_activities, telemetry=telemetry)
+    for sink in telemetry["sinks"]:
+        if sink.get("kind") == "openmetrics_http":
+            with urllib.request.urlopen(sink["url"]) as resp:
+                print(resp.read().decode())
+    close_sinks(telemetry)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# Agent Tracer v1.0
+# ==========================================
+# [Update Log]
+# - Sampled Cohort Tracing: 지정 ID / 무작위 샘플 / 조건식(predicate) 코호트의 틱별 상태 + 선택 활동 기록
+# - Ring Buffer: 실행 전에 [Capacity, K, ...] 버퍼를 미리 할당 (비용은 샘플 크기 K 에만 비례)
+# - Columnar Export: DataFrame / .npz 로 내보내기
+# ==========================================
+
+# 기본 기록 필드 (engine.DYNAMIC_STATE_KEYS 중 에이전트 상태에 해당하는 것)
+DEFAULT_TRACE_FIELDS = [
+    "state_stress", "state_dopamine", "state_anxiety", "state_current_media",
+    "media_boredom", "gacha_pity_count", "recent_fail_streak", "wallet", "total_spent", "interests"
+]
+
+def create_tracer(agents, n_acts, agent_ids=None, sample_size=None, predicate=None, capacity=96, fields=None, seed=None):
+    """
+    에이전트 궤적 기록기를 생성합니다. 대상 코호트는 생성 시점에 한 번만 결정됩니다.
+
+    agent_ids: 추적할 에이전트 인덱스 목록
+    sample_size: agent_ids 가 없으면 (predicate 로 거른 뒤) 무작위로 뽑을 에이전트 수
+    predicate: agents dict 를 받아 [N] bool 마스크를 반환하는 함수 (예: 저지갑 학생)
+    capacity: Ring Buffer 길이 (틱 수). 넘치면 가장 오래된 틱부터 덮어씀
+    fields: 기록할 agents 키 목록 (기본 DEFAULT_TRACE_FIELDS)
+    """
+    n_agents = len(agents['ids'])
+
+    if agent_ids is not None:
+        sample_ids = np.unique(np.asarray(agent_ids, dtype=np.int64))
+    else:
+        candidates = np.arange(n_agents)
+        if predicate is not None:
+            candidates = np.flatnonzero(np.asarray(predicate(agents)).ravel())
+        if sample_size is not None and sample_size < len(candidates):
+            rng = np.random.default_rng(seed)
+            candidates = np.sort(rng.choice(candidates, size=sample_size, replace=False))
+        sample_ids = candidates.astype(np.int64)
+
+    if fields is None:
+        fields = [f for f in DEFAULT_TRACE_FIELDS if f in agents]
+    n_sample = len(sample_ids)
+
+    tracer = {
+        "sample_ids": sample_ids,
+        "fields": list(fields),
+        "capacity": capacity,
+        "n_recorded": 0, # 지금까지 기록한 틱 수 (capacity 초과 가능)
+        "ticks": np.full(capacity, -1, dtype=np.int64),
+        "actions": np.zeros((capacity, n_sample, n_acts), dtype=bool),
+        "is_active": np.zeros((capacity, n_sample), dtype=bool),
+        "states": {},
+    }
+    for field in fields:
+        values = agents[field]
+        tracer["states"][field] = np.zeros((capacity, n_sample) + values.shape[1:], dtype=values.dtype)
+    return tracer
+
+def record_tick(tracer, agents, tick, action_mask, active_indices=None):
+    """
+    현재 틱의 샘플 에이전트 상태와 선택 활동을 Ring Buffer 에 기록합니다.
+
+    action_mask: [N, M] 전체 인구 마스크, 또는 Active Set 사용 시 [len(active_indices), M] 압축 마스크
+    active_indices: action_mask 의 행이 가리키는 에이전트 인덱스 (정렬됨). None 이면 전체 인구
+    """
+    sample_ids = tracer["sample_ids"]
+    slot = tracer["n_recorded"] % tracer["capacity"]
+    tracer["ticks"][slot] = tick
+
+    for field in tracer["fields"]:
+        np.take(agents[field], sample_ids, axis=0, out=tracer["states"][field][slot], mode='clip')
+
+    actions = tracer["actions"][slot]
+    is_active = tracer["is_active"][slot]
+    if action_mask is None:
+        actions[:] = False
+        is_active[:] = False
+    elif active_indices is None:
+        np.take(action_mask, sample_ids, axis=0, out=actions, mode='clip')
+        is_active[:] = True
+    else:
+        # 압축 마스크에서 샘플 에이전트의 행 위치 찾기 (O(K log N))
+        rows = np.searchsorted(active_indices, sample_ids)
+        np.minimum(rows, max(len(active_indices) - 1, 0), out=rows)
+        if len(active_indices) > 0:
+            np.equal(active_indices[rows], sample_ids, out=is_active)
+            np.take(action_mask, rows, axis=0, out=actions, mode='clip')
+            actions &= is_active[:, np.newaxis]
+        else:
+            is_active[:] = False
+            actions[:] = False
+
+    tracer["n_recorded"] += 1
+
+def _ordered_slots(tracer):
+    # Ring Buffer 슬롯을 오래된 순서로 정렬
+    capacity = tracer["capacity"]
+    n_recorded = tracer["n_recorded"]
+    if n_recorded <= capacity: return np.arange(n_recorded)
+    start = n_recorded % capacity
+    return (np.arange(capacity) + start) % capacity
+
+def tracer_to_frame(tracer, activity_names=None):
+    """
+    기록을 (tick, agent_id) 한 행씩의 Long-format DataFrame 으로 변환합니다.
+    다차원 필드는 field_0, field_1 ... 열로 펼치고, 선택 활동은 활동별 bool 열(act_*)로 만듭니다.
+    """
+    slots = _ordered_slots(tracer)
+    sample_ids = tracer["sample_ids"]
+    n_slots, n_sample = len(slots), len(sample_ids)
+
+    columns = {
+        "tick": np.repeat(tracer["ticks"][slots], n_sample),
+        "agent_id": np.tile(sample_ids, n_slots),
+        "is_active": tracer["is_active"][slots].reshape(-1),
+    }
+    for field, values in tracer["states"].items():
+        values = values[slots].reshape(n_slots * n_sample, -1)
+        if values.shape[1] == 1:
+            columns[field] = values[:, 0]
+        else:
+            for j in range(values.shape[1]):
+                columns[f"{field}_{j}"] = values[:, j]
+
+    actions = tracer["actions"][slots].reshape(n_slots * n_sample, -1)
+    if activity_names is None: activity_names = [str(j) for j in range(actions.shape[1])]
+    for j, name in enumerate(activity_names):
+        columns[f"act_{name}"] = actions[:, j]
+
+    return pd.DataFrame(columns)
+
+def export_tracer(tracer, path):
+    """기록을 열(column) 단위 배열로 .npz 에 저장합니다. (오래된 틱부터 정렬)"""
+    slots = _ordered_slots(tracer)
+    arrays = {
+        "sample_ids": tracer["sample_ids"],
+        "ticks": tracer["ticks"][slots],
+        "actions": tracer["actions"][slots],
+        "is_active": tracer["is_active"][slots],
+    }
+    for field, values in tracer["states"].items():
+        arrays[f"state__{field}"] = values[slots]
+    np.savez_compressed(path, **arrays)